@@ -15,18 +15,21 @@
 
 import os
 import sys
+import time
 
 import eventlet
 eventlet.monkey_patch()
 
 import netaddr
 from oslo.config import cfg
+from oslo import messaging
 
 from neutron.agent.common import config
 from neutron.agent.linux import dhcp
 from neutron.agent.linux import external_process
 from neutron.agent.linux import interface
 from neutron.agent.linux import ovs_lib  # noqa
+from neutron.agent.linux import utils as linux_utils
 from neutron.agent import rpc as agent_rpc
 from neutron.api.rpc.agentnotifiers import helo_rpc_agent_api
 from neutron.common import config as common_config
@@ -38,6 +41,7 @@ from neutron.common import utils
 from neutron import context
 from neutron import manager
 from neutron.openstack.common import importutils
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common import service
@@ -45,6 +49,8 @@ from neutron import service as neutron_service
 
 LOG = logging.getLogger(__name__)
 
+METADATA_PROXY_ID = 'dhcp-metadata-proxy'
+
 
 class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
     OPTS = [
@@ -65,6 +71,33 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
                           'socket')),
+        cfg.IntOpt('reload_allocations_interval', default=0,
+                   help=_('Minimum number of milliseconds between two '
+                          'reloads of the allocations of a network on port '
+                          'events. The port events received in between are '
+                          'coalesced into a single reload. 0 reloads on '
+                          'each port event.')),
+        cfg.BoolOpt('sync_networks_by_revision', default=False,
+                    help=_("On sync, only fetch and configure the networks "
+                           "which changed on the server since the agent "
+                           "last configured them, including across agent "
+                           "restarts.")),
+        cfg.IntOpt('sync_networks_page_size', default=100,
+                   help=_('Maximum number of networks fetched from the '
+                          'server, or whose DHCP ports are set up, by a '
+                          'single call during sync.')),
+        cfg.BoolOpt('dhcp_warm_restart', default=False,
+                    help=_("On agent start, keep the DHCP servers left "
+                           "running by the previous run of the agent when "
+                           "their process, device and config files match "
+                           "the network, instead of restarting them. Not "
+                           "used when kill_dhcp_process is set.")),
+        cfg.BoolOpt('isolated_metadata_single_proxy', default=False,
+                    help=_("Serve the metadata of all the isolated networks "
+                           "from a single proxy process listening in each "
+                           "network namespace, instead of running one "
+                           "proxy process per network. Requires "
+                           "use_namespaces = True.")),
     ]
 
     def __init__(self, host=None):
@@ -82,7 +115,20 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
         if not os.path.isdir(dhcp_dir):
             os.makedirs(dhcp_dir, 0o755)
         self.dhcp_version = self.dhcp_driver_cls.check_version()
+        # Networks whose DHCP server may be adopted on first configuration
+        self._warm_networks = set()
+        # Whether the server can set up the DHCP ports of many networks
+        self._bulk_dhcp_ports = True
         self._populate_networks_cache()
+        # Networks with a scheduled reload, and time of their last reload
+        self._pending_reloads = set()
+        self._last_reloads = {}
+        # Entries served by the single metadata proxy, keyed by network id
+        self._metadata_proxy_networks = None
+        # Whether the entries changed since the proxy was last updated, and
+        # whether updates are deferred to the end of the running sync
+        self._metadata_proxy_dirty = False
+        self._defer_metadata_proxy_update = False
 
     def _populate_networks_cache(self):
         """Populate the networks cache when the DHCP-agent starts."""
@@ -92,11 +138,18 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
                 self.root_helper
             )
             for net_id in existing_networks:
-                net = dhcp.NetModel(self.conf.use_namespaces,
-                                    {"id": net_id,
-                                     "subnets": [],
-                                     "ports": []})
+                net = None
+                if self.conf.sync_networks_by_revision:
+                    net = self._load_network_state(net_id)
+                if net is None:
+                    net = dhcp.NetModel(self.conf.use_namespaces,
+                                        {"id": net_id,
+                                         "subnets": [],
+                                         "ports": []})
                 self.cache.put(net)
+            if (self.conf.dhcp_warm_restart and
+                not cfg.CONF.kill_dhcp_process):
+                self._warm_networks = set(existing_networks)
         except NotImplementedError:
             # just go ahead with an empty networks cache
             LOG.debug(
@@ -153,16 +206,166 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
         """Schedule a resync for a given reason."""
         self.needs_resync_reasons.append(reason)
 
+    def _get_network_state_file(self, network_id):
+        confs_dir = os.path.abspath(os.path.normpath(self.conf.dhcp_confs))
+        return os.path.join(confs_dir, network_id, 'network')
+
+    def _save_network_state(self, network):
+        """Save the network the DHCP server was configured with.
+
+        Only networks stamped with a revision by the server are saved, the
+        revision tells on the next sync whether the network changed since.
+        """
+        if (not self.conf.sync_networks_by_revision or
+            network.get(constants.DHCP_REVISION_KEY) is None):
+            return
+        file_name = self._get_network_state_file(network.id)
+        try:
+            if os.path.isdir(os.path.dirname(file_name)):
+                linux_utils.replace_file(file_name, jsonutils.dumps(network))
+        except Exception:
+            LOG.exception(_('Unable to save the state of network %s'),
+                          network.id)
+
+    def _load_network_state(self, network_id):
+        file_name = self._get_network_state_file(network_id)
+        try:
+            with open(file_name, 'r') as f:
+                network = jsonutils.loads(f.read())
+        except IOError:
+            return
+        except ValueError:
+            LOG.warn(_('Ignoring invalid state file %s'), file_name)
+            return
+        if network.get('id') == network_id:
+            return dhcp.NetModel(self.conf.use_namespaces, network)
+
+    def _is_network_unchanged(self, network_id, revision):
+        """Check if the DHCP server of the network is up to date."""
+        network = self.cache.get_network_by_id(network_id)
+        if (network is None or revision is None or
+            network.get(constants.DHCP_REVISION_KEY) != revision):
+            return False
+        if network_id in self._warm_networks:
+            return self._adopt_dhcp_for_network(network)
+        driver = self.dhcp_driver_cls(self.conf,
+                                      network,
+                                      self.root_helper,
+                                      self.dhcp_version,
+                                      self.plugin_rpc)
+        return driver.active
+
+    def _adopt_dhcp_for_network(self, network):
+        """Try once to keep the DHCP server left by a previous agent run."""
+        if network.id not in self._warm_networks:
+            return False
+        self._warm_networks.discard(network.id)
+        try:
+            driver = self.dhcp_driver_cls(self.conf,
+                                          network,
+                                          self.root_helper,
+                                          self.dhcp_version,
+                                          self.plugin_rpc)
+            return driver.adopt()
+        except Exception:
+            LOG.exception(_('Unable to adopt the DHCP server of network %s'),
+                          network.id)
+            return False
+
+    def _get_changed_networks(self):
+        """Fetch the active networks which changed since last configured.
+
+        Returns the set of ids of all the active networks and a generator
+        of the changed networks, fetched by pages.
+        """
+        revisions = self.plugin_rpc.get_active_network_revisions()
+        changed_ids = [network_id for network_id, revision
+                       in revisions.iteritems()
+                       if not self._is_network_unchanged(network_id,
+                                                         revision)]
+        LOG.info(_('%(changed)d of %(total)d networks changed since last '
+                   'sync'), {'changed': len(changed_ids),
+                             'total': len(revisions)})
+
+        def fetch_networks():
+            page_size = max(1, self.conf.sync_networks_page_size)
+            for index in range(0, len(changed_ids), page_size):
+                for network in self.plugin_rpc.get_networks_info(
+                        changed_ids[index:index + page_size]):
+                    yield network
+
+        return set(revisions), fetch_networks()
+
+    def _iter_network_pages(self, networks):
+        """Group the networks in lists of at most the sync page size."""
+        page_size = max(1, self.conf.sync_networks_page_size)
+        page = []
+        for network in networks:
+            page.append(network)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _setup_dhcp_ports(self, networks):
+        """Ensure the DHCP ports of the networks with a single RPC call.
+
+        The ports are put in the networks so that setting up the DHCP device
+        of each network does not call the server.
+        """
+        if not self._bulk_dhcp_ports:
+            return
+        network_ids = [network.id for network in networks
+                       if network.admin_state_up and
+                       any(subnet.enable_dhcp for subnet in network.subnets)]
+        if not network_ids:
+            return
+        try:
+            ports = self.plugin_rpc.ensure_dhcp_ports(network_ids)
+        except messaging.UnsupportedVersion:
+            LOG.warn(_('Setting up DHCP ports in bulk requires a server '
+                       'upgrade, setting them up one network at a time.'))
+            self._bulk_dhcp_ports = False
+            return
+        except Exception:
+            LOG.exception(_('Unable to set up DHCP ports in bulk, setting '
+                            'them up one network at a time.'))
+            return
+        for network in networks:
+            port = ports.get(network.id)
+            if not port:
+                continue
+            for index, network_port in enumerate(network.ports):
+                if network_port.id == port.id:
+                    network.ports[index] = port
+                    break
+            else:
+                network.ports.append(port)
+
     @utils.synchronized('dhcp-agent')
     def sync_state(self, kill_flag=True):
         """Sync the local DHCP state with Neutron."""
         LOG.info(_('Synchronizing state'))
         pool = eventlet.GreenPool(cfg.CONF.num_sync_threads)
         known_network_ids = set(self.cache.get_network_ids())
+        # The single metadata proxy is updated once all networks are synced
+        self._defer_metadata_proxy_update = True
 
         try:
-            active_networks = self.plugin_rpc.get_active_networks_info()
-            active_network_ids = set(network.id for network in active_networks)
+            active_networks = None
+            if (self.conf.sync_networks_by_revision and
+                not self.conf.kill_dhcp_process):
+                try:
+                    active_network_ids, active_networks = (
+                        self._get_changed_networks())
+                except messaging.UnsupportedVersion:
+                    LOG.warn(_('Syncing networks by revision requires a '
+                               'server upgrade, syncing all networks.'))
+            if active_networks is None:
+                active_networks = self.plugin_rpc.get_active_networks_info()
+                active_network_ids = set(network.id
+                                         for network in active_networks)
             for deleted_id in known_network_ids - active_network_ids:
                 try:
                     self.disable_dhcp_helper(deleted_id)
@@ -171,14 +374,23 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
                     LOG.exception(_('Unable to sync network state on deleted '
                                     'network %s'), deleted_id)
 
-            for network in active_networks:
-                pool.spawn(self.safe_configure_dhcp_for_network, network, kill_flag)
+            for networks in self._iter_network_pages(active_networks):
+                self._setup_dhcp_ports(networks)
+                for network in networks:
+                    pool.spawn(self.safe_configure_dhcp_for_network, network,
+                               kill_flag)
             pool.waitall()
+            self._prune_metadata_proxy_networks(active_network_ids)
+            self._defer_metadata_proxy_update = False
+            if self._metadata_proxy_dirty:
+                self._update_metadata_proxy()
             LOG.info(_('Synchronizing state complete'))
 
         except Exception as e:
             self.schedule_resync(e)
             LOG.exception(_('Unable to sync network state.'))
+        finally:
+            self._defer_metadata_proxy_update = False
 
     @utils.exception_logger()
     def _periodic_resync_helper(self):
@@ -228,11 +440,14 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
             return
         for subnet in network.subnets:
             if subnet.enable_dhcp:
-                if self.call_driver('enable', network, kill_flag = kill_flag):
+                if (self._adopt_dhcp_for_network(network) or
+                    self.call_driver('enable', network,
+                                     kill_flag = kill_flag)):
                     if (self.conf.use_namespaces and
                         self.conf.enable_isolated_metadata):
                         self.enable_isolated_metadata_proxy(network)
                     self.cache.put(network)
+                    self._save_network_state(network)
                 break
 
     def disable_dhcp_helper(self, network_id):
@@ -242,8 +457,10 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
             if (self.conf.use_namespaces and
                 self.conf.enable_isolated_metadata):
                 self.disable_isolated_metadata_proxy(network)
+            self._warm_networks.discard(network.id)
             if self.call_driver('disable', network):
                 self.cache.remove(network)
+                self._last_reloads.pop(network.id, None)
 
     def refresh_dhcp_helper(self, network_id):
         """Refresh or disable DHCP for a network depending on the current state
@@ -264,9 +481,11 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
         if new_cidrs and old_cidrs == new_cidrs:
             self.call_driver('reload_allocations', network)
             self.cache.put(network)
+            self._save_network_state(network)
         elif new_cidrs:
             if self.call_driver('restart', network):
                 self.cache.put(network)
+                self._save_network_state(network)
         else:
             self.disable_dhcp_helper(network.id)
 
@@ -314,7 +533,7 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
         network = self.cache.get_network_by_id(updated_port.network_id)
         if network:
             self.cache.put_port(updated_port)
-            self.call_driver('reload_allocations', network)
+            self.schedule_reload_allocations(network)
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
@@ -326,14 +545,37 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
+            self.schedule_reload_allocations(network)
+
+    def schedule_reload_allocations(self, network):
+        """Reload the allocations of a network at most once per interval.
+
+        The reload happens in the background with the network as cached at
+        that time, so that it covers all the port events received meanwhile.
+        """
+        interval = self.conf.reload_allocations_interval / 1000.0
+        if interval <= 0:
             self.call_driver('reload_allocations', network)
+            return
+        if network.id in self._pending_reloads:
+            return
+        self._pending_reloads.add(network.id)
+        delay = max(0, self._last_reloads.get(network.id, 0) + interval -
+                    time.time())
+        eventlet.spawn_after(delay, self._reload_allocations, network.id)
 
-    def enable_isolated_metadata_proxy(self, network):
+    @utils.synchronized('dhcp-agent')
+    def _reload_allocations(self, network_id):
+        self._pending_reloads.discard(network_id)
+        self._last_reloads[network_id] = time.time()
+        network = self.cache.get_network_by_id(network_id)
+        if network:
+            self.call_driver('reload_allocations', network)
 
+    def _get_metadata_proxy_lookup(self, network):
         # The proxy might work for either a single network
         # or all the networks connected via a router
         # to the one passed as a parameter
-        neutron_lookup_param = '--network_id=%s' % network.id
         meta_cidr = netaddr.IPNetwork(dhcp.METADATA_DEFAULT_CIDR)
         has_metadata_subnet = any(netaddr.IPNetwork(s.cidr) in meta_cidr
                                   for s in network.subnets)
@@ -351,8 +593,16 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
                                 {'port_num': len(router_ports),
                                  'port_id': router_ports[0].id,
                                  'router_id': router_ports[0].device_id})
-                neutron_lookup_param = ('--router_id=%s' %
-                                        router_ports[0].device_id)
+                return 'router_id', router_ports[0].device_id
+        return 'network_id', network.id
+
+    def enable_isolated_metadata_proxy(self, network):
+        if self.conf.isolated_metadata_single_proxy and network.namespace:
+            self._register_metadata_proxy_network(network)
+            return
+
+        neutron_lookup_param = '--%s=%s' % self._get_metadata_proxy_lookup(
+            network)
 
         def callback(pid_file):
             metadata_proxy_socket = cfg.CONF.metadata_proxy_socket
@@ -374,6 +624,9 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
         pm.enable(callback)
 
     def disable_isolated_metadata_proxy(self, network):
+        if self.conf.isolated_metadata_single_proxy and network.namespace:
+            self._unregister_metadata_proxy_network(network)
+            return
         pm = external_process.ProcessManager(
             self.conf,
             network.id,
@@ -381,6 +634,94 @@ class DhcpAgent(manager.Manager, helo_rpc_agent_api.HeloRpcCallbackMixin):
             network.namespace)
         pm.disable()
 
+    def _get_metadata_proxy_networks_file(self):
+        return linux_utils.get_conf_file_name(
+            self.conf.dhcp_confs, METADATA_PROXY_ID, 'networks', True)
+
+    def _get_metadata_proxy_networks(self):
+        """Return the entries served by the single metadata proxy.
+
+        The entries are loaded from the networks file of the proxy on first
+        use, so that a running proxy keeps serving across agent restarts.
+        Entries of networks no longer active on the agent are dropped at the
+        end of the next sync.
+        """
+        if self._metadata_proxy_networks is None:
+            networks = {}
+            file_name = self._get_metadata_proxy_networks_file()
+            try:
+                with open(file_name, 'r') as f:
+                    networks = jsonutils.loads(f.read())
+            except IOError:
+                pass
+            except ValueError:
+                LOG.warn(_('Ignoring invalid networks file %s'), file_name)
+            self._metadata_proxy_networks = networks
+        return self._metadata_proxy_networks
+
+    def _prune_metadata_proxy_networks(self, active_network_ids):
+        """Drop the proxy entries of the networks not active anymore."""
+        if not (self.conf.use_namespaces and
+                self.conf.enable_isolated_metadata and
+                self.conf.isolated_metadata_single_proxy):
+            return
+        networks = self._get_metadata_proxy_networks()
+        for network_id in set(networks) - set(active_network_ids):
+            del networks[network_id]
+            self._metadata_proxy_dirty = True
+
+    def _metadata_proxy_changed(self):
+        self._metadata_proxy_dirty = True
+        if not self._defer_metadata_proxy_update:
+            self._update_metadata_proxy()
+
+    def _update_metadata_proxy(self):
+        """Write the networks file and make the proxy serve it."""
+        file_name = self._get_metadata_proxy_networks_file()
+        linux_utils.replace_file(
+            file_name, jsonutils.dumps(self._metadata_proxy_networks))
+
+        def callback(pid_file):
+            metadata_proxy_socket = cfg.CONF.metadata_proxy_socket
+            proxy_cmd = ['neutron-multi-ns-metadata-proxy',
+                         '--proxy_id=%s' % METADATA_PROXY_ID,
+                         '--pid_file=%s' % pid_file,
+                         '--networks_file=%s' % file_name,
+                         '--metadata_proxy_socket=%s' % metadata_proxy_socket,
+                         '--state_path=%s' % self.conf.state_path,
+                         '--metadata_port=%d' % dhcp.METADATA_PORT]
+            proxy_cmd.extend(config.get_log_args(
+                cfg.CONF, 'neutron-multi-ns-metadata-proxy.log'))
+            return proxy_cmd
+
+        pm = external_process.ProcessManager(
+            self.conf,
+            METADATA_PROXY_ID,
+            self.root_helper)
+        pm.enable(callback, reload_cfg=True)
+        self._metadata_proxy_dirty = False
+
+    def _register_metadata_proxy_network(self, network):
+        lookup_key, lookup_value = self._get_metadata_proxy_lookup(network)
+        entry = {'namespace': network.namespace, lookup_key: lookup_value}
+        networks = self._get_metadata_proxy_networks()
+        if networks.get(network.id) != entry:
+            if network.id not in networks:
+                # Free the metadata port from a proxy started for the
+                # network alone before the single proxy was enabled
+                external_process.ProcessManager(
+                    self.conf,
+                    network.id,
+                    self.root_helper,
+                    network.namespace).disable()
+            networks[network.id] = entry
+            self._metadata_proxy_changed()
+
+    def _unregister_metadata_proxy_network(self, network):
+        networks = self._get_metadata_proxy_networks()
+        if networks.pop(network.id, None) is not None:
+            self._metadata_proxy_changed()
+
 
 class DhcpPluginApi(n_rpc.RpcProxy):
     """Agent side of the dhcp rpc API.
@@ -389,6 +730,9 @@ class DhcpPluginApi(n_rpc.RpcProxy):
         1.0 - Initial version.
         1.1 - Added get_active_networks_info, create_dhcp_port,
               and update_dhcp_port methods.
+        1.2 - Added get_active_network_revisions and get_networks_info
+              methods.
+        1.3 - Added ensure_dhcp_ports method.
 
     """
 
@@ -408,6 +752,25 @@ class DhcpPluginApi(n_rpc.RpcProxy):
                                            host=self.host))
         return [dhcp.NetModel(self.use_namespaces, n) for n in networks]
 
+    def get_active_network_revisions(self):
+        """Make a remote process call to retrieve the network revisions.
+
+        Returns a dict of the revision of each active network by id.
+        """
+        return self.call(self.context,
+                         self.make_msg('get_active_network_revisions',
+                                       host=self.host),
+                         version='1.2')
+
+    def get_networks_info(self, network_ids):
+        """Make a remote process call to retrieve info of many networks."""
+        networks = self.call(self.context,
+                             self.make_msg('get_networks_info',
+                                           network_ids=network_ids,
+                                           host=self.host),
+                             version='1.2')
+        return [dhcp.NetModel(self.use_namespaces, n) for n in networks]
+
     def get_network_info(self, network_id):
         """Make a remote process call to retrieve network info."""
         network = self.call(self.context,
@@ -417,6 +780,19 @@ class DhcpPluginApi(n_rpc.RpcProxy):
         if network:
             return dhcp.NetModel(self.use_namespaces, network)
 
+    def ensure_dhcp_ports(self, network_ids):
+        """Make a remote process call to set up the DHCP ports of networks.
+
+        Returns the DHCP port of the host by network id.
+        """
+        ports = self.call(self.context,
+                          self.make_msg('ensure_dhcp_ports',
+                                        network_ids=network_ids,
+                                        host=self.host),
+                          version='1.3')
+        return dict((network_id, dhcp.DictModel(port))
+                    for network_id, port in ports.iteritems())
+
     def get_dhcp_port(self, network_id, device_id):
         """Make a remote process call to get the dhcp port."""
         port = self.call(self.context,
@@ -465,11 +841,19 @@ class DhcpPluginApi(n_rpc.RpcProxy):
 
 
 class NetworkCache(object):
-    """Agent cache of the current network state."""
+    """Agent cache of the current network state.
+
+    Ports and subnets are stored as compact slotted records, ports are
+    indexed by id and by network and MAC address so that port events do not
+    need to scan the ports of the network.
+    """
     def __init__(self):
         self.cache = {}
         self.subnet_lookup = {}
         self.port_lookup = {}
+        self.mac_lookup = {}
+        self._ports = {}
+        self._port_positions = {}
 
     def get_network_ids(self):
         return self.cache.keys()
@@ -483,17 +867,49 @@ class NetworkCache(object):
     def get_network_by_port_id(self, port_id):
         return self.cache.get(self.port_lookup.get(port_id))
 
+    def _shared_values(self, network):
+        shared = dict((subnet.id, subnet.id) for subnet in network.subnets)
+        for value in (network.id, network.get('tenant_id')):
+            if value:
+                shared[value] = value
+        return shared
+
+    def _compact_network(self, network):
+        shared = self._shared_values(network)
+        subnets = [dhcp.SubnetModel(subnet, shared)
+                   for subnet in network.subnets]
+        ports = [dhcp.PortModel(port, shared) for port in network.ports]
+        return dhcp.NetModel(network.namespace is not None,
+                             dict(network, subnets=subnets, ports=ports))
+
+    def _index_port(self, network, port, position):
+        self.port_lookup[port.id] = network.id
+        self._ports[port.id] = port
+        self._port_positions[port.id] = position
+        mac_address = getattr(port, 'mac_address', None)
+        if mac_address:
+            self.mac_lookup[(network.id, mac_address)] = port.id
+
+    def _unindex_port(self, network_id, port):
+        del self.port_lookup[port.id]
+        self._ports.pop(port.id, None)
+        self._port_positions.pop(port.id, None)
+        key = (network_id, getattr(port, 'mac_address', None))
+        if self.mac_lookup.get(key) == port.id:
+            del self.mac_lookup[key]
+
     def put(self, network):
         if network.id in self.cache:
             self.remove(self.cache[network.id])
 
+        network = self._compact_network(network)
         self.cache[network.id] = network
 
         for subnet in network.subnets:
             self.subnet_lookup[subnet.id] = network.id
 
-        for port in network.ports:
-            self.port_lookup[port.id] = network.id
+        for position, port in enumerate(network.ports):
+            self._index_port(network, port, position)
 
     def remove(self, network):
         del self.cache[network.id]
@@ -502,34 +918,41 @@ class NetworkCache(object):
             del self.subnet_lookup[subnet.id]
 
         for port in network.ports:
-            del self.port_lookup[port.id]
+            self._unindex_port(network.id, port)
 
     def put_port(self, port):
         network = self.get_network_by_id(port.network_id)
-        for index in range(len(network.ports)):
-            if network.ports[index].id == port.id:
-                network.ports[index] = port
-                break
+        port = dhcp.PortModel(port, self._shared_values(network))
+        old_port = self._ports.get(port.id)
+        if old_port is not None and self.port_lookup[port.id] == network.id:
+            position = self._port_positions[port.id]
+            self._unindex_port(network.id, old_port)
+            network.ports[position] = port
         else:
+            position = len(network.ports)
             network.ports.append(port)
 
-        self.port_lookup[port.id] = network.id
+        self._index_port(network, port, position)
 
     def remove_port(self, port):
         network = self.get_network_by_port_id(port.id)
+        if not network:
+            return
 
-        for index in range(len(network.ports)):
-            if network.ports[index] == port:
-                del network.ports[index]
-                del self.port_lookup[port.id]
-                break
+        # Move the last port of the network into the slot of the removed one
+        position = self._port_positions[port.id]
+        last_port = network.ports.pop()
+        if last_port.id != port.id:
+            network.ports[position] = last_port
+            self._port_positions[last_port.id] = position
+        self._unindex_port(network.id, self._ports[port.id])
 
     def get_port_by_id(self, port_id):
-        network = self.get_network_by_port_id(port_id)
-        if network:
-            for port in network.ports:
-                if port.id == port_id:
-                    return port
+        return self._ports.get(port_id)
+
+    def get_port_by_mac(self, network_id, mac_address):
+        return self._ports.get(self.mac_lookup.get((network_id,
+                                                    mac_address)))
 
     def get_state(self):
         net_ids = self.get_network_ids()
@@ -17,6 +17,7 @@ import sys
 
 import datetime
 import eventlet
+import eventlet.queue
 eventlet.monkey_patch()
 
 import threading
@@ -24,6 +25,7 @@ import traceback
 import netaddr
 import os
 from oslo.config import cfg
+from oslo import messaging
 import Queue
 
 from neutron.agent.common import config
@@ -78,7 +80,10 @@ FLOATING_IP_CIDR_SUFFIX = '/32'
 # Lower value is higher priority
 PRIORITY_RPC = 0
 PRIORITY_SYNC_ROUTERS_TASK = 1
+PRIORITY_DEFERRED_WORK = 2
 DELETE_ROUTER = 1
+# Seconds a router notification counts as recent activity on full sync
+ROUTER_ACTIVITY_WINDOW = 600
 
 
 class L3PluginApi(n_rpc.RpcProxy):
@@ -92,6 +97,7 @@ class L3PluginApi(n_rpc.RpcProxy):
               - get_agent_gateway_port
               Needed by the agent when operating in DVR/DVR_SNAT mode
         1.3 - Get the list of activated services
+        1.4 - Sync only the routers whose revision changed
 
     """
 
@@ -112,6 +118,28 @@ class L3PluginApi(n_rpc.RpcProxy):
                           jsonutils.dumps(_rts, indent=5))
         return _rts
 
+    def get_routers_with_revisions(self, context, router_ids=None,
+                                   revisions=None):
+        """Make a remote process call to retrieve the changed routers.
+
+        @param revisions: dict of the revision by router id of the routers
+                          the agent already has the sync data for
+        @return: a dict with the list of changed routers under 'routers'
+                 and the list of ids of unchanged routers under 'unchanged'
+        """
+        try:
+            return self.call(context,
+                             self.make_msg('sync_routers_with_revisions',
+                                           host=self.host,
+                                           router_ids=router_ids,
+                                           revisions=revisions),
+                             version='1.4')
+        except messaging.UnsupportedVersion:
+            LOG.warn(_('Syncing routers by revision requires a server '
+                       'upgrade, syncing all routers.'))
+            return {'routers': self.get_routers(context, router_ids),
+                    'unchanged': []}
+
     def get_external_network_id(self, context):
         """Make a remote process call to retrieve the external network id.
 
@@ -285,6 +313,12 @@ class RouterInfo(object):
         self.uos_gateway_fip = None
         self.all_fips = {}
         self.lock = threading.Lock()
+        # Number of iptables applies of the last processing pass
+        self.iptables_applies = 0
+        # Skip rate limit and metering rules on the next processing
+        self.defer_slow_work = False
+        # Sync revision of the router data last processed successfully
+        self.sync_revision = None
 
     @property
     def router(self):
@@ -320,7 +354,8 @@ class RouterUpdate(object):
     and process a request to update a router.
     """
     def __init__(self, router_id, priority,
-                 action=None, router=None, timestamp=None):
+                 action=None, router=None, timestamp=None, weight=(),
+                 defer_slow_work=False):
         self.priority = priority
         self.timestamp = timestamp
         if not timestamp:
@@ -328,18 +363,22 @@ class RouterUpdate(object):
         self.id = router_id
         self.action = action
         self.router = router
+        self.weight = weight
+        self.defer_slow_work = defer_slow_work
 
     def __lt__(self, other):
         """Implements priority among updates
 
         Lower numerical priority always gets precedence.  When comparing two
-        updates of the same priority then the one with the earlier timestamp
-        gets procedence.  In the unlikely event that the timestamps are also
-        equal it falls back to a simple comparison of ids meaning the
-        precedence is essentially random.
+        updates of the same priority then the one with the lower weight and
+        then the one with the earlier timestamp gets procedence.  In the
+        unlikely event that the timestamps are also equal it falls back to a
+        simple comparison of ids meaning the precedence is essentially random.
         """
         if self.priority != other.priority:
             return self.priority < other.priority
+        if self.weight != other.weight:
+            return self.weight < other.weight
         if self.timestamp != other.timestamp:
             return self.timestamp < other.timestamp
         return self.id < other.id
@@ -432,6 +471,9 @@ class RouterProcessingQueue(object):
     def add(self, update):
         self._queue.put(update)
 
+    def empty(self):
+        return self._queue.empty()
+
     def each_update_to_next_router(self):
         """Grabs the next router from the queue and processes
 
@@ -495,6 +537,10 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
                    default=3,
                    help=_("Send this many gratuitous ARPs for HA setup, if "
                           "less than or equal to 0, the feature is disabled")),
+        cfg.IntOpt('send_arp_concurrency',
+                   default=32,
+                   help=_("Maximum number of gratuitous ARPs sent "
+                          "concurrently for new floating IPs.")),
         cfg.StrOpt('router_id', default='',
                    help=_("If namespaces is disabled, the l3 agent can only"
                           " configure a router that has the matching router "
@@ -528,6 +574,24 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         cfg.IntOpt('default_tc_qdisc',
                    default=5,
                    help=_("Default value for tc qdisc.")),
+        cfg.BoolOpt('sync_routers_with_revisions',
+                    default=False,
+                    help=_("On full sync, only fetch and process the "
+                           "routers which changed on the server since they "
+                           "were last fetched by the agent.")),
+        cfg.BoolOpt('startup_defer_slow_work', default=False,
+                    help=_("On the first full sync after the agent starts, "
+                           "wire the gateways, floating IPs and port "
+                           "forwardings of all the routers first, and only "
+                           "then configure their rate limits and metering "
+                           "rules.")),
+        cfg.IntOpt('namespace_cleanup_workers', default=4,
+                   help=_("Number of stale router namespaces destroyed "
+                          "concurrently in the background after the agent "
+                          "restarts. Stale namespaces are only destroyed "
+                          "while no router update is waiting to be "
+                          "processed. 0 destroys them synchronously during "
+                          "the first full sync.")),
     ]
 
     def __init__(self, host, conf=None):
@@ -561,6 +625,14 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         self.neutron_service_plugins = None
 
         self._clean_stale_namespaces = self.conf.use_namespaces
+        self._ns_cleanup_thread = None
+        self.ns_cleanup_stats = {'stale': 0, 'destroyed': 0, 'failed': 0,
+                                 'skipped': 0}
+        self._startup_sync_done = False
+        self._garp_queue = eventlet.queue.LightQueue()
+        self._garp_worker = None
+        # Last notification time by router id
+        self._router_activity = {}
 
         # dvr data
         self.agent_gateway_port = None
@@ -621,7 +693,14 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         ns_to_ignore = set(NS_PREFIX + id for id in router_ids)
         ns_to_ignore.update(SNAT_NS_PREFIX + id for id in router_ids)
         ns_to_destroy = router_namespaces - ns_to_ignore
-        self._destroy_stale_router_namespaces(ns_to_destroy)
+        if self.conf.namespace_cleanup_workers > 0 and ns_to_destroy:
+            # Stale namespaces are listed once, further full syncs must not
+            # schedule them again while they are being destroyed.
+            self._clean_stale_namespaces = False
+            self._ns_cleanup_thread = eventlet.spawn(
+                self._destroy_stale_router_namespaces, ns_to_destroy)
+        else:
+            self._destroy_stale_router_namespaces(ns_to_destroy)
 
     def _destroy_stale_router_namespaces(self, router_namespaces):
         """Destroys the stale router namespaces
@@ -631,15 +710,52 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         As some stale router namespaces may not be able to be deleted, only
         one attempt will be made to delete them.
         """
-        for ns in router_namespaces:
-            ra.disable_ipv6_ra(ns[len(NS_PREFIX):], ns, self.root_helper)
-            try:
-                self._destroy_namespace(ns)
-            except RuntimeError:
-                LOG.exception(_('Failed to destroy stale router namespace '
-                                '%s'), ns)
+        stats = self.ns_cleanup_stats
+        stats.update(stale=len(router_namespaces), destroyed=0, failed=0,
+                     skipped=0)
+        if router_namespaces:
+            LOG.info(_("Destroying %d stale router namespaces"),
+                     len(router_namespaces))
+        workers = self.conf.namespace_cleanup_workers
+        if workers > 0:
+            pool = eventlet.GreenPool(size=workers)
+            for ns in router_namespaces:
+                pool.spawn_n(self._destroy_stale_router_namespace, ns)
+            pool.waitall()
+        else:
+            for ns in router_namespaces:
+                self._destroy_stale_router_namespace(ns)
+        if router_namespaces:
+            LOG.info(_("Stale router namespace cleanup finished: "
+                       "%(destroyed)d destroyed, %(failed)d failed, "
+                       "%(skipped)d skipped"), stats)
         self._clean_stale_namespaces = False
 
+    def _destroy_stale_router_namespace(self, ns):
+        # Live routers come first, only destroy while no update is pending
+        if self.conf.namespace_cleanup_workers > 0:
+            while not self._queue.empty():
+                eventlet.sleep(RPC_LOOP_INTERVAL)
+        stats = self.ns_cleanup_stats
+        router_id = ns.split('-', 1)[1]
+        if router_id in self.router_info:
+            # The router was added to this agent since namespaces were listed
+            stats['skipped'] += 1
+            return
+        ra.disable_ipv6_ra(router_id, ns, self.root_helper)
+        try:
+            self._destroy_namespace(ns)
+            stats['destroyed'] += 1
+        except RuntimeError:
+            stats['failed'] += 1
+            LOG.exception(_('Failed to destroy stale router namespace '
+                            '%s'), ns)
+        done = stats['destroyed'] + stats['failed'] + stats['skipped']
+        if done % 100 == 0:
+            LOG.info(_("Stale router namespace cleanup progress: "
+                       "%(done)d/%(stale)d"),
+                     {'done': done, 'stale': stats['stale']})
+
     def _destroy_namespace(self, ns):
         if ns.startswith(NS_PREFIX):
             if self.conf.enable_metadata_proxy:
@@ -776,12 +892,12 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         ri.router['gw_port'] = None
         ri.router[l3_constants.INTERFACE_KEY] = []
         ri.router[l3_constants.FLOATINGIP_KEY] = []
-        self.process_router(ri)
+        # The metadata rules are removed along the rules of the router
         for c, r in self.metadata_filter_rules():
             ri.iptables_manager.ipv4['filter'].remove_rule(c, r)
         for c, r in self.metadata_nat_rules():
             ri.iptables_manager.ipv4['nat'].remove_rule(c, r)
-        ri.iptables_manager.apply()
+        self.process_router(ri)
         if self.conf.enable_metadata_proxy:
             self._destroy_metadata_proxy(ri.router_id, ri.ns_name)
         del self.router_info[router_id]
@@ -855,7 +971,9 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         # TODO(mrsmith) - we shouldn't need to check here
         if 'distributed' not in ri.router:
             ri.router['distributed'] = False
+        # All the iptables changes of this pass are applied at once
         ri.iptables_manager.defer_apply_on()
+        apply_count = ri.iptables_manager.apply_count
         ex_gw_port = self._get_ex_gw_port(ri)
         internal_ports = ri.router.get(l3_constants.INTERFACE_KEY, [])
         snat_ports = ri.router.get(l3_constants.SNAT_ROUTER_INTF_KEY, [])
@@ -952,13 +1070,19 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         # Process SNAT/DNAT rules for floating IPs
         fip_statuses = {}
         try:
-            if ex_gw_port:
-                existing_floating_ips = ri.floating_ips
-                LOG.info('changzhi router %s self.process_router_floating_ip_nat_rules', ri.router_id)
-                self.process_router_floating_ip_nat_rules(ri, ex_gw_port)
-                LOG.info('changzhi router %s self.process_router_floating_ip_nat_rules end', ri.router_id)
-                self.process_router_floating_ip_ratelimit_rules(ri, ex_gw_port)
+            try:
+                if ex_gw_port:
+                    existing_floating_ips = ri.floating_ips
+                    LOG.info('changzhi router %s self.process_router_floating_ip_nat_rules', ri.router_id)
+                    self.process_router_floating_ip_nat_rules(ri, ex_gw_port)
+                    LOG.info('changzhi router %s self.process_router_floating_ip_nat_rules end', ri.router_id)
+                    if not ri.defer_slow_work:
+                        self.process_router_floating_ip_ratelimit_rules(
+                            ri, ex_gw_port)
+            finally:
+                # Single iptables apply of the processing pass
                 ri.iptables_manager.defer_apply_off()
+            if ex_gw_port:
                 LOG.info('changzhi router %s self.process_router_floating_ip_addresses', ri.router_id)
                 # Once NAT rules for floating IPs are safely in place
                 # configure their addresses on the external gateway port
@@ -984,6 +1108,19 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         ri.ex_gw_port = ex_gw_port
         ri.snat_ports = snat_ports
         ri.enable_snat = ri.router.get('enable_snat')
+        ri.iptables_applies = ri.iptables_manager.apply_count - apply_count
+        LOG.debug(_("Router %(router_id)s processed with %(applies)d "
+                    "iptables applies"),
+                  {'router_id': ri.router_id,
+                   'applies': ri.iptables_applies})
+        # The revision is recorded only once the router is completely
+        # processed, so that a full sync reprocesses the routers whose
+        # processing failed or was deferred
+        if (ri.defer_slow_work or l3_constants.FLOATINGIP_STATUS_ERROR in
+                fip_statuses.values()):
+            ri.sync_revision = None
+        else:
+            ri.sync_revision = ri.router.get(l3_constants.SYNC_REVISION_KEY)
 
     def _handle_router_snat_rules(self, ri, ex_gw_port, internal_cidrs,
                                   interface_name, action):
@@ -1058,7 +1195,7 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
             for chain, rule in self.floating_forward_rules(fip_ip, fixed):
                 ri.iptables_manager.ipv4['nat'].add_rule(chain, rule,
                                                          tag='floating_ip')
-        if ex_gw_port:
+        if ex_gw_port and not ri.defer_slow_work:
             if cfg.CONF.uos_metering and cfg.CONF.metering_interval:
                 LOG.info('changzhi router %s start process_metering_label', ri.router_id)
                 self.process_metering_label(ri)
@@ -1105,6 +1242,17 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         device = ip_lib.IPDevice(interface_name, self.root_helper,
                                  namespace=ri.ns_name)
         existing_cidrs = set([addr['cidr'] for addr in device.addr.list()])
+        if not ri.router['distributed']:
+            fip_cidrs = self._get_floating_ip_cidrs(floating_ips)
+            stale_cidrs = [ip_cidr for ip_cidr in existing_cidrs - fip_cidrs
+                           if ip_cidr.endswith(FLOATING_IP_CIDR_SUFFIX)]
+            new_fips = [fip for fip in floating_ips
+                        if self._get_floating_ip_cidr(fip) not in
+                        existing_cidrs]
+            if len(new_fips) + len(stale_cidrs) > 1:
+                return self._process_floating_ip_addresses_batch(
+                    ri, device, interface_name, floating_ips, new_fips,
+                    stale_cidrs)
         new_cidrs = set()
 
         # Loop once to ensure that floating ips are configured.
@@ -1152,6 +1300,54 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
 
         return fip_statuses
 
+    def _get_floating_ip_cidr(self, fip):
+        return str(fip['floating_ip_address']) + FLOATING_IP_CIDR_SUFFIX
+
+    def _get_floating_ip_cidrs(self, floating_ips):
+        return set(self._get_floating_ip_cidr(fip) for fip in floating_ips)
+
+    def _process_floating_ip_addresses_batch(self, ri, device, interface_name,
+                                             floating_ips, new_fips,
+                                             stale_cidrs):
+        """Add and remove floating IP addresses with a single ip process.
+
+        Gratuitous ARPs for the new addresses are sent in the background, the
+        statuses are returned as soon as the addresses are configured.
+        """
+        commands = []
+        for fip in new_fips:
+            net = netaddr.IPNetwork(self._get_floating_ip_cidr(fip))
+            commands.append('addr add %s brd %s scope global dev %s' %
+                            (net, net.broadcast, interface_name))
+        for ip_cidr in stale_cidrs:
+            commands.append('addr del %s dev %s' % (ip_cidr, interface_name))
+        ip_wrapper = ip_lib.IPWrapper(self.root_helper, namespace=ri.ns_name)
+        failed_fip_ids = set()
+        try:
+            ip_wrapper.batch(commands)
+        except RuntimeError:
+            # Find out which addresses could not be configured
+            configured_cidrs = set(addr['cidr']
+                                   for addr in device.addr.list())
+            failed_fip_ids = set(
+                fip['id'] for fip in new_fips
+                if self._get_floating_ip_cidr(fip) not in configured_cidrs)
+            LOG.warn(_("Unable to configure IP address for floating IPs: "
+                       "%s"), ', '.join(failed_fip_ids))
+
+        fip_statuses = {}
+        for fip in floating_ips:
+            if fip['id'] in failed_fip_ids:
+                fip_statuses[fip['id']] = l3_constants.FLOATINGIP_STATUS_ERROR
+            else:
+                fip_statuses[fip['id']] = (
+                    l3_constants.FLOATINGIP_STATUS_ACTIVE)
+        for fip in new_fips:
+            if fip['id'] not in failed_fip_ids:
+                self._send_gratuitous_arp_packet(
+                    ri.ns_name, interface_name, fip['floating_ip_address'])
+        return fip_statuses
+
     def _get_ex_gw_port(self, ri):
         return self._uos_get_ex_gw_port(ri)
 
@@ -1179,8 +1375,16 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
     def _send_gratuitous_arp_packet(self, ns_name, interface_name, ip_address,
                                     distributed=False):
         if self.conf.send_arp_for_ha > 0:
-            eventlet.spawn_n(self._arping, ns_name, interface_name, ip_address,
-                             distributed)
+            if self._garp_worker is None:
+                self._garp_worker = eventlet.spawn(self._garp_loop)
+            self._garp_queue.put((ns_name, interface_name, ip_address,
+                                  distributed))
+
+    def _garp_loop(self):
+        """Send the queued gratuitous ARPs with a bounded concurrency."""
+        pool = eventlet.GreenPool(size=self.conf.send_arp_concurrency)
+        while True:
+            pool.spawn_n(self._arping, *self._garp_queue.get())
 
     def get_internal_port(self, ri, subnet_id):
         """Return internal router port based on subnet_id."""
@@ -1720,6 +1924,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
                     device.neigh.delete(net.version, ip, mac)
             except Exception:
                 LOG.exception(_("DVR: Failed updating arp entry"))
+                # Reprocess the router on the full sync
+                ri.sync_revision = None
                 self.fullsync = True
 
     def add_arp_entry(self, context, payload):
@@ -1751,8 +1957,10 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
             # This is needed for backward compatibility
             if isinstance(routers[0], dict):
                 routers = [router['id'] for router in routers]
+            now = timeutils.utcnow()
             for id in routers:
-                update = RouterUpdate(id, PRIORITY_RPC)
+                self._router_activity[id] = now
+                update = RouterUpdate(id, PRIORITY_RPC, timestamp=now)
                 self._queue.add(update)
 
     def router_removed_from_agent(self, context, payload):
@@ -1765,7 +1973,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         LOG.debug(_('Got router added to agent :%r'), payload)
         self.routers_updated(context, payload)
 
-    def _process_routers(self, routers, all_routers=False):
+    def _process_routers(self, routers, all_routers=False,
+                         defer_slow_work=False):
         pool = eventlet.GreenPool()
         if (self.conf.external_network_bridge and
             not ip_lib.device_exists(self.conf.external_network_bridge)):
@@ -1805,6 +2014,7 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
                 self._router_added(r['id'], r)
             ri = self.router_info[r['id']]
             ri.router = r
+            ri.defer_slow_work = defer_slow_work
             pool.spawn_n(self.process_router, ri)
         # identify and remove routers that no longer exist
         for router_id in prev_router_ids - cur_router_ids:
@@ -1833,9 +2043,24 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
                 self._router_removed(update.id)
                 continue
 
-            self._process_routers([router])
+            if (update.priority == PRIORITY_DEFERRED_WORK and
+                update.id not in self.router_info):
+                # The router went away since its slow work was deferred
+                continue
+
+            self._process_routers([router],
+                                  defer_slow_work=update.defer_slow_work)
             LOG.info("Finished a router update for %s", update.id)
-            rp.fetched_and_processed(update.timestamp)
+            if update.defer_slow_work:
+                # The data is not recorded as processed, so that this update
+                # is skipped only if a newer update processed the router
+                # completely in the meantime.
+                self._queue.add(RouterUpdate(update.id,
+                                             PRIORITY_DEFERRED_WORK,
+                                             router=router,
+                                             timestamp=update.timestamp))
+            else:
+                rp.fetched_and_processed(update.timestamp)
 
     def _process_routers_loop(self):
         LOG.debug("Starting _process_routers_loop")
@@ -1877,17 +2102,29 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
             self.updated_routers.clear()
             self.removed_routers.clear()
             timestamp = timeutils.utcnow()
-            routers = self.plugin_rpc.get_routers(
-                context, router_ids)
+            unchanged_router_ids = set()
+            if self.conf.sync_routers_with_revisions:
+                routers, unchanged_router_ids = self._fetch_changed_routers(
+                    context, router_ids)
+            else:
+                routers = self.plugin_rpc.get_routers(
+                    context, router_ids)
 
             LOG.debug(_('Processing :%r'), routers)
+            defer_slow_work = (self.conf.startup_defer_slow_work and
+                               not self._startup_sync_done)
+            self._expire_router_activity()
             for r in routers:
                 update = RouterUpdate(r['id'],
                                       PRIORITY_SYNC_ROUTERS_TASK,
                                       router=r,
-                                      timestamp=timestamp)
+                                      timestamp=timestamp,
+                                      weight=self._get_router_weight(r),
+                                      defer_slow_work=(defer_slow_work and
+                                                       bool(r.get('gw_port'))))
                 self._queue.add(update)
             self.fullsync = False
+            self._startup_sync_done = True
             LOG.debug(_("_sync_routers_task successfully completed"))
         except n_rpc.RPCException:
             LOG.exception(_("Failed synchronizing routers due to RPC error"))
@@ -1898,6 +2135,7 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
         else:
             # Resync is not necessary for the cleanup of stale namespaces
             curr_router_ids = set([r['id'] for r in routers])
+            curr_router_ids |= unchanged_router_ids
 
             # Two kinds of stale routers:  Routers for which info is cached in
             # self.router_info and the others.  First, handle the former.
@@ -1914,6 +2152,51 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager,
                 ids_to_keep = curr_router_ids | prev_router_ids
                 self._cleanup_namespaces(namespaces, ids_to_keep)
 
+    def _expire_router_activity(self):
+        now = timeutils.utcnow()
+        for router_id, timestamp in self._router_activity.items():
+            if timeutils.delta_seconds(timestamp,
+                                       now) > ROUTER_ACTIVITY_WINDOW:
+                del self._router_activity[router_id]
+
+    def _get_router_weight(self, router):
+        """Order the routers of a full sync, lower weights come first.
+
+        Routers exposing floating IPs or port forwardings come first, then
+        routers with a gateway, then internal only routers. Within each of
+        them recently notified routers and routers with more interfaces are
+        processed first.
+        """
+        if (router.get(l3_constants.FLOATINGIP_KEY) or
+            router.get('portforwardings')):
+            tier = 0
+        elif router.get('gw_port'):
+            tier = 1
+        else:
+            tier = 2
+        return (tier,
+                router['id'] not in self._router_activity,
+                -len(router.get(l3_constants.INTERFACE_KEY, [])))
+
+    def _fetch_changed_routers(self, context, router_ids):
+        """Fetch the routers which changed since the agent last got them.
+
+        Returns the list of changed routers and the set of ids of the
+        routers the server reported unchanged.
+        """
+        revisions = {}
+        for router_id, ri in self.router_info.items():
+            if ri.sync_revision is not None:
+                revisions[router_id] = ri.sync_revision
+        result = self.plugin_rpc.get_routers_with_revisions(
+            context, router_ids, revisions)
+        unchanged_router_ids = set(result['unchanged'])
+        LOG.debug(_("%(changed)d routers changed, %(unchanged)d routers "
+                    "unchanged since last sync"),
+                  {'changed': len(result['routers']),
+                   'unchanged': len(unchanged_router_ids)})
+        return result['routers'], unchanged_router_ids
+
     def after_start(self):
         eventlet.spawn_n(self._process_routers_loop)
         LOG.info(_("L3 agent started"))
@@ -2018,6 +2301,10 @@ class L3NATAgentWithStateReport(L3NATAgent):
         configurations['ex_gw_ports'] = num_ex_gw_ports
         configurations['interfaces'] = num_interfaces
         configurations['floating_ips'] = num_floating_ips
+        stats = self.ns_cleanup_stats
+        configurations['stale_namespaces_pending'] = (
+            stats['stale'] - stats['destroyed'] - stats['failed'] -
+            stats['skipped'])
         try:
             self.state_rpc.report_state(self.context, self.agent_state,
                                         self.use_call)
@@ -15,12 +15,14 @@
 
 import abc
 import collections
+import hashlib
 import os
 import re
 import shutil
 import socket
 import sys
 
+import eventlet
 import netaddr
 from oslo.config import cfg
 import six
@@ -59,6 +61,14 @@ OPTS = [
         help=_('Limit number of leases to prevent a denial-of-service.')),
     cfg.BoolOpt('kill_dhcp_process', default=False,
         help='Kill dhcp process when restart dhcp agent'),
+    cfg.BoolOpt('dhcp_release_batch', default=False,
+                help=_("Release the IPv4 leases of deleted ports with one "
+                       "neutron-dhcp-release call per DHCP server instead "
+                       "of one dhcp_release call per lease.")),
+    cfg.BoolOpt('dhcp_release_in_background', default=False,
+                help=_("Release the leases of deleted ports in the "
+                       "background once the DHCP server was reloaded, "
+                       "instead of before reloading it.")),
 ]
 
 IPV4 = 4
@@ -76,6 +86,9 @@ METADATA_PORT = 80
 WIN2k3_STATIC_DNS = 249
 NS_PREFIX = 'qdhcp-'
 
+# Digest of the content last written by the agent, by config file name
+_conf_file_digests = {}
+
 
 class DictModel(dict):
     """Convert dict into an object that provides attribute access to values."""
@@ -132,6 +145,130 @@ class NetModel(DictModel):
         return self._ns_name
 
 
+class SlotModel(object):
+    """Memory lean record providing attribute and dict style access.
+
+    Keys listed in the __slots__ of a subclass are stored in slots, any other
+    key is kept in a dict which is only created when such a key exists.
+    String values found in `shared` are replaced by the shared instance so
+    that ids repeated on every record are only stored once.
+    """
+
+    __slots__ = ('_extra',)
+    __hash__ = None
+
+    def __init__(self, d, shared=None):
+        object.__setattr__(self, '_extra', None)
+        for key, value in d.items():
+            if shared and isinstance(value, basestring):
+                value = shared.get(value, value)
+            setattr(self, key, value)
+
+    def __getattr__(self, name):
+        # Only called when the slot is unset or the key is not a slot
+        if name == '_extra' or name.startswith('__'):
+            raise AttributeError(name)
+        extra = self._extra
+        if extra and name in extra:
+            return extra[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in self._fields:
+            object.__setattr__(self, name, value)
+        else:
+            if self._extra is None:
+                object.__setattr__(self, '_extra', {})
+            self._extra[name] = value
+
+    def __delattr__(self, name):
+        if name in self._fields:
+            object.__delattr__(self, name)
+        else:
+            try:
+                del self._extra[name]
+            except (KeyError, TypeError):
+                raise AttributeError(name)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def items(self):
+        items = []
+        for name in self.__slots__:
+            try:
+                items.append((name, object.__getattribute__(self, name)))
+            except AttributeError:
+                pass
+        if self._extra:
+            items.extend(self._extra.items())
+        return items
+
+    def keys(self):
+        return [key for key, value in self.items()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, SlotModel):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.to_dict())
+
+    def __reduce__(self):
+        return self.__class__, (self.to_dict(),)
+
+
+class FixedIpModel(SlotModel):
+
+    __slots__ = ('subnet_id', 'ip_address')
+    _fields = frozenset(__slots__)
+
+
+class PortModel(SlotModel):
+
+    __slots__ = ('id', 'name', 'network_id', 'tenant_id', 'mac_address',
+                 'admin_state_up', 'status', 'device_id', 'device_owner',
+                 'fixed_ips', 'extra_dhcp_opts', 'security_groups',
+                 'allowed_address_pairs')
+    _fields = frozenset(__slots__)
+
+    def __init__(self, d, shared=None):
+        super(PortModel, self).__init__(d, shared)
+        fixed_ips = getattr(self, 'fixed_ips', None)
+        if fixed_ips:
+            self.fixed_ips = [
+                FixedIpModel(ip, shared) if isinstance(ip, dict) else ip
+                for ip in fixed_ips]
+
+
+class SubnetModel(SlotModel):
+
+    __slots__ = ('id', 'name', 'network_id', 'tenant_id', 'cidr',
+                 'ip_version', 'gateway_ip', 'enable_dhcp', 'dns_nameservers',
+                 'host_routes', 'allocation_pools', 'ipv6_ra_mode',
+                 'ipv6_address_mode')
+    _fields = frozenset(__slots__)
+
+
 @six.add_metaclass(abc.ABCMeta)
 class DhcpBase(object):
 
@@ -169,6 +306,14 @@ class DhcpBase(object):
         self.disable(retain_port=True)
         self.enable()
 
+    def adopt(self):
+        """Reuse the DHCP server already running for the network.
+
+        Returns True if the running server matches the network and was kept,
+        False if the server must be enabled.
+        """
+        return False
+
     @abc.abstractproperty
     def active(self):
         """Boolean representing the running state of the DHCP server."""
@@ -243,6 +388,34 @@ class DhcpLocalProcess(DhcpBase):
         confs_dir = os.path.abspath(os.path.normpath(self.conf.dhcp_confs))
         conf_dir = os.path.join(confs_dir, self.network.id)
         shutil.rmtree(conf_dir, ignore_errors=True)
+        for file_name in _conf_file_digests.keys():
+            if os.path.dirname(file_name) == conf_dir:
+                del _conf_file_digests[file_name]
+
+    def _replace_conf_file(self, file_name, data):
+        """Write a config file unless it already has the given content.
+
+        Returns True if the file was written.
+        """
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        digest = hashlib.md5(data).hexdigest()
+        if file_name not in _conf_file_digests:
+            # Files left by a previous run of the agent
+            try:
+                with open(file_name, 'rb') as f:
+                    _conf_file_digests[file_name] = hashlib.md5(
+                        f.read()).hexdigest()
+            except IOError:
+                pass
+        if (_conf_file_digests.get(file_name) == digest and
+            os.path.exists(file_name)):
+            LOG.debug(_('Config file %s is unchanged'), file_name)
+            return False
+        utils.replace_file(file_name, data)
+        _conf_file_digests[file_name] = digest
+        self.conf_files_changed = True
+        return True
 
     def get_conf_file_name(self, kind, ensure_conf_dir=False):
         """Returns the file name for a given kind of config file."""
@@ -289,6 +462,19 @@ class DhcpLocalProcess(DhcpBase):
         except IOError:
             return False
 
+    def _get_process_cmdline(self):
+        """Return the arguments of the running DHCP process, if any."""
+        pid = self.pid
+        if pid is None:
+            return
+
+        cmdline = '/proc/%s/cmdline' % pid
+        try:
+            with open(cmdline, "r") as f:
+                return f.readline().rstrip('\0').split('\0')
+        except IOError:
+            return
+
     @property
     def interface_name(self):
         return self._get_value_from_conf_file('interface')
@@ -304,6 +490,41 @@ class DhcpLocalProcess(DhcpBase):
         pass
 
 
+class LeaseReleaser(object):
+    """Release DHCP leases in a background green thread.
+
+    The leases queued for a DHCP server before the thread gets to it are
+    released together, with the release function queued last for it.
+    """
+
+    def __init__(self):
+        # Release function and leases of each DHCP server
+        self._pending = collections.OrderedDict()
+        self._running = False
+
+    def add(self, key, leases, release):
+        pending = self._pending.pop(key, (None, set()))
+        self._pending[key] = (release, pending[1] | set(leases))
+        if not self._running:
+            self._running = True
+            eventlet.spawn_n(self._run)
+
+    def _run(self):
+        try:
+            while self._pending:
+                key, (release, leases) = self._pending.popitem(last=False)
+                try:
+                    release(leases)
+                except Exception:
+                    LOG.exception(_('Unable to release the DHCP leases of '
+                                    '%s'), key)
+        finally:
+            self._running = False
+
+
+_lease_releaser = LeaseReleaser()
+
+
 class Dnsmasq(DhcpLocalProcess):
     # The ports that need to be opened when security policies are active
     # on the Neutron port used for DHCP.  These are provided as a convenience
@@ -350,12 +571,8 @@ class Dnsmasq(DhcpLocalProcess):
             if uuidutils.is_uuid_like(c)
         ]
 
-    def spawn_process(self):
-        """Spawns a Dnsmasq process for the network."""
-        env = {
-            self.NEUTRON_NETWORK_ID_KEY: self.network.id,
-        }
-
+    def _build_cmdline(self):
+        """Write the config files and return the dnsmasq command line."""
         cmd = [
             'dnsmasq',
             '--no-hosts',
@@ -419,10 +636,47 @@ class Dnsmasq(DhcpLocalProcess):
         if self.conf.dhcp_domain:
             cmd.append('--domain=%s' % self.conf.dhcp_domain)
 
+        return cmd
+
+    def spawn_process(self):
+        """Spawns a Dnsmasq process for the network."""
+        env = {
+            self.NEUTRON_NETWORK_ID_KEY: self.network.id,
+        }
+
+        cmd = self._build_cmdline()
         ip_wrapper = ip_lib.IPWrapper(self.root_helper,
                                       self.network.namespace)
         ip_wrapper.netns.execute(cmd, addl_env=env)
 
+    def adopt(self):
+        """Keep the dnsmasq left running by a previous run of the agent.
+
+        The process is kept if it was started with the command line this
+        network requires and the DHCP device is set up for the network, its
+        config files are updated and it is signaled only if they changed.
+        Neither the DHCP port nor the device are changed.
+        """
+        if not self._enable_dhcp() or not self.active:
+            return False
+        interface_name = self.interface_name
+        if not self.device_manager.is_setup(self.network, interface_name):
+            LOG.debug(_('DHCP device of network %s is not set up, not '
+                        'adopting dnsmasq'), self.network.id)
+            return False
+
+        self.conf_files_changed = False
+        self._release_unused_leases()
+        if self._build_cmdline() != self._get_process_cmdline():
+            LOG.debug(_('Options of dnsmasq of network %s changed, not '
+                        'adopting it'), self.network.id)
+            return False
+        if self.conf_files_changed:
+            utils.execute(['kill', '-HUP', self.pid], self.root_helper)
+        self.device_manager.update(self.network, interface_name)
+        LOG.debug(_('Adopted dnsmasq of network %s'), self.network.id)
+        return True
+
     def _release_lease(self, mac_address, ip):
         """Release a DHCP lease."""
         cmd = ['dhcp_release', self.interface_name, ip, mac_address]
@@ -440,13 +694,18 @@ class Dnsmasq(DhcpLocalProcess):
                         'turned off DHCP: %s'), self.network.id)
             return
 
+        self.conf_files_changed = False
         self._release_unused_leases()
         self._output_hosts_file()
         self._output_addn_hosts_file()
         self._output_opts_file()
         if self.active:
-            cmd = ['kill', '-HUP', self.pid]
-            utils.execute(cmd, self.root_helper)
+            if self.conf_files_changed:
+                cmd = ['kill', '-HUP', self.pid]
+                utils.execute(cmd, self.root_helper)
+            else:
+                LOG.debug(_('Allocations of network %s are unchanged, not '
+                            'reloading dnsmasq'), self.network.id)
         else:
             LOG.debug(_('Pid %d is stale, relaunching dnsmasq'), self.pid)
         LOG.debug(_('Reloading allocations for network: %s'), self.network.id)
@@ -521,7 +780,7 @@ class Dnsmasq(DhcpLocalProcess):
                 buf.write('%s,%s,%s\n' %
                           (port.mac_address, name, ip_address))
 
-        utils.replace_file(filename, buf.getvalue())
+        self._replace_conf_file(filename, buf.getvalue())
         LOG.debug(_('Done building host file %s'), filename)
         return filename
 
@@ -543,8 +802,53 @@ class Dnsmasq(DhcpLocalProcess):
             for alloc in port.fixed_ips:
                 new_leases.add((alloc.ip_address, port.mac_address))
 
-        for ip, mac in old_leases - new_leases:
-            self._release_lease(mac, ip)
+        stale_leases = old_leases - new_leases
+        if not stale_leases:
+            return
+        if self.conf.dhcp_release_in_background:
+            _lease_releaser.add(self.network.id, stale_leases,
+                                self._release_leases)
+        else:
+            self._release_leases(stale_leases)
+
+    def _get_lease_server_ips(self):
+        """Return the IPv4 subnets and the server address on each of them."""
+        device_id = self.device_manager.get_device_id(self.network)
+        dhcp_ips = {}
+        for port in self.network.ports:
+            if port.device_id == device_id:
+                for alloc in port.fixed_ips:
+                    dhcp_ips[alloc.subnet_id] = alloc.ip_address
+        return [(netaddr.IPNetwork(subnet.cidr), dhcp_ips[subnet.id])
+                for subnet in self.network.subnets
+                if subnet.ip_version == 4 and subnet.id in dhcp_ips]
+
+    def _release_leases(self, leases):
+        """Release (ip, mac) DHCP leases.
+
+        With dhcp_release_batch, the IPv4 leases on the subnets of the DHCP
+        port are released with a single neutron-dhcp-release call.
+        """
+        batch = []
+        if self.conf.dhcp_release_batch:
+            server_ips = self._get_lease_server_ips()
+        else:
+            server_ips = []
+        for ip, mac in sorted(leases):
+            server_ip = None
+            if netaddr.valid_ipv4(ip):
+                server_ip = next((server_ip for cidr, server_ip in server_ips
+                                  if ip in cidr), None)
+            if server_ip:
+                batch.append('%s,%s,%s' % (ip, mac, server_ip))
+            else:
+                self._release_lease(mac, ip)
+        if batch:
+            cmd = ['neutron-dhcp-release',
+                   '--interface=%s' % self.interface_name] + batch
+            ip_wrapper = ip_lib.IPWrapper(self.root_helper,
+                                          self.network.namespace)
+            ip_wrapper.netns.execute(cmd)
 
     def _output_addn_hosts_file(self):
         """Writes a dnsmasq compatible additional hosts file.
@@ -562,7 +866,7 @@ class Dnsmasq(DhcpLocalProcess):
             # order to obtain it in PTR responses.
             buf.write('%s\t%s %s\n' % (alloc.ip_address, fqdn, hostname))
         addn_hosts = self.get_conf_file_name('addn_hosts')
-        utils.replace_file(addn_hosts, buf.getvalue())
+        self._replace_conf_file(addn_hosts, buf.getvalue())
         return addn_hosts
 
     def _output_opts_file(self):
@@ -674,7 +978,7 @@ class Dnsmasq(DhcpLocalProcess):
                                                                   vx_ips))))
 
         name = self.get_conf_file_name('opts')
-        utils.replace_file(name, '\n'.join(options))
+        self._replace_conf_file(name, '\n'.join(options))
         return name
 
     def _make_subnet_interface_ip_map(self):
@@ -956,6 +1260,55 @@ class DeviceManager(object):
 
         return interface_name
 
+    def is_setup(self, network, device_name):
+        """Check if the device of the network's DHCP is set up on this host.
+
+        The device must have the MAC and IP addresses of the DHCP port of
+        the host, which must have an IP address on each DHCP enabled subnet.
+        The DHCP port is neither fetched nor updated.
+        """
+        if not device_name:
+            return False
+        device_id = self.get_device_id(network)
+        for port in network.ports:
+            if getattr(port, 'device_id', None) == device_id:
+                break
+        else:
+            return False
+        if device_name != self.get_interface_name(network, port):
+            return False
+
+        subnets = dict((subnet.id, subnet) for subnet in network.subnets
+                       if subnet.enable_dhcp)
+        ip_cidrs = set()
+        for fixed_ip in port.fixed_ips:
+            subnet = subnets.get(fixed_ip.subnet_id)
+            if subnet:
+                net = netaddr.IPNetwork('%s/%s' % (
+                    fixed_ip.ip_address,
+                    netaddr.IPNetwork(subnet.cidr).prefixlen))
+                ip_cidrs.add(str(net))
+        subnet_ids = set(fixed_ip.subnet_id for fixed_ip in port.fixed_ips)
+        if not subnet_ids.issuperset(subnets):
+            return False
+        if (self.conf.enable_isolated_metadata and
+            self.conf.use_namespaces):
+            ip_cidrs.add(METADATA_DEFAULT_CIDR)
+
+        device = ip_lib.IPDevice(device_name,
+                                 self.root_helper,
+                                 network.namespace)
+        device.set_log_fail_as_error(False)
+        try:
+            if device.link.address != port.mac_address:
+                return False
+            device_cidrs = set(
+                address['cidr'] for address in
+                device.addr.list(scope='global', filters=['permanent']))
+        except RuntimeError:
+            return False
+        return ip_cidrs == device_cidrs
+
     def update(self, network, device_name):
         """Update device settings for the network's DHCP on this host."""
         if self.conf.use_namespaces:
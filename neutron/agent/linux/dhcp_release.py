@@ -0,0 +1,110 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Release many DHCP leases of a dnsmasq with a single process.
+
+Like the dhcp_release utility of dnsmasq, a DHCPRELEASE is sent on behalf of
+the client of each lease to the server address of the lease, from a socket
+bound to the DHCP interface. Leases are given as ip,mac,server_ip arguments.
+
+Usage: neutron-dhcp-release --interface <name> <ip,mac,server_ip> ...
+"""
+
+import random
+import socket
+import struct
+import sys
+
+import netaddr
+
+BOOTREQUEST = 1
+HTYPE_ETHER = 1
+DHCP_SERVER_PORT = 67
+DHCP_MAGIC_COOKIE = '\x63\x82\x53\x63'
+OPTION_MESSAGE_TYPE = 53
+OPTION_SERVER_ID = 54
+OPTION_END = 255
+DHCPRELEASE = 7
+# Not exported by the socket module of python 2
+SO_BINDTODEVICE = 25
+
+
+def build_release_packet(ip_address, mac_address, server_ip):
+    """Return the DHCPRELEASE packet of a lease."""
+    chaddr = netaddr.EUI(mac_address).packed
+    header = struct.pack('!BBBBIHH4s4s4s4s16s64s128s',
+                         BOOTREQUEST, HTYPE_ETHER, len(chaddr), 0,
+                         random.getrandbits(32), 0, 0,
+                         socket.inet_aton(ip_address), '\0' * 4, '\0' * 4,
+                         '\0' * 4, chaddr, '', '')
+    options = struct.pack('!BBB', OPTION_MESSAGE_TYPE, 1, DHCPRELEASE)
+    options += struct.pack('!BB4s', OPTION_SERVER_ID, 4,
+                           socket.inet_aton(server_ip))
+    return header + DHCP_MAGIC_COOKIE + options + chr(OPTION_END)
+
+
+def release_leases(interface_name, leases):
+    """Release (ip_address, mac_address, server_ip) leases.
+
+    Returns the number of leases which could not be released.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    failures = 0
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_BINDTODEVICE,
+                        interface_name + '\0')
+        for ip_address, mac_address, server_ip in leases:
+            try:
+                sock.sendto(build_release_packet(ip_address, mac_address,
+                                                 server_ip),
+                            (server_ip, DHCP_SERVER_PORT))
+            except (socket.error, netaddr.AddrFormatError, ValueError) as e:
+                sys.stderr.write(_('Unable to release lease of %(ip)s '
+                                   '%(mac)s: %(error)s\n') %
+                                 {'ip': ip_address, 'mac': mac_address,
+                                  'error': e})
+                failures += 1
+    finally:
+        sock.close()
+    return failures
+
+
+def parse_args(argv):
+    """Return the interface name and the leases of the command line."""
+    if argv[:1] == ['--interface'] and len(argv) > 1:
+        interface_name, args = argv[1], argv[2:]
+    elif argv and argv[0].startswith('--interface='):
+        interface_name, args = argv[0].split('=', 1)[1], argv[1:]
+    else:
+        interface_name, args = None, []
+    if not interface_name or not args:
+        raise ValueError(__doc__.strip().splitlines()[-1])
+    leases = []
+    for arg in args:
+        lease = arg.split(',')
+        if len(lease) != 3:
+            raise ValueError(_('Invalid lease %s') % arg)
+        leases.append(tuple(lease))
+    return interface_name, leases
+
+
+def main():
+    try:
+        interface_name, leases = parse_args(sys.argv[1:])
+    except ValueError as e:
+        sys.stderr.write('%s\n' % e)
+        sys.exit(2)
+    if release_leases(interface_name, leases):
+        sys.exit(1)
@@ -100,6 +100,26 @@ class IPWrapper(SubProcessBase):
     def device(self, name):
         return IPDevice(name, self.root_helper, self.namespace)
 
+    def batch(self, commands):
+        """Run several ip commands with a single ip process.
+
+        Each command is a string such as 'addr add 10.0.0.1/32 dev eth0'.
+        The commands after a failed one are still run, RuntimeError is
+        raised at the end if any of them failed.
+        """
+        if not commands:
+            return
+        if not self.root_helper:
+            raise exceptions.SudoRequired()
+        if self.namespace:
+            ip_cmd = ['ip', 'netns', 'exec', self.namespace, 'ip']
+        else:
+            ip_cmd = ['ip']
+        return utils.execute(ip_cmd + ['-force', '-batch', '-'],
+                             root_helper=self.root_helper,
+                             process_input='\n'.join(commands) + '\n',
+                             log_fail_as_error=self.log_fail_as_error)
+
     def get_devices(self, exclude_loopback=False):
         retval = []
         output = self._execute(['o', 'd'], 'link', ('list',),
@@ -293,6 +293,8 @@ class IptablesManager(object):
         self.root_helper = root_helper
         self.namespace = namespace
         self.iptables_apply_deferred = False
+        # Number of times the rules were applied, for instrumentation
+        self.apply_count = 0
         self.wrap_name = binary_name[:16]
 
         self.ipv4 = {'filter': IptablesTable(binary_name=self.wrap_name)}
@@ -376,6 +378,7 @@ class IptablesManager(object):
         self._apply()
 
     def _apply(self):
+        self.apply_count += 1
         lock_name = 'iptables'
         if self.namespace:
             lock_name += '-' + self.namespace
@@ -14,15 +14,19 @@
 #
 # @author: Mark McClain, DreamHost
 
+import collections
 import hashlib
 import hmac
+import multiprocessing
 import os
 import socket
 import sys
+import time
 
 import eventlet
 eventlet.monkey_patch()
 
+from eventlet import pools
 import httplib2
 from neutronclient.v2_0 import client
 from oslo.config import cfg
@@ -46,6 +50,53 @@ from neutron import wsgi
 LOG = logging.getLogger(__name__)
 
 
+class InstanceCache(object):
+    """LRU cache of the instance and tenant of remote addresses.
+
+    Entries expire after ttl seconds, or after negative_ttl seconds for
+    remote addresses no instance was found for. The hit and miss counters
+    are kept in shared memory, so that they sum up the lookups of all the
+    worker processes forked after the cache was created.
+    """
+
+    def __init__(self, ttl=0, negative_ttl=0, max_size=0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._hits = multiprocessing.RawValue('L', 0)
+        self._negative_hits = multiprocessing.RawValue('L', 0)
+        self._misses = multiprocessing.RawValue('L', 0)
+
+    def get(self, key):
+        """Return the cached (instance_id, tenant_id) of key, or None."""
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[0] < time.time():
+            self._misses.value += 1
+            return
+        # Refresh the LRU position of the key
+        self._entries[key] = entry
+        if entry[1][0] is None:
+            self._negative_hits.value += 1
+        else:
+            self._hits.value += 1
+        return entry[1]
+
+    def put(self, key, value):
+        ttl = self.ttl if value[0] is not None else self.negative_ttl
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + ttl, value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_stats(self):
+        return {'hits': self._hits.value,
+                'negative_hits': self._negative_hits.value,
+                'misses': self._misses.value}
+
+
 class MetadataProxyHandler(object):
     OPTS = [
         cfg.StrOpt('admin_user',
@@ -93,7 +144,26 @@ class MetadataProxyHandler(object):
                    help=_("Client certificate for nova metadata api server.")),
         cfg.StrOpt('nova_client_priv_key',
                    default='',
-                   help=_("Private key of client certificate."))
+                   help=_("Private key of client certificate.")),
+        cfg.IntOpt('nova_metadata_pool_size',
+                   default=100,
+                   help=_("Maximum number of keep-alive connections to the "
+                          "Nova metadata server per metadata worker, also "
+                          "bounding the number of requests proxied to it "
+                          "concurrently. 0 opens a new connection for each "
+                          "request.")),
+        cfg.IntOpt('metadata_cache_size',
+                   default=10000,
+                   help=_("Maximum number of remote addresses whose instance "
+                          "is cached, 0 disables the cache.")),
+        cfg.IntOpt('metadata_cache_ttl',
+                   default=5,
+                   help=_("Seconds the instance of a remote address is "
+                          "cached.")),
+        cfg.IntOpt('metadata_cache_negative_ttl',
+                   default=2,
+                   help=_("Seconds a remote address no instance was found "
+                          "for is cached.")),
     ]
 
     def __init__(self, conf):
@@ -103,6 +173,16 @@ class MetadataProxyHandler(object):
             self._cache = cache.get_cache(self.conf.cache_url)
         else:
             self._cache = False
+        self.instance_cache = InstanceCache(
+            self.conf.metadata_cache_ttl,
+            self.conf.metadata_cache_negative_ttl,
+            self.conf.metadata_cache_size)
+        self._nova_http_pool = None
+        if self.conf.nova_metadata_pool_size > 0:
+            self._nova_http_pool = pools.Pool(
+                max_size=self.conf.nova_metadata_pool_size,
+                order_as_stack=True,
+                create=self._create_nova_http)
 
     def _get_neutron_client(self):
         qclient = client.Client(
@@ -183,18 +263,25 @@ class MetadataProxyHandler(object):
         return self._get_ports_for_remote_address(remote_address, networks)
 
     def _get_instance_and_tenant_id(self, req):
-        qclient = self._get_neutron_client()
-
         remote_address = req.headers.get('X-Forwarded-For')
         network_id = req.headers.get('X-Neutron-Network-ID')
         router_id = req.headers.get('X-Neutron-Router-ID')
 
+        cache_key = (network_id, router_id, remote_address)
+        ids = self.instance_cache.get(cache_key)
+        if ids is not None:
+            return ids
+
+        qclient = self._get_neutron_client()
         ports = self._get_ports(remote_address, network_id, router_id)
 
         self.auth_info = qclient.get_auth_info()
         if len(ports) == 1:
-            return ports[0]['device_id'], ports[0]['tenant_id']
-        return None, None
+            ids = ports[0]['device_id'], ports[0]['tenant_id']
+        else:
+            ids = None, None
+        self.instance_cache.put(cache_key, ids)
+        return ids
 
     def _proxy_request(self, instance_id, tenant_id, req):
         headers = {
@@ -204,24 +291,22 @@ class MetadataProxyHandler(object):
             'X-Instance-ID-Signature': self._sign_instance_id(instance_id)
         }
 
-        nova_ip_port = '%s:%s' % (self.conf.nova_metadata_ip,
-                                  self.conf.nova_metadata_port)
         url = urlparse.urlunsplit((
             self.conf.nova_metadata_protocol,
-            nova_ip_port,
+            self._get_nova_ip_port(),
             req.path_info,
             req.query_string,
             ''))
 
-        h = httplib2.Http(ca_certs=self.conf.auth_ca_cert,
-                          disable_ssl_certificate_validation=
-                          self.conf.nova_metadata_insecure)
-        if self.conf.nova_client_cert and self.conf.nova_client_priv_key:
-            h.add_certificate(self.conf.nova_client_priv_key,
-                              self.conf.nova_client_cert,
-                              nova_ip_port)
-        resp, content = h.request(url, method=req.method, headers=headers,
-                                  body=req.body)
+        if self._nova_http_pool:
+            # Pooled clients keep their connection to nova alive
+            with self._nova_http_pool.item() as h:
+                resp, content = h.request(url, method=req.method,
+                                          headers=headers, body=req.body)
+        else:
+            h = self._create_nova_http()
+            resp, content = h.request(url, method=req.method,
+                                      headers=headers, body=req.body)
 
         if resp.status == 200:
             LOG.debug(str(resp))
@@ -248,6 +333,20 @@ class MetadataProxyHandler(object):
         else:
             raise Exception(_('Unexpected response code: %s') % resp.status)
 
+    def _get_nova_ip_port(self):
+        return '%s:%s' % (self.conf.nova_metadata_ip,
+                          self.conf.nova_metadata_port)
+
+    def _create_nova_http(self):
+        h = httplib2.Http(ca_certs=self.conf.auth_ca_cert,
+                          disable_ssl_certificate_validation=
+                          self.conf.nova_metadata_insecure)
+        if self.conf.nova_client_cert and self.conf.nova_client_priv_key:
+            h.add_certificate(self.conf.nova_client_priv_key,
+                              self.conf.nova_client_cert,
+                              self._get_nova_ip_port())
+        return h
+
     def _sign_instance_id(self, instance_id):
         return hmac.new(self.conf.metadata_proxy_shared_secret,
                         instance_id,
@@ -271,11 +370,11 @@ class WorkerService(wsgi.WorkerService):
 
 
 class UnixDomainWSGIServer(wsgi.Server):
-    def __init__(self, name):
+    def __init__(self, name, threads=1000):
         self._socket = None
         self._launcher = None
         self._server = None
-        super(UnixDomainWSGIServer, self).__init__(name)
+        super(UnixDomainWSGIServer, self).__init__(name, threads=threads)
 
     def start(self, application, file_socket, workers, backlog):
         self._socket = eventlet.listen(file_socket,
@@ -314,11 +413,16 @@ class UnixDomainMetadataProxy(object):
         cfg.IntOpt('metadata_backlog',
                    default=4096,
                    help=_('Number of backlog requests to configure the '
-                          'metadata server socket with'))
+                          'metadata server socket with')),
+        cfg.IntOpt('metadata_worker_concurrency',
+                   default=1000,
+                   help=_('Maximum number of requests served concurrently '
+                          'by each metadata worker')),
     ]
 
     def __init__(self, conf):
         self.conf = conf
+        self.handler = None
 
         dirname = os.path.dirname(cfg.CONF.metadata_proxy_socket)
         if os.path.isdir(dirname):
@@ -354,6 +458,9 @@ class UnixDomainMetadataProxy(object):
             self.heartbeat.start(interval=report_interval)
 
     def _report_state(self):
+        if self.handler:
+            self.agent_state['configurations']['metadata_cache'] = (
+                self.handler.instance_cache.get_stats())
         try:
             self.state_rpc.report_state(
                 self.context,
@@ -371,8 +478,13 @@ class UnixDomainMetadataProxy(object):
         self.agent_state.pop('start_flag', None)
 
     def run(self):
-        server = UnixDomainWSGIServer('neutron-metadata-agent')
-        server.start(MetadataProxyHandler(self.conf),
+        # The handler is created before the workers are forked so that
+        # their cache statistics are reported together
+        self.handler = MetadataProxyHandler(self.conf)
+        server = UnixDomainWSGIServer(
+            'neutron-metadata-agent',
+            threads=self.conf.metadata_worker_concurrency)
+        server.start(self.handler,
                      self.conf.metadata_proxy_socket,
                      workers=self.conf.metadata_workers,
                      backlog=self.conf.metadata_backlog)
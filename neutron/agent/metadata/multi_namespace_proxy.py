@@ -0,0 +1,197 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Metadata proxy serving many network namespaces from a single process.
+
+The proxy listens on the metadata port inside each namespace listed in its
+networks file. Each listening socket is created after moving the process
+into the namespace with setns(2), the process then goes back to its own
+namespace and the socket keeps accepting the connections of the namespace it
+was created in. Requests are forwarded to the metadata agent through its
+UNIX domain socket, as neutron-ns-metadata-proxy does.
+
+The networks file is a JSON object of entries keyed by network id, each
+entry giving the namespace and either the network_id or the router_id the
+requests are looked up with. The file is reread on SIGHUP.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import signal
+
+import eventlet
+eventlet.monkey_patch()
+
+from eventlet import event
+from eventlet import semaphore
+from eventlet import wsgi
+from oslo.config import cfg
+
+from neutron.agent.linux import daemon
+from neutron.agent.metadata import namespace_proxy
+from neutron.common import config
+from neutron.common import utils
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+NETNS_RUN_DIR = '/var/run/netns'
+CLONE_NEWNET = 0x40000000
+
+_libc = None
+
+
+def setns(fd):
+    """Move the calling thread into the network namespace open as fd."""
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if _libc.setns(fd, CLONE_NEWNET) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def listen_in_namespace(namespace, port, backlog=128):
+    """Return a socket listening on port inside the given namespace."""
+    with open('/proc/self/ns/net') as own_ns:
+        with open(os.path.join(NETNS_RUN_DIR, namespace)) as target_ns:
+            setns(target_ns.fileno())
+        try:
+            return eventlet.listen(('0.0.0.0', port), backlog=backlog)
+        finally:
+            setns(own_ns.fileno())
+
+
+def read_networks_file(networks_file):
+    """Return the entries of the networks file keyed by network id."""
+    try:
+        with open(networks_file, 'r') as f:
+            networks = jsonutils.loads(f.read())
+    except IOError:
+        return {}
+    except ValueError:
+        LOG.warn(_('Ignoring invalid networks file %s'), networks_file)
+        return {}
+    return dict((key, entry) for key, entry in networks.iteritems()
+                if entry.get('namespace') and
+                (entry.get('network_id') or entry.get('router_id')))
+
+
+class MultiNamespaceProxy(object):
+    """Serve the metadata of the networks listed in a networks file."""
+
+    def __init__(self, networks_file, port):
+        self.networks_file = networks_file
+        self.port = port
+        # Listening socket and server thread of each served entry
+        self.listeners = {}
+        self._reload_lock = semaphore.Semaphore()
+
+    def _start_listener(self, key, entry):
+        handler = namespace_proxy.NetworkMetadataProxyHandler(
+            entry.get('network_id'), entry.get('router_id'))
+        sock = listen_in_namespace(entry['namespace'], self.port)
+        thread = eventlet.spawn(wsgi.server, sock, handler,
+                                log=logging.WritableLogger(LOG))
+        self.listeners[key] = (entry, sock, thread)
+        LOG.debug('Serving metadata of network %(key)s in %(namespace)s',
+                  {'key': key, 'namespace': entry['namespace']})
+
+    def _stop_listener(self, key):
+        entry, sock, thread = self.listeners.pop(key)
+        thread.kill()
+        sock.close()
+        LOG.debug('Stopped serving metadata of network %s', key)
+
+    def reload(self):
+        """Serve the networks file entries, and only them."""
+        with self._reload_lock:
+            networks = read_networks_file(self.networks_file)
+            for key in set(self.listeners) - set(networks):
+                self._stop_listener(key)
+            for key, entry in networks.iteritems():
+                listener = self.listeners.get(key)
+                if listener and listener[0] == entry:
+                    continue
+                if listener:
+                    self._stop_listener(key)
+                try:
+                    self._start_listener(key, entry)
+                except Exception:
+                    LOG.exception(_('Unable to serve metadata of network '
+                                    '%(key)s in %(namespace)s'),
+                                  {'key': key,
+                                   'namespace': entry['namespace']})
+            LOG.info(_('Serving metadata in %d namespaces'),
+                     len(self.listeners))
+
+    def _handle_sighup(self, signum, frame):
+        eventlet.spawn_n(self.reload)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, self._handle_sighup)
+        self.reload()
+        event.Event().wait()
+
+
+class ProxyDaemon(daemon.Daemon):
+    def __init__(self, pidfile, networks_file, port, proxy_id):
+        super(ProxyDaemon, self).__init__(pidfile, uuid=proxy_id)
+        self.networks_file = networks_file
+        self.port = port
+
+    def run(self):
+        MultiNamespaceProxy(self.networks_file, self.port).run()
+
+
+def main():
+    opts = [
+        cfg.StrOpt('proxy_id',
+                   help=_('Identifier of this proxy, present in its command '
+                          'line.')),
+        cfg.StrOpt('networks_file',
+                   help=_('Location of the file listing the namespaces and '
+                          'networks whose metadata is proxied.')),
+        cfg.StrOpt('pid_file',
+                   help=_('Location of pid file of this process.')),
+        cfg.BoolOpt('daemonize',
+                    default=True,
+                    help=_('Run as daemon.')),
+        cfg.IntOpt('metadata_port',
+                   default=9697,
+                   help=_("TCP Port to listen for metadata server "
+                          "requests.")),
+        cfg.StrOpt('metadata_proxy_socket',
+                   default='$state_path/metadata_proxy',
+                   help=_('Location of Metadata Proxy UNIX domain '
+                          'socket'))
+    ]
+
+    cfg.CONF.register_cli_opts(opts)
+    # Don't get the default configuration file
+    cfg.CONF(project='neutron', default_config_files=[])
+    config.setup_logging(cfg.CONF)
+    utils.log_opt_values(LOG)
+    proxy = ProxyDaemon(cfg.CONF.pid_file,
+                        cfg.CONF.networks_file,
+                        cfg.CONF.metadata_port,
+                        cfg.CONF.proxy_id)
+
+    if cfg.CONF.daemonize:
+        proxy.start()
+    else:
+        proxy.run()
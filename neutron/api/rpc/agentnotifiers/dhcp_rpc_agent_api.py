@@ -17,6 +17,7 @@ from neutron.common import constants
 from neutron.common import rpc as n_rpc
 from neutron.common import topics
 from neutron.common import utils
+from neutron.db import dhcp_sync_revision_db
 from neutron import manager
 from neutron.openstack.common import log as logging
 
@@ -173,6 +174,9 @@ class DhcpAgentNotifyAPI(n_rpc.RpcProxy):
         if not network_id:
             return
         method_name = method_name.replace(".", "_")
+        if method_name != 'network_delete_end':
+            dhcp_sync_revision_db.bump_network_revisions(context,
+                                                         [network_id])
         if method_name.endswith("_delete_end"):
             if 'id' in obj_value:
                 self._notify_agents(context, method_name,
@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
 from oslo.config import cfg
 from oslo.db import exception as db_exc
 
@@ -21,6 +23,7 @@ from neutron.common import constants
 from neutron.common import exceptions as n_exc
 from neutron.common import rpc as n_rpc
 from neutron.common import utils
+from neutron.db import dhcp_sync_revision_db
 from neutron.extensions import portbindings
 from neutron import manager
 from neutron.openstack.common import excutils
@@ -29,7 +32,6 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
-
 class DhcpRpcCallback(n_rpc.RpcCallback):
     """DHCP agent RPC callback in plugin implementations."""
 
@@ -37,7 +39,10 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
     #     1.0 - Initial version.
     #     1.1 - Added get_active_networks_info, create_dhcp_port,
     #           and update_dhcp_port methods.
-    RPC_API_VERSION = '1.1'
+    #     1.2 - Added get_active_network_revisions and get_networks_info
+    #           methods.
+    #     1.3 - Added ensure_dhcp_ports method.
+    RPC_API_VERSION = '1.3'
 
     def _get_active_networks(self, context, **kwargs):
         """Retrieve and return a list of the active networks."""
@@ -58,12 +63,16 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
         """Perform port operations taking care of concurrency issues."""
         try:
             if action == 'create_port':
-                return plugin.create_port(context, port)
+                retval = plugin.create_port(context, port)
             elif action == 'update_port':
-                return plugin.update_port(context, port['id'], port['port'])
+                retval = plugin.update_port(context, port['id'],
+                                            port['port'])
             else:
                 msg = _('Unrecognized action')
                 raise n_exc.Invalid(message=msg)
+            dhcp_sync_revision_db.bump_network_revisions(
+                context, [retval['network_id']])
+            return retval
         except (db_exc.DBError, n_exc.NetworkNotFound,
                 n_exc.SubnetNotFound, n_exc.IpAddressGenerationFailure) as e:
             with excutils.save_and_reraise_exception(reraise=False) as ctxt:
@@ -98,18 +107,66 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
         host = kwargs.get('host')
         LOG.debug(_('get_active_networks_info from %s'), host)
         networks = self._get_active_networks(context, **kwargs)
+        return self._get_networks_details(context, networks,
+                                          dhcp_subnets_only=True)
+
+    def _get_networks_details(self, context, networks,
+                              dhcp_subnets_only=False):
+        """Add the subnets and ports to each of the given networks."""
+        if not networks:
+            return networks
         plugin = manager.NeutronManager.get_plugin()
         filters = {'network_id': [network['id'] for network in networks]}
         ports = plugin.get_ports(context, filters=filters)
-        filters['enable_dhcp'] = [True]
+        if dhcp_subnets_only:
+            filters['enable_dhcp'] = [True]
         subnets = plugin.get_subnets(context, filters=filters)
 
+        details = dict((network['id'], network) for network in networks)
         for network in networks:
-            network['subnets'] = [subnet for subnet in subnets
-                                  if subnet['network_id'] == network['id']]
-            network['ports'] = [port for port in ports
-                                if port['network_id'] == network['id']]
+            network['subnets'] = []
+            network['ports'] = []
+        for subnet in subnets:
+            details[subnet['network_id']]['subnets'].append(subnet)
+        for port in ports:
+            details[port['network_id']]['ports'].append(port)
+
+        return networks
+
+    def get_active_network_revisions(self, context, **kwargs):
+        """Return the revision of each active network by network id.
 
+        The revision is bumped each time the DHCP agents are notified of a
+        change of the network, agents use it to only fetch the networks
+        which changed since they last got them.
+        """
+        host = kwargs.get('host')
+        LOG.debug(_('get_active_network_revisions from %s'), host)
+        networks = self._get_active_networks(context, **kwargs)
+        return dhcp_sync_revision_db.get_network_revisions(
+            context, [network['id'] for network in networks])
+
+    def get_networks_info(self, context, **kwargs):
+        """Return the networks with the given ids, with subnets and ports.
+
+        Networks which do not exist anymore are left out.
+        """
+        network_ids = kwargs.get('network_ids')
+        host = kwargs.get('host')
+        LOG.debug(_('Info of %(count)d networks requested from %(host)s'),
+                  {'count': len(network_ids or []), 'host': host})
+        if not network_ids:
+            return []
+        plugin = manager.NeutronManager.get_plugin()
+        # NOTE: revisions must be read before the network data, a change
+        # notified in between then only makes the agent fetch it again.
+        revisions = dhcp_sync_revision_db.get_network_revisions(
+            context, network_ids)
+        networks = plugin.get_networks(context,
+                                       filters={'id': network_ids})
+        networks = self._get_networks_details(context, networks)
+        for network in networks:
+            network[constants.DHCP_REVISION_KEY] = revisions[network['id']]
         return networks
 
     def get_network_info(self, context, **kwargs):
@@ -120,6 +177,8 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
                     '%(host)s'), {'network_id': network_id,
                                   'host': host})
         plugin = manager.NeutronManager.get_plugin()
+        revisions = dhcp_sync_revision_db.get_network_revisions(
+            context, [network_id])
         try:
             network = plugin.get_network(context, network_id)
         except n_exc.NetworkNotFound:
@@ -129,6 +188,7 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
         filters = dict(network_id=[network_id])
         network['subnets'] = plugin.get_subnets(context, filters=filters)
         network['ports'] = plugin.get_ports(context, filters=filters)
+        network[constants.DHCP_REVISION_KEY] = revisions[network_id]
         return network
 
     def get_dhcp_port(self, context, **kwargs):
@@ -213,6 +273,94 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
 
         return retval
 
+    def ensure_dhcp_ports(self, context, **kwargs):
+        """Ensure the DHCP ports of the host on the given networks.
+
+        The port of the host on a network is created, or reused from a
+        reserved DHCP port, if it does not exist and is updated to have an
+        IP address on each DHCP enabled subnet. Existing ports, subnets and
+        networks are fetched by a single query each for all the networks.
+
+        Returns the DHCP port by network id, networks without DHCP enabled
+        subnet or whose port could not be set up are left out.
+        """
+        host = kwargs.get('host')
+        network_ids = kwargs.get('network_ids')
+        LOG.debug(_('DHCP ports of %(count)d networks requested from '
+                    '%(host)s'), {'count': len(network_ids or []),
+                                  'host': host})
+        if not network_ids:
+            return {}
+        plugin = manager.NeutronManager.get_plugin()
+        device_ids = dict(
+            (network_id, utils.get_dhcp_agent_device_id(network_id, host))
+            for network_id in network_ids)
+
+        networks = plugin.get_networks(context,
+                                       filters={'id': network_ids},
+                                       fields=['id', 'tenant_id'])
+        dhcp_subnet_ids = collections.defaultdict(list)
+        filters = {'network_id': network_ids, 'enable_dhcp': [True]}
+        for subnet in plugin.get_subnets(context, filters=filters,
+                                         fields=['id', 'network_id']):
+            dhcp_subnet_ids[subnet['network_id']].append(subnet['id'])
+        ports = {}
+        reserved_ports = {}
+        filters = {'network_id': network_ids,
+                   'device_id': (device_ids.values() +
+                                 [constants.DEVICE_ID_RESERVED_DHCP_PORT])}
+        for port in plugin.get_ports(context, filters=filters):
+            network_id = port['network_id']
+            if port['device_id'] == device_ids.get(network_id):
+                ports[network_id] = port
+            elif port['device_id'] == constants.DEVICE_ID_RESERVED_DHCP_PORT:
+                reserved_ports.setdefault(network_id, port)
+
+        dhcp_ports = {}
+        for network in networks:
+            network_id = network['id']
+            subnet_ids = dhcp_subnet_ids.get(network_id)
+            if not subnet_ids:
+                continue
+            port = ports.get(network_id)
+            if port:
+                port_subnet_ids = set(fixed_ip['subnet_id']
+                                      for fixed_ip in port['fixed_ips'])
+                missing_subnet_ids = [subnet_id for subnet_id in subnet_ids
+                                      if subnet_id not in port_subnet_ids]
+                if missing_subnet_ids:
+                    fixed_ips = port['fixed_ips'] + [
+                        dict(subnet_id=s) for s in missing_subnet_ids]
+                    port = self._port_action(
+                        plugin, context,
+                        {'id': port['id'],
+                         'port': {'network_id': network_id,
+                                  'fixed_ips': fixed_ips}},
+                        'update_port')
+            elif network_id in reserved_ports:
+                port = self._port_action(
+                    plugin, context,
+                    {'id': reserved_ports[network_id]['id'],
+                     'port': {'network_id': network_id,
+                              'device_id': device_ids[network_id]}},
+                    'update_port')
+            else:
+                port_dict = dict(
+                    admin_state_up=True,
+                    device_id=device_ids[network_id],
+                    network_id=network_id,
+                    tenant_id=network['tenant_id'],
+                    mac_address=attributes.ATTR_NOT_SPECIFIED,
+                    name='',
+                    device_owner=constants.DEVICE_OWNER_DHCP,
+                    fixed_ips=[dict(subnet_id=s) for s in subnet_ids])
+                port_dict[portbindings.HOST_ID] = host
+                port = self._port_action(plugin, context,
+                                         {'port': port_dict}, 'create_port')
+            if port:
+                dhcp_ports[network_id] = port
+        return dhcp_ports
+
     def release_dhcp_port(self, context, **kwargs):
         """Release the port currently being used by a DHCP agent."""
         host = kwargs.get('host')
@@ -224,6 +372,7 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
                   {'network_id': network_id, 'host': host})
         plugin = manager.NeutronManager.get_plugin()
         plugin.delete_ports_by_device_id(context, device_id, network_id)
+        dhcp_sync_revision_db.bump_network_revisions(context, [network_id])
 
     def release_port_fixed_ip(self, context, **kwargs):
         """Release the fixed_ip associated the subnet on a port."""
@@ -248,6 +397,8 @@ class DhcpRpcCallback(n_rpc.RpcCallback):
                     del fixed_ips[i]
                     break
             plugin.update_port(context, port['id'], dict(port=port))
+            dhcp_sync_revision_db.bump_network_revisions(context,
+                                                         [network_id])
 
     def update_lease_expiration(self, context, **kwargs):
         """Release the fixed_ip associated the subnet on a port."""
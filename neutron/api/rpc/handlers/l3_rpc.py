@@ -38,7 +38,8 @@ class L3RpcCallback(n_rpc.RpcCallback):
     # 1.1  Support update_floatingip_statuses
     # 1.2 Added methods for DVR support
     # 1.3 Added a method that returns the list of activated services
-    RPC_API_VERSION = '1.3'
+    # 1.4 Added sync_routers_with_revisions
+    RPC_API_VERSION = '1.4'
 
     @property
     def plugin(self):
@@ -76,7 +77,7 @@ class L3RpcCallback(n_rpc.RpcCallback):
                 self.l3plugin.list_active_sync_routers_on_active_l3_agent(
                     context, host, router_ids))
         else:
-            routers = self.l3plugin.get_sync_data(context, router_ids)
+            routers = self.l3plugin.get_sync_data_cached(context, router_ids)
         if utils.is_extension_supported(
             self.plugin, constants.PORT_BINDING_EXT_ALIAS):
             self._ensure_host_set_on_ports(context, host, routers)
@@ -84,6 +85,43 @@ class L3RpcCallback(n_rpc.RpcCallback):
                   jsonutils.dumps(routers, indent=5))
         return routers
 
+    def sync_routers_with_revisions(self, context, **kwargs):
+        """Sync the routers of an agent which changed since its last sync.
+
+        @param context: contain user information
+        @param kwargs: host, router_ids, revisions
+                       revisions is a dict of the revision by router id of
+                       the routers the agent already has
+        @return: a dict with the list of changed routers under 'routers'
+                 and the list of ids of unchanged routers under 'unchanged'
+        """
+        router_ids = kwargs.get('router_ids')
+        host = kwargs.get('host')
+        revisions = kwargs.get('revisions') or {}
+        context = neutron_context.get_admin_context()
+        if not self.l3plugin:
+            routers, unchanged_ids = [], []
+            LOG.error(_('No plugin for L3 routing registered! Will reply '
+                        'to l3 agent with empty router dictionary.'))
+        elif utils.is_extension_supported(
+                self.l3plugin, constants.L3_AGENT_SCHEDULER_EXT_ALIAS):
+            if cfg.CONF.router_auto_schedule:
+                self.l3plugin.auto_schedule_routers(context, host, router_ids)
+            routers, unchanged_ids = (
+                self.l3plugin.list_changed_sync_routers_on_active_l3_agent(
+                    context, host, router_ids, revisions))
+        else:
+            routers, unchanged_ids = self.l3plugin.get_changed_sync_data(
+                context, router_ids, revisions)
+        if utils.is_extension_supported(
+            self.plugin, constants.PORT_BINDING_EXT_ALIAS):
+            self._ensure_host_set_on_ports(context, host, routers)
+        LOG.debug(_("Routers returned to l3 agent:\n %(routers)s, "
+                    "unchanged routers: %(unchanged)s"),
+                  {'routers': jsonutils.dumps(routers, indent=5),
+                   'unchanged': unchanged_ids})
+        return {'routers': routers, 'unchanged': unchanged_ids}
+
     def _ensure_host_set_on_ports(self, context, host, routers):
         for router in routers:
             LOG.debug(_("Checking router: %(id)s for host: %(host)s"),
@@ -117,6 +155,10 @@ class L3RpcCallback(n_rpc.RpcCallback):
             try:
                 self.plugin.update_port(context, port['id'],
                                         {'port': {portbindings.HOST_ID: host}})
+                if router_id:
+                    # The binding is part of the router sync data, make
+                    # the next sync of the router return it
+                    self.l3plugin.bump_router_revisions(context, [router_id])
             except exceptions.PortNotFound:
                 LOG.debug("Port %(port)s not found while updating "
                           "agent binding for router %(router)s."
@@ -266,6 +266,10 @@ class Controller(object):
         if do_authz:
             # FIXME(salvatore-orlando): obj_getter might return references to
             # other resources. Must check authZ on them too.
+            # Load at once the parent resources the checks might refer to
+            policy.prefetch_parents(request.context,
+                                    self._plugin_handlers[self.SHOW],
+                                    obj_list)
             # Omit items from list that should not be visible
             obj_list = [obj for obj in obj_list
                         if policy.check(request.context,
@@ -20,6 +20,7 @@ Utility methods for working with WSGI servers redux
 import sys
 
 import netaddr
+from oslo.config import cfg
 import six
 import webob.dec
 import webob.exc
@@ -153,6 +154,16 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             contents = result['contents'].decode('base64')
             return file_response(request,status,content_type, content_disposition, contents)
 
+        batch_size = cfg.CONF.json_stream_batch_size
+        if (action == 'index' and batch_size > 0 and
+                hasattr(serializer, 'serialize_iter') and
+                _get_items_count(result) > batch_size):
+            # NOTE: large listings are encoded by batches while they are
+            # sent, rather than as a whole string held in memory
+            return webob.Response(
+                request=request, status=status, content_type=content_type,
+                app_iter=serializer.serialize_iter(result, batch_size))
+
         body = serializer.serialize(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
@@ -165,6 +176,14 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
     return resource
 
 
+def _get_items_count(result):
+    """Return the number of items of the lists of a listing result."""
+    if not isinstance(result, dict):
+        return 0
+    return sum(len(value) for value in result.itervalues()
+               if isinstance(value, list))
+
+
 def get_exception_data(e):
     """Extract the information about an exception.
 
@@ -54,6 +54,21 @@ core_opts = [
                help=_("The base MAC address Neutron will use for VIFs")),
     cfg.IntOpt('mac_generation_retries', default=16,
                help=_("How many times Neutron will retry MAC generation")),
+    cfg.IntOpt('mac_generation_block_size', default=0,
+               help=_("How many random MAC addresses each worker generates "
+                      "at once, checking them against the existing ports "
+                      "with a single query. 0 generates them one by one, "
+                      "relying only on the unique constraint of the ports")),
+    cfg.StrOpt('ip_allocation_strategy', default='ranges',
+               choices=['ranges', 'random'],
+               help=_("How the IP addresses of ports are generated. ranges "
+                      "takes the first address of the locked availability "
+                      "ranges of the subnet. random tries random addresses "
+                      "of the allocation pools, relying on the unique "
+                      "constraint of the IP allocations instead of locks")),
+    cfg.IntOpt('ip_generation_retries', default=16,
+               help=_("How many random IP addresses are tried on a subnet "
+                      "before searching its free addresses")),
     cfg.BoolOpt('allow_bulk', default=True,
                 help=_("Allow the usage of the bulk API")),
     cfg.BoolOpt('allow_pagination', default=False,
@@ -64,6 +79,15 @@ core_opts = [
                help=_("The maximum number of items returned in a single "
                       "response, value was 'infinite' or negative integer "
                       "means no limit")),
+    cfg.IntOpt('json_stream_batch_size', default=1000,
+               help=_("The JSON responses of listings of more items than "
+                      "this are streamed to the client, encoding this "
+                      "number of items at a time. 0 disables streaming")),
+    cfg.StrOpt('json_codec', default='auto',
+               choices=['auto', 'json', 'simplejson'],
+               help=_("JSON library used for the API requests and "
+                      "responses. auto encodes with json and decodes with "
+                      "simplejson when its C speedups are installed")),
     cfg.IntOpt('max_dns_nameservers', default=5,
                help=_("Maximum number of DNS nameservers")),
     cfg.IntOpt('max_subnet_host_routes', default=20,
@@ -57,6 +57,8 @@ GW_FIP_KEY = '_gw_floatingips'
 METERING_LABEL_KEY = '_metering_labels'
 FLOATINGIP_AGENT_INTF_KEY = '_floatingip_agent_interfaces'
 SNAT_ROUTER_INTF_KEY = '_snat_router_interfaces'
+SYNC_REVISION_KEY = '_sync_revision'
+DHCP_REVISION_KEY = '_dhcp_revision'
 
 IPv4 = 'IPv4'
 IPv6 = 'IPv6'
@@ -0,0 +1,89 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pluggable JSON codecs of the API requests and responses.
+
+The codec is selected by the json_codec option:
+
+* json: the standard library, whose encoder is C accelerated;
+* simplejson: simplejson, whose C decoder is several times faster than
+  the one of the standard library;
+* auto: encode with the standard library and decode with simplejson when
+  its C speedups are available.
+"""
+
+import json
+
+from oslo.config import cfg
+
+from neutron.openstack.common import importutils
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import strutils
+
+LOG = logging.getLogger(__name__)
+
+simplejson = importutils.try_import('simplejson')
+
+
+class JsonCodec(object):
+    """Encode JSON with a module and decode it with another one."""
+
+    def __init__(self, encoder, decoder):
+        self.encoder = encoder
+        self.decoder = decoder
+
+    def dumps(self, value, default=jsonutils.to_primitive):
+        # The default hook is only called for the values which are not of
+        # a JSON type, the payloads made of dicts, lists and strings are
+        # encoded without being converted beforehand
+        return self.encoder.dumps(value, default=default)
+
+    def loads(self, s, encoding='utf-8'):
+        return self.decoder.loads(strutils.safe_decode(s, encoding))
+
+
+def _has_speedups(module):
+    return bool(module and getattr(module, '_speedups', None))
+
+
+def _load_codecs():
+    codecs = {'json': JsonCodec(json, json)}
+    if simplejson:
+        codecs['simplejson'] = JsonCodec(simplejson, simplejson)
+    decoder = simplejson if _has_speedups(simplejson) else json
+    codecs['auto'] = JsonCodec(json, decoder)
+    return codecs
+
+
+_CODECS = _load_codecs()
+
+
+def get_codec(name=None):
+    """Return the codec of the given name, of json_codec by default."""
+    name = name or cfg.CONF.json_codec
+    codec = _CODECS.get(name)
+    if codec is None:
+        LOG.warning(_("JSON codec %s is not available, using auto"), name)
+        codec = _CODECS[name] = _CODECS['auto']
+    return codec
+
+
+def dumps(value, default=jsonutils.to_primitive):
+    return get_codec().dumps(value, default=default)
+
+
+def loads(s, encoding='utf-8'):
+    return get_codec().loads(s, encoding)
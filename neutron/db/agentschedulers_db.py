@@ -15,6 +15,8 @@
 
 from oslo.config import cfg
 import sqlalchemy as sa
+from sqlalchemy import distinct
+from sqlalchemy import func
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
 from sqlalchemy.orm import joinedload
@@ -23,6 +25,7 @@ from neutron.common import constants
 from neutron.common import utils
 from neutron.db import agents_db
 from neutron.db import model_base
+from neutron.db import models_v2
 from neutron.extensions import agent as ext_agent
 from neutron.extensions import dhcpagentscheduler
 from neutron.openstack.common import log as logging
@@ -124,6 +127,29 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
                 if AgentSchedulerDbMixin.is_eligible_agent(active,
                                                            binding.dhcp_agent)]
 
+    def get_dhcp_agents_load(self, context, agent_ids):
+        """Return the number of networks and ports hosted by DHCP agents.
+
+        The counts of all the agents are fetched with a single query and
+        returned as a dict of (networks, ports) tuples by agent id.
+        """
+        loads = dict((agent_id, (0, 0)) for agent_id in agent_ids)
+        if not agent_ids:
+            return loads
+        query = context.session.query(
+            NetworkDhcpAgentBinding.dhcp_agent_id,
+            func.count(distinct(NetworkDhcpAgentBinding.network_id)),
+            func.count(models_v2.Port.id))
+        query = query.outerjoin(
+            models_v2.Port,
+            models_v2.Port.network_id == NetworkDhcpAgentBinding.network_id)
+        query = query.filter(
+            NetworkDhcpAgentBinding.dhcp_agent_id.in_(agent_ids))
+        query = query.group_by(NetworkDhcpAgentBinding.dhcp_agent_id)
+        for agent_id, networks, ports in query:
+            loads[agent_id] = (networks, ports)
+        return loads
+
     def add_network_to_dhcp_agent(self, context, id, network_id):
         self._get_network(context, network_id)
         with context.session.begin(subtransactions=True):
@@ -15,6 +15,7 @@
 
 import weakref
 
+from sqlalchemy import orm
 from sqlalchemy import sql
 
 from neutron.common import exceptions as n_exc
@@ -35,6 +36,17 @@ class CommonDbMixin(object):
     # TODO(salvatore-orlando): Avoid using class-level variables
     _dict_extend_functions = {}
 
+    # Response fields produced by the functions above, keyed by resource
+    # and function, for the functions declaring them. The fields are given
+    # either as a list or as the name of a method returning the list, or
+    # None when unknown.
+    _dict_extend_fields = {}
+
+    # Fields of the dict of each resource which are a column of its model
+    # copied as is. Only these columns are queried when the fields of a
+    # collection are all among them.
+    _dict_column_fields = {}
+
     @classmethod
     def register_model_query_hook(cls, model, name, query_hook, filter_hook,
                                   result_filters=None):
@@ -140,10 +152,30 @@ class CommonDbMixin(object):
                     query = result_filter(query, filters)
         return query
 
+    def _get_dict_extend_fields(self, resource_type, func):
+        """Return the fields an extend function produces, None if unknown."""
+        fields = self._dict_extend_fields.get((resource_type, func))
+        if isinstance(fields, basestring):
+            fields = getattr(self, fields)()
+        return fields
+
+    def _is_dict_extend_needed(self, resource_type, func, fields):
+        if not fields:
+            return True
+        extend_fields = self._get_dict_extend_fields(resource_type, func)
+        return extend_fields is None or bool(set(extend_fields) & set(fields))
+
     def _apply_dict_extend_functions(self, resource_type,
-                                     response, db_object):
+                                     response, db_object, fields=None):
+        """Call the extend functions of a resource.
+
+        When fields are given, the functions declaring they produce none
+        of them are not called.
+        """
         for func in self._dict_extend_functions.get(
             resource_type, []):
+            if not self._is_dict_extend_needed(resource_type, func, fields):
+                continue
             args = (response, db_object)
             if isinstance(func, basestring):
                 func = getattr(self, func, None)
@@ -153,6 +185,30 @@ class CommonDbMixin(object):
             if func:
                 func(*args)
 
+    def _get_projected_columns(self, model, resource_type, fields):
+        """Return the columns to query for the fields of a resource.
+
+        Returns None unless all the fields are columns copied as is in the
+        dict of the resource and no extend function might produce them.
+        """
+        column_fields = self._dict_column_fields.get(resource_type, ())
+        if not fields or not set(fields) <= set(column_fields):
+            return None
+        column_attrs = orm.class_mapper(model).column_attrs.keys()
+        if not set(fields) <= set(column_attrs):
+            return None
+        if any(self._is_dict_extend_needed(resource_type, func, fields)
+               for func in self._dict_extend_functions.get(resource_type,
+                                                           [])):
+            return None
+        return [getattr(model, field) for field in sorted(set(fields))]
+
+    def _get_projected_items(self, query, columns):
+        """Return the dicts of the values of columns of the query rows."""
+        names = [column.key for column in columns]
+        return [dict(zip(names, row))
+                for row in query.with_entities(*columns)]
+
     def _get_collection_query(self, context, model, filters=None,
                               sorts=None, limit=None, marker_obj=None,
                               page_reverse=False):
@@ -167,23 +223,37 @@ class CommonDbMixin(object):
 
     def _get_collection(self, context, model, dict_func, filters=None,
                         fields=None, sorts=None, limit=None, marker_obj=None,
-                        page_reverse=False):
+                        page_reverse=False, resource_type=None):
+        """Return the dicts of the objects of a collection.
+
+        When the resource type is given, only the columns of the fields
+        are queried if they are enough to build the dicts.
+        """
         query = self._get_collection_query(context, model, filters=filters,
                                            sorts=sorts,
                                            limit=limit,
                                            marker_obj=marker_obj,
                                            page_reverse=page_reverse)
-        #items = [dict_func(c, fields) for c in query]
-        items = []
-        for cc in query:
-            aa = dict_func(cc, fields)
-            items.append(aa)
+        columns = (resource_type and
+                   self._get_projected_columns(model, resource_type, fields))
+        if columns:
+            items = self._get_projected_items(query, columns)
+        else:
+            items = [dict_func(c, fields) for c in query]
         if limit and page_reverse:
             items.reverse()
         return items
 
     def _get_collection_count(self, context, model, filters=None):
-        return self._get_collection_query(context, model, filters).count()
+        """Return the number of objects of a collection.
+
+        The primary key is counted rather than wrapping the query of the
+        whole rows in a subquery, which lets the count be answered from
+        an index.
+        """
+        query = self._get_collection_query(context, model, filters)
+        primary_key = orm.class_mapper(model).primary_key[0]
+        return query.with_entities(sql.func.count(primary_key)).scalar()
 
     def _get_marker_obj(self, context, resource, limit, marker):
         if limit and marker:
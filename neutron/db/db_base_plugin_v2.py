@@ -13,10 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import copy
+import os
 import random
 
 import netaddr
 from oslo.config import cfg
+from oslo.db import exception as db_exc
 from sqlalchemy import and_
 from sqlalchemy import event
 from sqlalchemy import orm
@@ -72,6 +74,24 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     __native_pagination_support = True
     __native_sorting_support = True
 
+    _dict_column_fields = {
+        attributes.NETWORKS: ('id', 'name', 'tenant_id', 'admin_state_up',
+                              'status', 'shared'),
+        attributes.SUBNETS: ('id', 'name', 'tenant_id', 'network_id',
+                             'ip_version', 'cidr', 'gateway_ip',
+                             'enable_dhcp', 'ipv6_ra_mode',
+                             'ipv6_address_mode', 'shared'),
+        attributes.PORTS: ('id', 'name', 'network_id', 'tenant_id',
+                           'mac_address', 'admin_state_up', 'status',
+                           'device_id', 'disable_anti_spoofing',
+                           'servicevm_device', 'service_instance_id',
+                           'servicevm_type', 'device_owner'),
+    }
+
+    # MAC addresses pre-generated by this worker, along with the pid and the
+    # base_mac they were generated for, see _generate_mac
+    _mac_address_block = (None, [])
+
     def __init__(self):
         if cfg.CONF.notify_nova_on_port_status_changes:
             from neutron.notifiers import nova
@@ -86,10 +106,19 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                          self.nova_notifier.record_port_status_changed)
 
     @classmethod
-    def register_dict_extend_funcs(cls, resource, funcs):
+    def register_dict_extend_funcs(cls, resource, funcs, fields=None):
+        """Register functions extending the dict of a resource.
+
+        :param fields: the response fields the functions produce, or the
+            name of a plugin method returning them. The functions are not
+            called when none of them is requested.
+        """
         cur_funcs = cls._dict_extend_functions.get(resource, [])
         cur_funcs.extend(funcs)
         cls._dict_extend_functions[resource] = cur_funcs
+        if fields is not None:
+            for func in funcs:
+                cls._dict_extend_fields[(resource, func)] = fields
 
     def _get_network(self, context, id):
         try:
@@ -131,41 +160,76 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
     @staticmethod
     def _generate_mac(context, network_id):
+        """Generate a MAC address for a port of the network.
+
+        The address is not checked against the ports of the network, the
+        unique constraint of the ports does it when the port is inserted.
+        When mac_generation_block_size is set, the addresses are taken from
+        a block pre-generated by this worker, whose addresses are checked
+        against the existing ports with a single query.
+        """
         base_mac = cfg.CONF.base_mac.split(':')
-        max_retries = cfg.CONF.mac_generation_retries
-        for i in range(max_retries):
-            mac = [int(base_mac[0], 16), int(base_mac[1], 16),
-                   int(base_mac[2], 16), random.randint(0x00, 0xff),
-                   random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
-            if base_mac[3] != '00':
-                mac[3] = int(base_mac[3], 16)
-            mac_address = ':'.join(map(lambda x: "%02x" % x, mac))
-            if NeutronDbPluginV2._check_unique_mac(context, network_id,
-                                                   mac_address):
-                LOG.debug(_("Generated mac for network %(network_id)s "
-                            "is %(mac_address)s"),
-                          {'network_id': network_id,
-                           'mac_address': mac_address})
-                return mac_address
-            else:
+        block_size = cfg.CONF.mac_generation_block_size
+        if block_size > 0:
+            owner = (os.getpid(), cfg.CONF.base_mac)
+            block_owner, macs = NeutronDbPluginV2._mac_address_block
+            if block_owner != owner or not macs:
+                macs = NeutronDbPluginV2._generate_mac_block(
+                    context, base_mac, block_size)
+                NeutronDbPluginV2._mac_address_block = (owner, macs)
+            if macs:
+                return macs.pop()
+        mac_address = utils.get_random_mac(base_mac)
+        LOG.debug(_("Generated mac for network %(network_id)s "
+                    "is %(mac_address)s"),
+                  {'network_id': network_id, 'mac_address': mac_address})
+        return mac_address
+
+    @staticmethod
+    def _generate_mac_block(context, base_mac, block_size):
+        macs = set(utils.get_random_mac(base_mac) for i in range(block_size))
+        mac_qry = context.session.query(models_v2.Port.mac_address).filter(
+            models_v2.Port.mac_address.in_(macs))
+        macs.difference_update(mac for mac, in mac_qry)
+        LOG.debug(_("Generated a block of %d mac addresses"), len(macs))
+        return list(macs)
+
+    @staticmethod
+    def _insert_port(context, network_id, mac_address, **kwargs):
+        """Insert the port, generating its MAC address if not specified.
+
+        The port is inserted in a savepoint: the unique constraint of the
+        ports detects a MAC address already in use on the network, a
+        generated MAC address is then generated again, up to
+        mac_generation_retries times.
+        """
+        generate_mac = mac_address is attributes.ATTR_NOT_SPECIFIED
+        max_retries = cfg.CONF.mac_generation_retries if generate_mac else 1
+        for attempt in reversed(range(max_retries)):
+            if generate_mac:
+                mac_address = NeutronDbPluginV2._generate_mac(context,
+                                                              network_id)
+            port = models_v2.Port(network_id=network_id,
+                                  mac_address=mac_address, **kwargs)
+            utils.make_default_name(port, uos_constants.UOS_PRE_PORT)
+            try:
+                with context.session.begin_nested():
+                    context.session.add(port)
+                return port
+            except db_exc.DBDuplicateEntry as e:
+                if 'mac_address' not in e.columns:
+                    raise
+                if not generate_mac:
+                    raise n_exc.MacAddressInUse(net_id=network_id,
+                                                mac=mac_address)
                 LOG.debug(_("Generated mac %(mac_address)s exists. Remaining "
                             "attempts %(max_retries)s."),
                           {'mac_address': mac_address,
-                           'max_retries': max_retries - (i + 1)})
+                           'max_retries': attempt})
         LOG.error(_("Unable to generate mac address after %s attempts"),
                   max_retries)
         raise n_exc.MacAddressGenerationFailure(net_id=network_id)
 
-    @staticmethod
-    def _check_unique_mac(context, network_id, mac_address):
-        mac_qry = context.session.query(models_v2.Port)
-        try:
-            mac_qry.filter_by(network_id=network_id,
-                              mac_address=mac_address).one()
-        except exc.NoResultFound:
-            return True
-        return False
-
     @staticmethod
     def _delete_ip_allocation(context, network_id, subnet_id, ip_address):
 
@@ -201,10 +265,31 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             ip_address=ip_address,
             subnet_id=subnet_id
         )
-        context.session.add(allocated)
+        if cfg.CONF.ip_allocation_strategy != 'random':
+            context.session.add(allocated)
+            return
+        # Claim the allocation reserved by _generate_random_ip, if any. It
+        # is the only one without port, the other ones are never claimed.
+        reserved_qry = context.session.query(
+            models_v2.IPAllocation).filter_by(
+                network_id=network_id, subnet_id=subnet_id,
+                ip_address=ip_address, port_id=None)
+        if reserved_qry.update({'port_id': port_id},
+                               synchronize_session='evaluate'):
+            return
+        # The requested addresses are only checked by _check_unique_ip, the
+        # primary key rejects the ones allocated by concurrent transactions
+        try:
+            with context.session.begin_nested():
+                context.session.add(allocated)
+        except db_exc.DBDuplicateEntry:
+            raise n_exc.IpAddressInUse(net_id=network_id,
+                                       ip_address=ip_address)
 
     @staticmethod
     def _generate_ip(context, subnets):
+        if cfg.CONF.ip_allocation_strategy == 'random':
+            return NeutronDbPluginV2._generate_random_ip(context, subnets)
         try:
             return NeutronDbPluginV2._try_generate_ip(context, subnets)
         except n_exc.IpAddressGenerationFailure:
@@ -246,6 +331,123 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             return {'ip_address': ip_address, 'subnet_id': subnet['id']}
         raise n_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
 
+    @staticmethod
+    def _reserve_ip(context, subnet, ip_address):
+        """Reserve the IP address by inserting its allocation.
+
+        The allocation is inserted without port in a savepoint, it is
+        claimed by the port when storing the port allocations. Return False
+        if the address is already allocated, possibly by a concurrent
+        transaction.
+        """
+        if not NeutronDbPluginV2._check_unique_ip(
+                context, subnet['network_id'], subnet['id'], ip_address):
+            return False
+        try:
+            with context.session.begin_nested():
+                context.session.add(models_v2.IPAllocation(
+                    network_id=subnet['network_id'], port_id=None,
+                    ip_address=ip_address, subnet_id=subnet['id']))
+        except db_exc.DBDuplicateEntry:
+            LOG.debug(_("IP %(ip_address)s of subnet %(subnet_id)s was "
+                        "allocated concurrently"),
+                      {'ip_address': ip_address, 'subnet_id': subnet['id']})
+            return False
+        return True
+
+    @staticmethod
+    def _generate_random_ip(context, subnets):
+        """Generate a random IP address.
+
+        The IP address will be generated from one of the subnets defined on
+        the network. Random addresses of the allocation pools of the subnet
+        are tried, then its free addresses when they are all in use.
+        Neither the allocation pools nor the availability ranges are locked:
+        the unique constraint of the IP allocations detects the addresses
+        allocated concurrently.
+        """
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        for subnet in subnets:
+            pools = [netaddr.IPRange(pool['first_ip'], pool['last_ip'])
+                     for pool in pool_qry.filter_by(subnet_id=subnet['id'])]
+            size = sum(pool.size for pool in pools)
+            if not size:
+                continue
+            for i in range(cfg.CONF.ip_generation_retries):
+                index = random.randrange(size)
+                for pool in pools:
+                    if index < pool.size:
+                        break
+                    index -= pool.size
+                ip_address = str(pool[index])
+                if NeutronDbPluginV2._reserve_ip(context, subnet, ip_address):
+                    return {'ip_address': ip_address,
+                            'subnet_id': subnet['id']}
+
+            ip_qry = context.session.query(
+                models_v2.IPAllocation.ip_address).filter_by(
+                    subnet_id=subnet['id'])
+            available = (netaddr.IPSet(cidr for pool in pools
+                                       for cidr in pool.cidrs()) -
+                         netaddr.IPSet(ip for ip, in ip_qry))
+            for ip in available:
+                ip_address = str(ip)
+                if NeutronDbPluginV2._reserve_ip(context, subnet, ip_address):
+                    return {'ip_address': ip_address,
+                            'subnet_id': subnet['id']}
+            LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                        "allocated"),
+                      {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        raise n_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    @staticmethod
+    def _try_generate_ips(context, requests):
+        """Generate the IP addresses of several requests in a single pass.
+
+        Each request is a list of subnets to generate one address from, as
+        done by _try_generate_ip. The availability ranges of all the
+        subnets are locked by a single query. Return the generated
+        addresses in the order of the requests, or None, leaving the ranges
+        untouched, when they cannot satisfy all the requests.
+        """
+        subnet_ids = set(subnet['id'] for subnets in requests
+                         for subnet in subnets)
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange,
+            models_v2.IPAllocationPool.subnet_id).join(
+                models_v2.IPAllocationPool).filter(
+                    models_v2.IPAllocationPool.subnet_id.in_(subnet_ids)
+                ).with_lockmode('update')
+        subnet_ranges = {}
+        for ip_range, subnet_id in range_qry:
+            subnet_ranges.setdefault(subnet_id, []).append(
+                [netaddr.IPAddress(ip_range['first_ip']),
+                 netaddr.IPAddress(ip_range['last_ip']), ip_range])
+        for ranges in subnet_ranges.values():
+            ranges.sort()
+
+        results = []
+        for subnets in requests:
+            for subnet in subnets:
+                free = [r for r in subnet_ranges.get(subnet['id'], [])
+                        if r[0] <= r[1]]
+                if free:
+                    results.append({'ip_address': str(free[0][0]),
+                                    'subnet_id': subnet['id']})
+                    free[0][0] += 1
+                    break
+            else:
+                return
+
+        for ranges in subnet_ranges.values():
+            for first_ip, last_ip, ip_range in ranges:
+                if first_ip > last_ip:
+                    context.session.delete(ip_range)
+                elif str(first_ip) != ip_range['first_ip']:
+                    ip_range['first_ip'] = str(first_ip)
+        LOG.debug(_("Allocated %d IPs in a single pass"), len(results))
+        return results
+
     @staticmethod
     def _rebuild_availability_ranges(context, subnets):
         ip_qry = context.session.query(
@@ -294,6 +496,9 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
+        if cfg.CONF.ip_allocation_strategy == 'random':
+            # The availability ranges are not used
+            return
         ip = int(netaddr.IPAddress(ip_address))
         range_qry = context.session.query(
             models_v2.IPAvailabilityRange).join(
@@ -517,12 +722,47 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             ips = self._allocate_fixed_ips(context, to_add)
         return ips, prev_ips
 
-    def _allocate_ips_for_port(self, context, port):
+    def _get_auto_allocation_subnets(self, port, subnets):
+        """Select the subnets of the network to allocate the port IPs from.
+
+        Return the IPv6 subnets whose addresses are calculated from the MAC
+        address of the port, and the IPv4 and IPv6 subnets to generate an
+        address from.
+        """
+        v4 = []
+        v6 = []
+        for subnet in subnets:
+
+            subnet_service_provider = subnet['uos:service_provider']
+
+            provider_name = port.get('uos:service_provider', None)
+            if ( provider_name and
+                (port.get('device_owner') == constants.DEVICE_OWNER_FLOATINGIP)
+                and (subnet_service_provider != provider_name) ):
+                continue
+            shadow_subnet = cfg.CONF.unitedstack.external_shadow_subnet
+            if (shadow_subnet and shadow_subnet == subnet['name']):
+                continue
+            subnets_to_exclude = cfg.CONF.unitedstack.subnets_to_exclude
+            if subnet['id'] in subnets_to_exclude:
+                continue
+            if subnet['ip_version'] == 4:
+                v4.append(subnet)
+            else:
+                v6.append(subnet)
+        eui64 = [subnet for subnet in v6
+                 if self._check_if_subnet_uses_eui64(subnet)]
+        v6 = [subnet for subnet in v6 if subnet not in eui64]
+        return eui64, [v4, v6]
+
+    def _allocate_ips_for_port(self, context, port, generated_ips=None):
         """Allocate IP addresses for the port.
 
         If port['fixed_ips'] is set to 'ATTR_NOT_SPECIFIED', allocate IP
         addresses for the port. If port['fixed_ips'] contains an IP address or
-        a subnet_id then allocate an IP address accordingly.
+        a subnet_id then allocate an IP address accordingly. The addresses
+        already generated for the port by _generate_ips_for_ports are used
+        instead of generating new ones.
         """
         p = port['port']
         ips = []
@@ -537,49 +777,27 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         else:
             filter = {'network_id': [p['network_id']]}
             subnets = self.get_subnets(context, filters=filter)
-            # Split into v4 and v6 subnets
-            v4 = []
-            v6 = []
-            for subnet in subnets:
-
-                subnet_service_provider = subnet['uos:service_provider']
-
-                provider_name = p.get('uos:service_provider', None)
-                if ( provider_name and
-                    (p.get('device_owner') == constants.DEVICE_OWNER_FLOATINGIP)
-                    and (subnet_service_provider != provider_name) ):
-                    continue
-                shadow_subnet = cfg.CONF.unitedstack.external_shadow_subnet
-                if (shadow_subnet and shadow_subnet == subnet['name']):
-                    continue
-                subnets_to_exclude = cfg.CONF.unitedstack.subnets_to_exclude
-                if subnet['id'] in subnets_to_exclude:
-                    continue
-                if subnet['ip_version'] == 4:
-                    v4.append(subnet)
-                else:
-                    v6.append(subnet)
-            for subnet in v6:
-                if self._check_if_subnet_uses_eui64(subnet):
-                    #(dzyu) If true, calculate an IPv6 address
-                    # by mac address and prefix, then remove this
-                    # subnet from the array of subnets that will be passed
-                    # to the _generate_ip() function call, since we just
-                    # generated an IP.
-                    mac = p['mac_address']
-                    prefix = subnet['cidr']
-                    ip_address = ipv6_utils.get_ipv6_addr_by_EUI64(
-                        prefix, mac)
-                    if not self._check_unique_ip(
-                        context, p['network_id'],
-                        subnet['id'], ip_address.format()):
-                        raise n_exc.IpAddressInUse(
-                            net_id=p['network_id'],
-                            ip_address=ip_address.format())
-                    ips.append({'ip_address': ip_address.format(),
-                                'subnet_id': subnet['id']})
-                    v6.remove(subnet)
-            version_subnets = [v4, v6]
+            eui64_subnets, version_subnets = (
+                self._get_auto_allocation_subnets(p, subnets))
+            for subnet in eui64_subnets:
+                #(dzyu) If true, calculate an IPv6 address
+                # by mac address and prefix, since these subnets
+                # are not passed to the _generate_ip() function call.
+                mac = p['mac_address']
+                prefix = subnet['cidr']
+                ip_address = ipv6_utils.get_ipv6_addr_by_EUI64(
+                    prefix, mac)
+                if not self._check_unique_ip(
+                    context, p['network_id'],
+                    subnet['id'], ip_address.format()):
+                    raise n_exc.IpAddressInUse(
+                        net_id=p['network_id'],
+                        ip_address=ip_address.format())
+                ips.append({'ip_address': ip_address.format(),
+                            'subnet_id': subnet['id']})
+            if generated_ips is not None:
+                ips.extend(generated_ips)
+                return ips
             for subnets in version_subnets:
                 if subnets:
                     result = NeutronDbPluginV2._generate_ip(context, subnets)
@@ -587,6 +805,59 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                 'subnet_id': result['subnet_id']})
         return ips
 
+    def _generate_ips_for_ports(self, context, ports):
+        """Generate the IP addresses of ports created in bulk.
+
+        The addresses of the ports which do not ask for fixed IPs are
+        generated in a single pass over the locked availability ranges of
+        their subnets, instead of locking them once per port. Return, for
+        each port, the generated addresses to pass to create_port, or None
+        when the port has to allocate its addresses by itself.
+        """
+        generated = [None] * len(ports)
+        if cfg.CONF.ip_allocation_strategy == 'random':
+            # No lock to share, the ports generate their random addresses
+            return generated
+        # The addresses requested by the other ports of the bulk are not
+        # allocated yet, the ports of their networks allocate their
+        # addresses one by one so that they are not generated twice
+        fixed_ip_networks = set(
+            port['port']['network_id'] for port in ports
+            if port['port']['fixed_ips'] is not attributes.ATTR_NOT_SPECIFIED
+            and any('ip_address' in fixed_ip
+                    for fixed_ip in port['port']['fixed_ips']))
+        network_subnets = {}
+        requests = []
+        port_indexes = []
+        for index, port in enumerate(ports):
+            p = port['port']
+            if p['fixed_ips'] is not attributes.ATTR_NOT_SPECIFIED:
+                continue
+            network_id = p['network_id']
+            if network_id in fixed_ip_networks:
+                continue
+            if network_id not in network_subnets:
+                network_subnets[network_id] = self.get_subnets(
+                    context, filters={'network_id': [network_id]})
+            version_subnets = self._get_auto_allocation_subnets(
+                p, network_subnets[network_id])[1]
+            generated[index] = []
+            for subnets in version_subnets:
+                if subnets:
+                    requests.append(subnets)
+                    port_indexes.append(index)
+        if not requests:
+            return generated
+
+        results = NeutronDbPluginV2._try_generate_ips(context, requests)
+        if results is None:
+            # Some subnets are exhausted or need their availability ranges
+            # rebuilt, let each port allocate its addresses
+            return [None] * len(ports)
+        for index, result in zip(port_indexes, results):
+            generated[index].append(result)
+        return generated
+
     def _validate_subnet_cidr(self, context, network, new_subnet_cidr):
         """Validate the CIDR for a subnet.
 
@@ -815,7 +1086,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         # Call auxiliary extend functions, if any
         if process_extensions:
             self._apply_dict_extend_functions(
-                attributes.NETWORKS, res, network)
+                attributes.NETWORKS, res, network, fields)
         return self._fields(res, fields)
 
     def _make_subnet_dict(self, subnet, fields=None, process_extensions=True):
@@ -840,7 +1111,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                'shared': subnet['shared']
                }
         # Call auxiliary extend functions, if any
-        self._apply_dict_extend_functions(attributes.SUBNETS, res, subnet)
+        self._apply_dict_extend_functions(attributes.SUBNETS, res, subnet,
+                                          fields)
         return self._fields(res, fields)
 
     def _make_port_dict(self, port, fields=None,
@@ -864,7 +1136,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         # Call auxiliary extend functions, if any
         if process_extensions:
             self._apply_dict_extend_functions(
-                attributes.PORTS, res, port)
+                attributes.PORTS, res, port, fields)
         return self._fields(res, fields)
 
     def _create_bulk(self, resource, context, request_items):
@@ -974,7 +1246,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                     sorts=sorts,
                                     limit=limit,
                                     marker_obj=marker_obj,
-                                    page_reverse=page_reverse)
+                                    page_reverse=page_reverse,
+                                    resource_type=attributes.NETWORKS)
 
     def get_networks_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Network,
@@ -1339,7 +1612,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                     sorts=sorts,
                                     limit=limit,
                                     marker_obj=marker_obj,
-                                    page_reverse=page_reverse)
+                                    page_reverse=page_reverse,
+                                    resource_type=attributes.SUBNETS)
 
     def get_subnets_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Subnet,
@@ -1348,7 +1622,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def create_port_bulk(self, context, ports):
         return self._create_bulk('port', context, ports)
 
-    def create_port(self, context, port):
+    def create_port(self, context, port, generated_ips=None):
         p = port['port']
         servicevm_device = p.get('servicevm_device')
         service_instance_id = p.get('service_instance_id', None)
@@ -1375,25 +1649,6 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             else:
                 port_disable_anti_spoofing = False
 
-            # Ensure that a MAC address is defined and it is unique on the
-            # network
-            if p['mac_address'] is attributes.ATTR_NOT_SPECIFIED:
-                #Note(scollins) Add the generated mac_address to the port,
-                #since _allocate_ips_for_port will need the mac when
-                #calculating an EUI-64 address for a v6 subnet
-                p['mac_address'] = NeutronDbPluginV2._generate_mac(context,
-                                                                   network_id)
-            else:
-                # Ensure that the mac on the network is unique
-                if not NeutronDbPluginV2._check_unique_mac(context,
-                                                           network_id,
-                                                           p['mac_address']):
-                    raise n_exc.MacAddressInUse(net_id=network_id,
-                                                mac=p['mac_address'])
-
-            # Returns the IP's for the port
-            ips = self._allocate_ips_for_port(context, port)
-
             if 'status' not in p:
                 status = constants.PORT_STATUS_ACTIVE
             else:
@@ -1404,23 +1659,30 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                     constants.DEVICE_OWNER_COMPUTE_PRE)):
                 status = constants.PORT_STATUS_BUILD
 
+            # Ensure that a MAC address is defined and it is unique on the
+            # network
             # NOTE(changzhi) Add a new attribute named 'disable_anti_spoofing'
             # default value is False, means this port enable anti-spoofing.
-            port = models_v2.Port(tenant_id=tenant_id,
-                                  name=p['name'],
-                                  id=port_id,
-                                  network_id=network_id,
-                                  mac_address=p['mac_address'],
-                                  admin_state_up=p['admin_state_up'],
-                                  status=status,
-                                  device_id=p['device_id'],
-                                  device_owner=p['device_owner'],
-                                  servicevm_device=servicevm_device,
-                                  service_instance_id=service_instance_id,
-                                  servicevm_type=servicevm_type,
-                                  disable_anti_spoofing=port_disable_anti_spoofing)
-            utils.make_default_name(port, uos_constants.UOS_PRE_PORT)
-            context.session.add(port)
+            db_port = NeutronDbPluginV2._insert_port(
+                context, network_id, p['mac_address'],
+                tenant_id=tenant_id,
+                name=p['name'],
+                id=port_id,
+                admin_state_up=p['admin_state_up'],
+                status=status,
+                device_id=p['device_id'],
+                device_owner=p['device_owner'],
+                servicevm_device=servicevm_device,
+                service_instance_id=service_instance_id,
+                servicevm_type=servicevm_type,
+                disable_anti_spoofing=port_disable_anti_spoofing)
+            #Note(scollins) Add the generated mac_address to the port,
+            #since _allocate_ips_for_port will need the mac when
+            #calculating an EUI-64 address for a v6 subnet
+            p['mac_address'] = db_port['mac_address']
+
+            # Returns the IP's for the port
+            ips = self._allocate_ips_for_port(context, port, generated_ips)
 
             # Update the allocated IP's
             if ips:
@@ -1430,7 +1692,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                     NeutronDbPluginV2._store_ip_allocation(
                         context, ip_address, network_id, subnet_id, port_id)
 
-        return self._make_port_dict(port, process_extensions=False)
+        return self._make_port_dict(db_port, process_extensions=False)
 
     def update_port(self, context, id, port):
         p = port['port']
@@ -1575,11 +1837,18 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                   sorts=None, limit=None, marker=None,
                   page_reverse=False):
         marker_obj = self._get_marker_obj(context, 'port', limit, marker)
+        # Ports are joined with their IP allocations to filter on them
+        columns = (not (filters and filters.get('fixed_ips')) and
+                   self._get_projected_columns(models_v2.Port,
+                                               attributes.PORTS, fields))
         query = self._get_ports_query(context, filters=filters,
                                       sorts=sorts, limit=limit,
                                       marker_obj=marker_obj,
                                       page_reverse=page_reverse)
-        items = [self._make_port_dict(c, fields) for c in query]
+        if columns:
+            items = self._get_projected_items(query, columns)
+        else:
+            items = [self._make_port_dict(c, fields) for c in query]
         if limit and page_reverse:
             items.reverse()
         return items
@@ -0,0 +1,80 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.db import exception as db_exc
+import sqlalchemy as sa
+
+from neutron.db import model_base
+
+
+class NetworkDhcpRevision(model_base.BASEV2):
+    """Per network revision bumped each time DHCP agents are notified.
+
+    Networks without a row are at revision 0.
+    """
+
+    __tablename__ = 'networkdhcprevisions'
+    network_id = sa.Column(sa.String(36),
+                           sa.ForeignKey('networks.id', ondelete='CASCADE'),
+                           primary_key=True)
+    revision = sa.Column(sa.BigInteger, nullable=False, default=0,
+                         server_default='0')
+
+
+def _bump_network_revisions(context, network_ids):
+    with context.session.begin(subtransactions=True):
+        query = context.session.query(NetworkDhcpRevision).filter(
+            NetworkDhcpRevision.network_id.in_(network_ids))
+        bumped = query.update(
+            {'revision': NetworkDhcpRevision.revision + 1},
+            synchronize_session=False)
+        if bumped == len(network_ids):
+            return
+        query = context.session.query(NetworkDhcpRevision.network_id).filter(
+            NetworkDhcpRevision.network_id.in_(network_ids))
+        existing_ids = set(network_id for network_id, in query)
+        for network_id in network_ids - existing_ids:
+            context.session.add(NetworkDhcpRevision(network_id=network_id,
+                                                    revision=1))
+
+
+def bump_network_revisions(context, network_ids):
+    """Mark the DHCP data of the given networks as changed.
+
+    This must run after the change is committed and outside of its
+    transaction, so that changes to the same network do not serialize on
+    the revision row.
+    """
+    network_ids = set(network_id for network_id in network_ids
+                      if network_id)
+    if not network_ids:
+        return
+    try:
+        _bump_network_revisions(context, network_ids)
+    except db_exc.DBDuplicateEntry:
+        # The row of a network was inserted concurrently, it exists now
+        _bump_network_revisions(context, network_ids)
+
+
+def get_network_revisions(context, network_ids):
+    """Return a dict of the DHCP revision by network id."""
+    if not network_ids:
+        return {}
+    revisions = dict.fromkeys(network_ids, 0)
+    query = context.session.query(NetworkDhcpRevision.network_id,
+                                  NetworkDhcpRevision.revision)
+    query = query.filter(NetworkDhcpRevision.network_id.in_(network_ids))
+    revisions.update((network_id, revision) for network_id, revision in query)
+    return revisions
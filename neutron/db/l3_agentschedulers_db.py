@@ -271,7 +271,7 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         else:
             return {'routers': []}
 
-    def list_active_sync_routers_on_active_l3_agent(
+    def list_active_router_ids_on_active_l3_agent(
             self, context, host, router_ids):
         agent = self._get_agent_by_type_and_host(
             context, constants.AGENT_TYPE_L3, host)
@@ -284,13 +284,28 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         if router_ids:
             query = query.filter(
                 RouterL3AgentBinding.router_id.in_(router_ids))
-        router_ids = [item[0] for item in query]
+        return [item[0] for item in query]
+
+    def list_active_sync_routers_on_active_l3_agent(
+            self, context, host, router_ids):
+        router_ids = self.list_active_router_ids_on_active_l3_agent(
+            context, host, router_ids)
         if router_ids:
-            return self.get_sync_data(context, router_ids=router_ids,
-                                      active=True)
+            return self.get_sync_data_cached(context, router_ids=router_ids,
+                                             active=True)
         else:
             return []
 
+    def list_changed_sync_routers_on_active_l3_agent(
+            self, context, host, router_ids, revisions):
+        router_ids = self.list_active_router_ids_on_active_l3_agent(
+            context, host, router_ids)
+        if router_ids:
+            return self.get_changed_sync_data(context, router_ids,
+                                              revisions, active=True)
+        else:
+            return [], []
+
     def get_l3_agents_hosting_routers(self, context, router_ids,
                                       admin_state_up=None,
                                       active=None):
@@ -25,6 +25,8 @@ from neutron.common import exceptions as n_exc
 from neutron.common import rpc as n_rpc
 from neutron.common import uos_constants as uos_l3_constants
 from neutron.common import utils
+from neutron.db import dhcp_sync_revision_db
+from neutron.db import l3_sync_cache_db
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import external_net
@@ -93,7 +95,8 @@ class FloatingIP(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant,
                                     nullable=True,default='')
 
 
-class L3_NAT_dbonly_mixin(l3.RouterPluginBase):
+class L3_NAT_dbonly_mixin(l3.RouterPluginBase,
+                          l3_sync_cache_db.RouterSyncCacheDbMixin):
     """Mixin class to add L3/NAT router methods to db_base_plugin_v2."""
 
     router_device_owners = (
@@ -141,6 +144,7 @@ class L3_NAT_dbonly_mixin(l3.RouterPluginBase):
                                admin_state_up=router['admin_state_up'],
                                status="ACTIVE")
             context.session.add(router_db)
+            self._create_router_sync_revision(context, router_db)
             return router_db
 
     def create_router(self, context, router):
@@ -1148,16 +1152,19 @@ class L3RpcNotifierMixin(object):
     def notify_router_updated(self, context, router_id,
                               operation=None, data=None):
         if router_id:
+            self.bump_router_revisions(context, [router_id])
             self.l3_rpc_notifier.routers_updated(
                 context, [router_id], operation, data)
 
     def notify_routers_updated(self, context, router_ids,
                                operation=None, data=None):
         if router_ids:
+            self.bump_router_revisions(context, router_ids)
             self.l3_rpc_notifier.routers_updated(
                 context, router_ids, operation, data)
 
     def notify_router_deleted(self, context, router_id):
+        self.router_sync_cache.invalidate([router_id])
         self.l3_rpc_notifier.router_deleted(context, router_id)
 
 
@@ -1184,6 +1191,12 @@ class L3_NAT_db_mixin(L3_NAT_dbonly_mixin, L3RpcNotifierMixin):
         super(L3_NAT_db_mixin, self).notify_routers_updated(
             context, [router_interface_info['id']], l3_method,
             {'subnet_id': router_interface_info['subnet_id']})
+        # The DHCP agents are not notified of router interface ports, their
+        # network must still be refetched by the agents on their next sync
+        subnet = self._core_plugin._get_subnet(
+            context.elevated(), router_interface_info['subnet_id'])
+        dhcp_sync_revision_db.bump_network_revisions(
+            context, [subnet['network_id']])
 
         mapping = {'add': 'create', 'remove': 'delete'}
         notifier = n_rpc.get_notifier('network')
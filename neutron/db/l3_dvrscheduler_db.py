@@ -104,8 +104,8 @@ class L3_DVRsch_db_mixin(l3agent_sch_db.L3AgentSchedulerDbMixin):
                 router_dict = self.get_router(context, router_id)
                 if router_dict.get('distributed', False):
                     payload = {'subnet_id': subnet}
-                    self.l3_rpc_notifier.routers_updated(
-                        context, [router_id], None, payload)
+                    self.notify_router_updated(
+                        context, router_id, None, payload)
                     break
             LOG.debug('DVR: dvr_update_router_addvm %s ', router_id)
 
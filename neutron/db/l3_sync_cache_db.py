@@ -0,0 +1,224 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import time
+
+from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from neutron.common import constants as l3_constants
+from neutron.db import model_base
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+L3_SYNC_CACHE_OPTS = [
+    cfg.BoolOpt('router_sync_cache', default=False,
+                help=_('Cache the router data returned to L3 agents and '
+                       'only rebuild it from the database when the router '
+                       'revision changes.')),
+    cfg.IntOpt('router_sync_cache_ttl', default=300,
+               help=_('Seconds a cached router is served before it is '
+                      'rebuilt even if its revision did not change. This '
+                      'bounds staleness for changes that do not notify the '
+                      'L3 agents, 0 means no expiration.')),
+    cfg.IntOpt('router_sync_cache_size', default=10000,
+               help=_('Maximum number of routers kept in the router sync '
+                      'cache.')),
+]
+
+cfg.CONF.register_opts(L3_SYNC_CACHE_OPTS)
+
+SYNC_REVISION_KEY = l3_constants.SYNC_REVISION_KEY
+
+
+class RouterSyncRevision(model_base.BASEV2):
+    """Per router revision bumped each time L3 agents are notified."""
+
+    __tablename__ = 'routersyncrevisions'
+    router_id = sa.Column(sa.String(36),
+                          sa.ForeignKey('routers.id', ondelete='CASCADE'),
+                          primary_key=True)
+    revision = sa.Column(sa.BigInteger, nullable=False, default=0,
+                         server_default='0')
+    router = orm.relationship(
+        'Router',
+        backref=orm.backref('sync_revision', uselist=False,
+                            cascade='delete'))
+
+
+class RouterSyncCache(object):
+    """Process local LRU cache of serialized router sync dicts.
+
+    Entries are stored as JSON so callers always get a private copy of the
+    router they may freely modify. An entry is only returned when the caller
+    asks for the revision it was stored with and it has not expired.
+    """
+
+    def __init__(self, ttl=0, max_size=0):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, router_id, revision):
+        entry = self._entries.get(router_id)
+        if (entry is None or revision is None or entry[0] != revision or
+            (self.ttl and time.time() - entry[1] > self.ttl)):
+            self.misses += 1
+            return
+        self.hits += 1
+        # Refresh the LRU position of the router
+        del self._entries[router_id]
+        self._entries[router_id] = entry
+        return jsonutils.loads(entry[2])
+
+    def put(self, router_id, revision, router):
+        if revision is None:
+            return
+        self._entries.pop(router_id, None)
+        self._entries[router_id] = (revision, time.time(),
+                                    jsonutils.dumps(router))
+        while self.max_size and len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, router_ids):
+        for router_id in router_ids:
+            self._entries.pop(router_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RouterSyncCacheDbMixin(object):
+    """Mixin class adding revision tracked router sync data.
+
+    Each router has a revision that is bumped whenever the L3 agents are
+    notified of a change. The revision is stamped on the router sync dicts so
+    that agents can later ask only for routers that changed, and it is used
+    to validate the process local cache of router sync dicts.
+    """
+
+    _router_sync_cache = None
+
+    @property
+    def router_sync_cache(self):
+        if self._router_sync_cache is None:
+            self._router_sync_cache = RouterSyncCache(
+                cfg.CONF.router_sync_cache_ttl,
+                cfg.CONF.router_sync_cache_size)
+        return self._router_sync_cache
+
+    def _create_router_sync_revision(self, context, router_db):
+        with context.session.begin(subtransactions=True):
+            router_db.sync_revision = RouterSyncRevision(revision=0)
+
+    def bump_router_revisions(self, context, router_ids):
+        """Mark the sync data of the given routers as changed."""
+        router_ids = set(router_id for router_id in router_ids if router_id)
+        if not router_ids:
+            return
+        self.router_sync_cache.invalidate(router_ids)
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(RouterSyncRevision).filter(
+                RouterSyncRevision.router_id.in_(router_ids))
+            query.update({'revision': RouterSyncRevision.revision + 1},
+                         synchronize_session=False)
+
+    def get_router_revisions(self, context, router_ids):
+        """Return a dict of revision by router id.
+
+        Routers without a revision are left out, their sync data is always
+        considered changed.
+        """
+        if not router_ids:
+            return {}
+        query = context.session.query(RouterSyncRevision.router_id,
+                                      RouterSyncRevision.revision)
+        query = query.filter(RouterSyncRevision.router_id.in_(router_ids))
+        return dict((router_id, revision) for router_id, revision in query)
+
+    def _get_sync_router_ids(self, context, active=None):
+        filters = {'admin_state_up': [active]} if active is not None else {}
+        return [router['id'] for router in
+                self.get_routers(context, filters=filters, fields=['id'])]
+
+    def get_sync_data_cached(self, context, router_ids=None, active=None):
+        """Same as get_sync_data but serves unchanged routers from cache.
+
+        The returned routers have their revision stamped on them.
+        """
+        if not router_ids:
+            router_ids = self._get_sync_router_ids(context, active)
+            if not router_ids:
+                return []
+        # NOTE: revisions must be read before the sync data is built, a
+        # change notified in between makes the cached entry stale instead
+        # of serving it under the new revision.
+        revisions = self.get_router_revisions(context, router_ids)
+        routers = []
+        missing_ids = []
+        if cfg.CONF.router_sync_cache:
+            cache = self.router_sync_cache
+            for router_id in router_ids:
+                router = cache.get(router_id, revisions.get(router_id))
+                if router is None:
+                    missing_ids.append(router_id)
+                elif active is None or router['admin_state_up'] == active:
+                    routers.append(router)
+        else:
+            missing_ids = router_ids
+        if missing_ids:
+            for router in self.get_sync_data(context, router_ids=missing_ids,
+                                             active=active):
+                revision = revisions.get(router['id'])
+                router[SYNC_REVISION_KEY] = revision
+                if cfg.CONF.router_sync_cache:
+                    self.router_sync_cache.put(router['id'], revision, router)
+                routers.append(router)
+        LOG.debug("Router sync data for %(total)d routers, %(built)d rebuilt",
+                  {'total': len(routers), 'built': len(missing_ids)})
+        return routers
+
+    def get_changed_sync_data(self, context, router_ids, known_revisions,
+                              active=None):
+        """Return sync data only for routers whose revision changed.
+
+        @param known_revisions: dict of revision by router id the caller
+                                already has the sync data for.
+        @return: a tuple of the list of changed routers and the list of
+                 ids of routers which did not change.
+        """
+        if not router_ids:
+            router_ids = self._get_sync_router_ids(context, active)
+        known_revisions = known_revisions or {}
+        revisions = self.get_router_revisions(context, router_ids)
+        unchanged_ids = [router_id for router_id in router_ids
+                         if revisions.get(router_id) is not None and
+                         revisions[router_id] == known_revisions.get(
+                             router_id)]
+        changed_ids = list(set(router_ids) - set(unchanged_ids))
+        routers = []
+        if changed_ids:
+            routers = self.get_sync_data_cached(context, changed_ids, active)
+        return routers, unchanged_ids
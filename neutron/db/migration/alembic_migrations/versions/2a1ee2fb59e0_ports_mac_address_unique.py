@@ -0,0 +1,89 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Add unique constraint on the MAC address of the ports of a network
+
+Revision ID: 2a1ee2fb59e0
+Revises: 3e5c3a4a7b21
+Create Date: 2015-10-19 09:12:27.041826
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2a1ee2fb59e0'
+down_revision = '3e5c3a4a7b21'
+
+migration_for_plugins = [
+    '*'
+]
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+CONSTRAINT_NAME = 'uniq_ports0network_id0mac_address'
+TABLE_NAME = 'ports'
+
+
+class DuplicateMacAddresses(Exception):
+    pass
+
+
+def check_duplicate_mac_addresses(connection):
+    """Fail if ports of a network share a MAC address.
+
+    The former MAC address check of the port creation was racy. The MAC
+    address of the ports, in use by their instances, cannot be changed
+    here: the duplicate ports have to be deleted or given a new MAC address
+    before upgrading.
+    """
+    duplicates = connection.execute(sa.text(
+        "SELECT ports.network_id, ports.mac_address, ports.id FROM ports "
+        "JOIN (SELECT network_id, mac_address FROM ports "
+        "GROUP BY network_id, mac_address HAVING COUNT(*) > 1) duplicates "
+        "ON ports.network_id = duplicates.network_id AND "
+        "ports.mac_address = duplicates.mac_address "
+        "ORDER BY ports.network_id, ports.mac_address, ports.id")).fetchall()
+    if duplicates:
+        raise DuplicateMacAddresses(
+            "Cannot add the unique constraint on the MAC address of the "
+            "ports of a network, delete the duplicate ports or update their "
+            "MAC address first. Ports (network, MAC address, port): %s" %
+            ', '.join('%s %s %s' % tuple(row) for row in duplicates))
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    check_duplicate_mac_addresses(op.get_bind())
+    op.create_unique_constraint(
+        name=CONSTRAINT_NAME,
+        source=TABLE_NAME,
+        local_cols=['network_id', 'mac_address']
+    )
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_constraint(
+        name=CONSTRAINT_NAME,
+        table_name=TABLE_NAME,
+        type_='unique'
+    )
@@ -0,0 +1,59 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Add router sync revisions
+
+Revision ID: 3e5c3a4a7b21
+Revises: 224b0598a452
+Create Date: 2015-10-12 08:21:43.317512
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3e5c3a4a7b21'
+down_revision = '224b0598a452'
+
+migration_for_plugins = [
+    '*'
+]
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.create_table(
+        'routersyncrevisions',
+        sa.Column('router_id', sa.String(length=36), nullable=False),
+        sa.Column('revision', sa.BigInteger(), nullable=False,
+                  server_default='0'),
+        sa.ForeignKeyConstraint(['router_id'], ['routers.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('router_id')
+    )
+    op.execute("INSERT INTO routersyncrevisions (router_id, revision) "
+               "SELECT id, 0 FROM routers")
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_table('routersyncrevisions')
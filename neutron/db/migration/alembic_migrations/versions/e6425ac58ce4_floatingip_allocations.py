@@ -0,0 +1,74 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Add floatingip allocations and subnet counters
+
+Revision ID: e6425ac58ce4
+Revises: 4c8b2f1d9a36
+Create Date: 2015-10-21 03:12:45.704216
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e6425ac58ce4'
+down_revision = '4c8b2f1d9a36'
+
+migration_for_plugins = [
+    '*'
+]
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.create_table(
+        'floatingipallocations',
+        sa.Column('floating_ip_address', sa.String(length=64),
+                  nullable=False),
+        sa.Column('last_tenant_id', sa.String(length=255), nullable=True),
+        sa.Column('floating_subnet_id', sa.String(length=255),
+                  nullable=True),
+        sa.Column('allocated', sa.Boolean(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('floating_ip_address')
+    )
+    op.create_index('ix_floatingipallocations_recycled',
+                    'floatingipallocations',
+                    ['allocated', 'floating_subnet_id', 'updated_at'])
+    op.create_index('ix_floatingipallocations_tenant_recycled',
+                    'floatingipallocations',
+                    ['last_tenant_id', 'allocated', 'updated_at'])
+    op.create_table(
+        'floatingipsubnetcounters',
+        sa.Column('floating_subnet_id', sa.String(length=255),
+                  nullable=False),
+        sa.Column('free_count', sa.BigInteger(), nullable=False),
+        sa.Column('recycled_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('floating_subnet_id')
+    )
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_table('floatingipsubnetcounters')
+    op.drop_table('floatingipallocations')
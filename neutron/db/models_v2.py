@@ -125,6 +125,12 @@ class SubnetRoute(model_base.BASEV2, Route):
 class Port(model_base.BASEV2, HasId, HasTenant, TimestampMixin):
     """Represents a port on a Neutron v2 network."""
 
+    __table_args__ = (
+        sa.UniqueConstraint('network_id', 'mac_address',
+                            name='uniq_ports0network_id0mac_address'),
+        model_base.BASEV2.__table_args__
+    )
+
     name = sa.Column(sa.String(255))
     network_id = sa.Column(sa.String(36), sa.ForeignKey("networks.id"),
                            nullable=False)
@@ -16,6 +16,7 @@
 
 from neutron.api.v2 import attributes
 from neutron.db import db_base_plugin_v2
+from neutron.extensions import portbindings
 
 
 class PortBindingBaseMixin(object):
@@ -38,4 +39,5 @@ def _extend_port_dict_binding(plugin, port_res, port_db):
 
 def register_port_dict_function():
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-        attributes.PORTS, [_extend_port_dict_binding])
+        attributes.PORTS, [_extend_port_dict_binding],
+        fields=portbindings.EXTENDED_ATTRIBUTES_2_0[attributes.PORTS].keys())
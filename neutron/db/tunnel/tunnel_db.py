@@ -223,11 +223,12 @@ class TunnelPluginDb(tunnelaas.TunnelPluginBase, base_db.CommonDbMixin):
     def get_tunnels(self, context, filters=None, fields=None,
                     sorts=None, limit=None, marker=None,
                     page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'tunnel', limit, marker)
         return self._get_collection(context, Tunnel,
                                     self._make_tunnel_dict,
                                     filters=filters, fields=fields,
                                     sorts=sorts, limit=limit,
-                                    marker_obj=marker,
+                                    marker_obj=marker_obj,
                                     page_reverse=page_reverse)
 
     def get_tunnel(self, context, tunnel_id, fields=None):
@@ -277,11 +278,13 @@ class TunnelPluginDb(tunnelaas.TunnelPluginBase, base_db.CommonDbMixin):
     def get_tunnel_connections(self, context, filters=None, fields=None,
                                sorts=None, limit=None, marker=None,
                                page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'tunnel_connection',
+                                          limit, marker)
         return self._get_collection(context, TunnelConnection,
                                     self._make_tunnel_conn_dict,
                                     filters=filters, fields=fields,
                                     sorts=sorts, limit=limit,
-                                    marker_obj=marker,
+                                    marker_obj=marker_obj,
                                     page_reverse=page_reverse)
 
     def get_tunnel_connection(self, context, tunnel_conn_id, fields=None):
@@ -312,11 +315,13 @@ class TunnelPluginDb(tunnelaas.TunnelPluginBase, base_db.CommonDbMixin):
     def get_target_networks(self, context, filters=None, fields=None,
                            sorts=None, limit=None, marker=None,
                            page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'target_network',
+                                          limit, marker)
         return self._get_collection(context, TargetNetwork,
                                     self._make_target_network_dict,
                                     filters=filters, fields=fields,
                                     sorts=sorts, limit=limit,
-                                    marker_obj=marker,
+                                    marker_obj=marker_obj,
                                     page_reverse=page_reverse)
 
     def get_target_network(self, context, target_network_id, fields=None):
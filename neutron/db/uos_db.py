@@ -51,24 +51,30 @@ def _uos_extend_sg_dict_binding(core_plugin, res, db):
 
 
 db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-    l3.FLOATINGIPS, [_uos_extend_floatingip_dict_binding])
+    l3.FLOATINGIPS, [_uos_extend_floatingip_dict_binding],
+    fields=['created_at'])
 
 
 db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-    l3.ROUTERS, [_uos_extend_router_dict_binding])
+    l3.ROUTERS, [_uos_extend_router_dict_binding],
+    fields=['created_at'])
 
 
 db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-    attributes.NETWORKS, [_uos_extend_network_dict_binding])
+    attributes.NETWORKS, [_uos_extend_network_dict_binding],
+    fields=['created_at'])
 
 
 db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-    attributes.PORTS, [_uos_extend_port_dict_binding])
+    attributes.PORTS, [_uos_extend_port_dict_binding],
+    fields=['created_at'])
 
 
 db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-    attributes.SUBNETS, [_uos_extend_subnet_dict_binding])
+    attributes.SUBNETS, [_uos_extend_subnet_dict_binding],
+    fields=['created_at'])
 
 
 db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-    'security_groups', [_uos_extend_sg_dict_binding])
+    'security_groups', [_uos_extend_sg_dict_binding],
+    fields=['created_at'])
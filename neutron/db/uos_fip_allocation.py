@@ -16,6 +16,7 @@
 import netaddr
 from oslo.config import cfg
 import sqlalchemy as sa
+from sqlalchemy import event
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
 from sqlalchemy.orm.properties import RelationshipProperty
@@ -41,6 +42,15 @@ class FloatingIpAllocation(model_base.BASEV2):
     """use this table for a new Algorithm of floatingip.
     """
 
+    __table_args__ = (
+        # The queues of the recycled floatingips, oldest first
+        sa.Index('ix_floatingipallocations_recycled',
+                 'allocated', 'floating_subnet_id', 'updated_at'),
+        sa.Index('ix_floatingipallocations_tenant_recycled',
+                 'last_tenant_id', 'allocated', 'updated_at'),
+        model_base.BASEV2.__table_args__,
+    )
+
     floating_ip_address = sa.Column(sa.String(64),
                              primary_key=True,nullable=False)
     last_tenant_id = sa.Column(sa.String(255), nullable=True)
@@ -48,6 +58,33 @@ class FloatingIpAllocation(model_base.BASEV2):
     allocated = sa.Column(sa.Boolean, nullable=True)
     updated_at = sa.Column(sa.DateTime, nullable=False)
 
+
+class FloatingIpSubnetCounter(model_base.BASEV2):
+    """Counts the never used and the recycled floatingips of a subnet.
+
+    The counters are initialized from the allocation pools and the
+    allocations of the subnet the first time a floatingip is allocated on
+    it, then maintained by the allocations.
+    """
+
+    floating_subnet_id = sa.Column(sa.String(255), primary_key=True)
+    free_count = sa.Column(sa.BigInteger, nullable=False)
+    recycled_count = sa.Column(sa.Integer, nullable=False)
+
+
+def _drop_floatingip_counter(mapper, connection, pool):
+    """Drop the counters of a subnet whose allocation pools change.
+
+    They are initialized again from the new pools by the next allocation.
+    """
+    connection.execute(FloatingIpSubnetCounter.__table__.delete().where(
+        FloatingIpSubnetCounter.floating_subnet_id == pool.subnet_id))
+
+
+event.listen(models_v2.IPAllocationPool, 'after_insert',
+             _drop_floatingip_counter)
+
+
 class Floatingip_Allocation_db_mixin(object):
 
     @property
@@ -64,9 +101,13 @@ class Floatingip_Allocation_db_mixin(object):
 
     def clear_floatingip_allocation(self, subnet_id):
         admin_cxt = neutron_context.get_admin_context()
-        fip_qry = admin_cxt.session.query(
-                 FloatingIpAllocation).filter_by(
-                 floating_subnet_id=subnet_id).delete()
+        with admin_cxt.session.begin(subtransactions=True):
+            admin_cxt.session.query(
+                FloatingIpAllocation).filter_by(
+                floating_subnet_id=subnet_id).delete()
+            admin_cxt.session.query(
+                FloatingIpSubnetCounter).filter_by(
+                floating_subnet_id=subnet_id).delete()
         LOG.info("clear floatingip allocation table successfully")
 
     def _create_floatingip_allocation(self, context, floatingip):
@@ -109,56 +150,25 @@ class Floatingip_Allocation_db_mixin(object):
 
     def _get_tenant_floatingip_noused(self, context, tenant_id, subnets):
         subnet_ids = [subnet['id'] for subnet in subnets]
-        fip_allocs = None
-
-        sorts = [('updated_at', False)]
-        filters = {'allocated':[False],
-                   'last_tenant_id':[tenant_id],
-                   'floating_subnet_id':subnet_ids}
-
-        fip_allocs = self._get_floatingip_allocations(context,
-                            filters=filters, sorts=sorts)
-
-        if fip_allocs:
-            return fip_allocs[0]['floating_ip_address']
-
-        return fip_allocs
-
-    def _get_floatingip_range_count(self, context, subnets):
-        """ 
-        Get all floatingip of allocation pools in subnets
-        """
-        sum = 0
-        for subnet in subnets:
-            allocation_pools = subnet['allocation_pools']
-            for ip_pool in allocation_pools:
-                try:
-                    start_ip = netaddr.IPAddress(ip_pool['start'])
-                    end_ip = netaddr.IPAddress(ip_pool['end'])
-                except netaddr.AddrFormatError:
-                    LOG.info(_("Found invalid IP address in pool: "
-                               "%(start)s - %(end)s:"),
-                             {'start': ip_pool['start'],
-                              'end': ip_pool['end']})
-                    raise n_exc.InvalidAllocationPool(pool=ip_pool)
-                num = len(netaddr.IPRange(ip_pool['start'],ip_pool['end']))
-                sum+=num
-        LOG.info('get floatingip range count : %s' % sum)
-        return sum
+        fip_alloc = context.session.query(
+            FloatingIpAllocation.floating_ip_address).filter(
+                FloatingIpAllocation.last_tenant_id == tenant_id,
+                FloatingIpAllocation.allocated == sa.false(),
+                FloatingIpAllocation.floating_subnet_id.in_(subnet_ids)
+            ).order_by(FloatingIpAllocation.updated_at.desc()).first()
+        return fip_alloc and fip_alloc.floating_ip_address
 
     def _get_oldest_floaingip_address(self, context, subnets):
         subnet_ids = [subnet['id'] for subnet in subnets]
-        sorts = [('updated_at', True)]
-        filters = {'allocated': [False],
-                   'floating_subnet_id':subnet_ids}
-        floatingip_allocations = self._get_floatingip_allocations(
-                                    context, filters=filters, sorts=sorts)
-        if not floatingip_allocations:
+        fip_alloc = context.session.query(
+            FloatingIpAllocation.floating_ip_address).filter(
+                FloatingIpAllocation.allocated == sa.false(),
+                FloatingIpAllocation.floating_subnet_id.in_(subnet_ids)
+            ).order_by(FloatingIpAllocation.updated_at).first()
+        if not fip_alloc:
             raise uosfloatingip.FloatingipNoAvaliable()
 
-        floating_ip_address = floatingip_allocations[0].get(
-                                'floating_ip_address', None)
-
+        floating_ip_address = fip_alloc.floating_ip_address
         LOG.info('get oldest floating_ip_address : %s' % floating_ip_address)
         return floating_ip_address
 
@@ -183,13 +193,61 @@ class Floatingip_Allocation_db_mixin(object):
         LOG.info('get floatingip count : %s' % sum)
         return sum
 
+    def _get_floatingip_counters(self, context, subnets, recount=False):
+        """Return the counters of the subnets, initializing the missing ones.
+
+        With recount, the counters are initialized again from the allocation
+        pools and the allocations of the subnets.
+        """
+        subnet_ids = [subnet['id'] for subnet in subnets]
+        if recount:
+            context.session.query(FloatingIpSubnetCounter).filter(
+                FloatingIpSubnetCounter.floating_subnet_id.in_(subnet_ids)
+            ).delete(synchronize_session='fetch')
+        counters = dict(
+            (counter.floating_subnet_id, counter) for counter in
+            context.session.query(FloatingIpSubnetCounter).filter(
+                FloatingIpSubnetCounter.floating_subnet_id.in_(subnet_ids)))
+        for subnet in subnets:
+            if subnet['id'] in counters:
+                continue
+            pool_qry = context.session.query(
+                models_v2.IPAllocationPool).filter_by(subnet_id=subnet['id'])
+            range_count = sum(
+                netaddr.IPRange(pool['first_ip'], pool['last_ip']).size
+                for pool in pool_qry)
+            recycled_count = (self._model_query(context, FloatingIpAllocation).
+                              filter(FloatingIpAllocation.allocated == False).
+                              filter(FloatingIpAllocation.floating_subnet_id ==
+                                     subnet['id'])).count()
+            free_count = range_count - self._get_floatingip_count(context,
+                                                                  [subnet])
+            counter = FloatingIpSubnetCounter(
+                floating_subnet_id=subnet['id'],
+                free_count=max(free_count, 0),
+                recycled_count=recycled_count)
+            context.session.add(counter)
+            counters[subnet['id']] = counter
+        return [counters[subnet_id] for subnet_id in subnet_ids]
+
+    def _update_floatingip_counter(self, context, subnet_id, **deltas):
+        """Update the counters of the subnet in a single statement."""
+        values = dict(
+            (name, getattr(FloatingIpSubnetCounter, name) + delta)
+            for name, delta in deltas.items())
+        context.session.query(FloatingIpSubnetCounter).filter_by(
+            floating_subnet_id=subnet_id).update(
+                values, synchronize_session=False)
+
     def _get_valid_subnets(self, context, floatingip):
         floatingip_service_provider = floatingip.get(uosfloatingip.UOS_SERVICE_PROVIDER)
         network_id = floatingip.get('floating_network_id')
         subnet_id = floatingip.get('floating_subnet_id', None)
 
         filter = {'network_id': [network_id]}
-        subnets = self._core_plugin.get_subnets(context, filters=filter)
+        fields = ['id', 'name', uosfloatingip.UOS_SERVICE_PROVIDER]
+        subnets = self._core_plugin.get_subnets(context, filters=filter,
+                                                fields=fields)
 
         LOG.info("get all subnets: %s" % subnets)
 
@@ -214,6 +272,32 @@ class Floatingip_Allocation_db_mixin(object):
         LOG.info("get valid subnets: %s" % valid_subnets)
         return valid_subnets
 
+    def _generate_floatingip(self, context, subnets, counters):
+        """Generate a never used floatingip from the subnets with some left.
+        """
+        free_subnets = [subnet for subnet, counter
+                        in zip(subnets, counters)
+                        if counter.free_count > 0]
+        if not free_subnets:
+            return
+        try:
+            fip = self._core_plugin.generate_ip(context, free_subnets)
+        except n_exc.IpAddressGenerationFailure:
+            fip = None
+        if fip:
+            self._update_floatingip_counter(
+                context, fip['subnet_id'], free_count=-1)
+        else:
+            # The counters missed allocations done outside of the
+            # floatingips, the subnets are actually full
+            for subnet in free_subnets:
+                context.session.query(
+                    FloatingIpSubnetCounter).filter_by(
+                        floating_subnet_id=subnet['id']).update(
+                            {'free_count': 0},
+                            synchronize_session=False)
+        return fip
+
     def allocate_floatingip_address(self, context, floatingip_dict):
         floatingip = floatingip_dict['floatingip'].copy()
         floating_ip_address = floatingip.get('floating_ip_address', None)
@@ -235,23 +319,25 @@ class Floatingip_Allocation_db_mixin(object):
         # for input tenant
         if floating_ip_address:
             return floating_ip_address
-        else:
-            fip_range_count = self._get_floatingip_range_count(
-                                     admin_cxt, subnets)
-            fip_alloc_count = self._get_floatingip_count(admin_cxt, subnets)
-            # if fip_range_count greater than fip_alloc_count, it specified there is
-            # no used floatingip, so we should get a floatingip from ipavailablepool table,
-            # else we get a floating ip from floatingipallocations table
-            if fip_range_count > fip_alloc_count:
-                fip = self._core_plugin.generate_ip(admin_cxt, subnets)
-                if not fip:
-                    raise uosfloatingip.FloatingipNoAvaliable()
-                else:
-                    floating_ip_address = fip['ip_address']
-            elif fip_range_count == fip_alloc_count:
-                floating_ip_address = self._get_oldest_floaingip_address(context, subnets)
+        with admin_cxt.session.begin(subtransactions=True):
+            counters = self._get_floatingip_counters(admin_cxt, subnets)
+            # Use the never used floatingips of the subnets first, then the
+            # oldest recycled floatingip
+            fip = self._generate_floatingip(admin_cxt, subnets, counters)
+            if not fip and not any(counter.recycled_count > 0
+                                   for counter in counters):
+                # The pools may have been extended, or addresses released by
+                # other ports, since the counters were initialized
+                counters = self._get_floatingip_counters(admin_cxt, subnets,
+                                                         recount=True)
+                fip = self._generate_floatingip(admin_cxt, subnets, counters)
+            if fip:
+                floating_ip_address = fip['ip_address']
+            elif any(counter.recycled_count > 0 for counter in counters):
+                floating_ip_address = self._get_oldest_floaingip_address(
+                    admin_cxt, subnets)
             else:
-                LOG.warn('the num of floatingip allocation table exception')
+                raise uosfloatingip.FloatingipNoAvaliable()
 
         LOG.info('return floatigip ip address %s ' % floating_ip_address)
         return floating_ip_address
@@ -264,9 +350,20 @@ class Floatingip_Allocation_db_mixin(object):
                       'floating_ip_address':floatingip['floating_ip_address'],
                       'floating_subnet_id':floatingip['floating_subnet_id']
                     }
-        filters = {'floating_ip_address':[floating_ip_address]}
-        fip_allocs = self._get_floatingip_allocations(context, filters=filters)
-        if not fip_allocs:
-            self._create_floatingip_allocation(context, fip_alloc)
-        else:
-            self._update_floatingip_time_tenant(context, fip_alloc)
+        with context.session.begin(subtransactions=True):
+            fip_alloc_db = context.session.query(
+                FloatingIpAllocation.allocated).filter_by(
+                    floating_ip_address=floating_ip_address).first()
+            if not fip_alloc_db:
+                self._create_floatingip_allocation(context, fip_alloc)
+                was_recycled = False
+            else:
+                self._update_floatingip_time_tenant(context, fip_alloc)
+                was_recycled = fip_alloc_db.allocated is False
+            # Keep the recycled counter of the subnet in sync with the
+            # recycled floatingips queue
+            delta = int(not allocated) - int(was_recycled)
+            if delta:
+                self._update_floatingip_counter(
+                    context, fip_alloc['floating_subnet_id'],
+                    recycled_count=delta)
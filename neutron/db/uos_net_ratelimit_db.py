@@ -39,7 +39,8 @@ class Uos_net_ratelimit_db_mixin(object):
 
     # Register dict extend functions for ports and networks
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-        attributes.NETWORKS, ['_extend_net_dict_ratelimit'])
+        attributes.NETWORKS, ['_extend_net_dict_ratelimit'],
+        fields=[RATE_LIMIT])
 
     def _extend_net_dict_ratelimit(self, net_res, net_db):
         net_res[RATE_LIMIT] = net_db.uos_rate_limit
@@ -36,7 +36,8 @@ class Uos_subnet_service_provider_db_mixin(object):
 
     # Register dict extend functions for subnets
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-        attributes.SUBNETS, ['_extend_subnet_dict_service_provider'])
+        attributes.SUBNETS, ['_extend_subnet_dict_service_provider'],
+        fields=[uos_service_provider.SERVICE_PROVIDER])
 
     def _extend_subnet_dict_service_provider(self, subnet_res, subnet_db):
         subnet_res[uos_service_provider.SERVICE_PROVIDER] = subnet_db.uos_service_provider
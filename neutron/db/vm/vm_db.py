@@ -37,6 +37,7 @@ from neutron.db import common_db_mixin
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.db import l3_db as l3
+from neutron.db import sqlalchemyutils
 from neutron.extensions import servicevm
 from neutron.extensions import l3 as l3_ext
 from neutron import manager
@@ -58,6 +59,8 @@ _ACTIVE_UPDATE_ERROR_DEAD = (
 DEVICE_OWNER_ROUTER_INTF = n_constants.DEVICE_OWNER_ROUTER_INTF
 DEVICE_OWNER_ROUTER_GW = n_constants.DEVICE_OWNER_ROUTER_GW
 DEVICE_OWNER_FLOATINGIP = n_constants.DEVICE_OWNER_FLOATINGIP
+# Matches the ids of the devices which are not internally used records
+_UUID_LIKE_PATTERN = '________-____-____-____-____________'
 EXTERNAL_GW_INFO = l3_ext.EXTERNAL_GW_INFO
 INSTANCE_HOST_ATTR = 'OS-EXT-SRV-ATTR:host'
 
@@ -311,6 +314,11 @@ class ServiceResourcePluginDb(servicevm.ServiceVMPluginBase,
             else:
                 raise
 
+    def _get_pagination_marker(self, context, model, limit, marker):
+        if limit and marker:
+            return self._get_resource(context, model, marker)
+        return None
+
     def _make_attributes_dict(self, attributes_db):
         return dict((attr.key, attr.value) for attr in attributes_db)
 
@@ -488,10 +496,17 @@ class ServiceResourcePluginDb(servicevm.ServiceVMPluginBase,
                                          device_template_id)
         return self._make_template_dict(template_db)
 
-    def get_device_templates(self, context, filters, fields=None):
+    def get_device_templates(self, context, filters=None, fields=None,
+                             sorts=None, limit=None, marker=None,
+                             page_reverse=False):
+        marker_obj = self._get_pagination_marker(context, DeviceTemplate,
+                                                 limit, marker)
         return self._get_collection(context, DeviceTemplate,
                                     self._make_template_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     # called internally, not by REST API
     # need enhancement?
@@ -724,13 +739,24 @@ class ServiceResourcePluginDb(servicevm.ServiceVMPluginBase,
         device_db = self._get_resource(context, Device, device_id)
         return self._make_device_dict(device_db, fields)
 
-    def get_devices(self, context, filters=None, fields=None):
-        devices = self._get_collection(context, Device, self._make_device_dict,
-                                    filters=filters, fields=fields)
-        # Ugly hack to mask internaly used record
-        a = [device for device in devices
-                if uuidutils.is_uuid_like(device['id'])]
-        return a
+    def get_devices(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None, page_reverse=False):
+        marker_obj = self._get_pagination_marker(context, Device,
+                                                 limit, marker)
+        query = self._model_query(context, Device)
+        # Ugly hack to mask internaly used record. They are left out by the
+        # query so that a page never holds less than limit devices.
+        query = query.filter(Device.id.like(_UUID_LIKE_PATTERN))
+        query = self._apply_filters_to_query(query, Device, filters)
+        if limit and page_reverse and sorts:
+            sorts = [(s[0], not s[1]) for s in sorts]
+        query = sqlalchemyutils.paginate_query(query, Device, limit, sorts,
+                                               marker_obj=marker_obj)
+        devices = [self._make_device_dict(device_db, fields)
+                   for device_db in query]
+        if limit and page_reverse:
+            devices.reverse()
+        return devices
 
     def _mark_device_status(self, device_id, exclude_status, new_status):
         context = t_context.get_admin_context()
@@ -1126,15 +1152,25 @@ class ServiceResourcePluginDb(servicevm.ServiceVMPluginBase,
                                          service_instance_id)
         return self._make_service_instance_dict(instance_db, fields)
 
-    def get_service_instances(self, context, filters=None, fields=None):
+    def get_service_instances(self, context, filters=None, fields=None,
+                              sorts=None, limit=None, marker=None,
+                              page_reverse=False):
+        marker_obj = self._get_pagination_marker(context, ServiceInstance,
+                                                 limit, marker)
         return self._get_collection(
             context, ServiceInstance, self._make_service_instance_dict,
-            filters=filters, fields=fields)
-
-    def get_service_types(self, context, filters=None, fields=None):
+            filters=filters, fields=fields, sorts=sorts, limit=limit,
+            marker_obj=marker_obj, page_reverse=page_reverse)
+
+    def get_service_types(self, context, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
+        marker_obj = self._get_pagination_marker(context, ServiceType,
+                                                 limit, marker)
         service_types = self._get_collection(
             context, ServiceType, self._make_service_type_dict,
-            filters=filters, fields=fields)
+            filters=filters, fields=fields, sorts=sorts, limit=limit,
+            marker_obj=marker_obj, page_reverse=page_reverse)
         return service_types
 
     def get_service_type(self, context, service_type_id, fields=None):
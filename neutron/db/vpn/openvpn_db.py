@@ -402,10 +402,17 @@ class OpenVPNDbMixin(OpenVPNDbCommon):
         return self._make_openvpnconnection_dict(
             openvpnconnection_db, fields)
 
-    def get_openvpnconnections(self, context, filters=None, fields=None):
+    def get_openvpnconnections(self, context, filters=None, fields=None,
+                               sorts=None, limit=None, marker=None,
+                               page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'openvpnconnection_db',
+                                          limit, marker)
         return self._get_collection(context, OpenVPNConnection,
                                     self._make_openvpnconnection_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def check_for_dup_router_subnet(self, context, router_id,
                                     subnet_id, subnet_cidr):
@@ -206,10 +206,17 @@ class PPTPDVPNDbMixin(pptpvpnaas.VPNPluginBase, common_db_mixin.CommonDbMixin):
         return self._make_pptpconnection_dict(
             pptpconnection_db, fields)
 
-    def get_pptpconnections(self, context, filters=None, fields=None):
+    def get_pptpconnections(self, context, filters=None, fields=None,
+                            sorts=None, limit=None, marker=None,
+                            page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'pptpconnection_db',
+                                          limit, marker)
         return self._get_collection(context, PPTPConnection,
                                     self._make_pptpconnection_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def check_router_in_use(self, context, router_id):
         # called from l3 db
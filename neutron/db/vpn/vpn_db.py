@@ -352,10 +352,17 @@ class VPNPluginDb(vpnaas.VPNPluginBase, base_db.CommonDbMixin):
         return self._make_ipsec_site_connection_dict(
             ipsec_site_conn_db, fields)
 
-    def get_ipsec_site_connections(self, context, filters=None, fields=None):
+    def get_ipsec_site_connections(self, context, filters=None, fields=None,
+                                   sorts=None, limit=None, marker=None,
+                                   page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'ipsec_site_connection',
+                                          limit, marker)
         return self._get_collection(context, IPsecSiteConnection,
                                     self._make_ipsec_site_connection_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def update_ipsec_site_conn_status(self, context, conn_id, new_status):
         with context.session.begin():
@@ -446,14 +453,23 @@ class VPNPluginDb(vpnaas.VPNPluginBase, base_db.CommonDbMixin):
             ike_db = self._get_ipsec_resource(context, IKEPolicy, ikepolicy_id)
             context.session.delete(ike_db)
 
+    def _get_ikepolicy(self, context, ikepolicy_id):
+        return self._get_ipsec_resource(context, IKEPolicy, ikepolicy_id)
+
     def get_ikepolicy(self, context, ikepolicy_id, fields=None):
         ike_db = self._get_ipsec_resource(context, IKEPolicy, ikepolicy_id)
         return self._make_ikepolicy_dict(ike_db, fields)
 
-    def get_ikepolicies(self, context, filters=None, fields=None):
+    def get_ikepolicies(self, context, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'ikepolicy', limit, marker)
         return self._get_collection(context, IKEPolicy,
                                     self._make_ikepolicy_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def _make_ipsecpolicy_dict(self, ipsecpolicy, fields=None):
 
@@ -528,14 +544,24 @@ class VPNPluginDb(vpnaas.VPNPluginBase, base_db.CommonDbMixin):
             ipsec_db = self._get_ipsec_resource(context, IPsecPolicy, ipsecpolicy_id)
             context.session.delete(ipsec_db)
 
+    def _get_ipsecpolicy(self, context, ipsecpolicy_id):
+        return self._get_ipsec_resource(context, IPsecPolicy, ipsecpolicy_id)
+
     def get_ipsecpolicy(self, context, ipsecpolicy_id, fields=None):
         ipsec_db = self._get_ipsec_resource(context, IPsecPolicy, ipsecpolicy_id)
         return self._make_ipsecpolicy_dict(ipsec_db, fields)
 
-    def get_ipsecpolicies(self, context, filters=None, fields=None):
+    def get_ipsecpolicies(self, context, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'ipsecpolicy',
+                                          limit, marker)
         return self._get_collection(context, IPsecPolicy,
                                     self._make_ipsecpolicy_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def _make_vpnservice_dict(self, vpnservice, fields=None):
         res = {'id': vpnservice['id'],
@@ -590,10 +616,16 @@ class VPNPluginDb(vpnaas.VPNPluginBase, base_db.CommonDbMixin):
         vpns_db = self._get_ipsec_resource(context, VPNService, vpnservice_id)
         return self._make_vpnservice_dict(vpns_db, fields)
 
-    def get_vpnservices(self, context, filters=None, fields=None):
+    def get_vpnservices(self, context, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'vpnservice', limit, marker)
         return self._get_collection(context, VPNService,
                                     self._make_vpnservice_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def check_router_in_use(self, context, router_id):
         vpnservices = self.get_vpnservices(
@@ -108,12 +108,21 @@ class VPNUserNDbMixin(vpnuser_ext.VPNUserPluginBase,
         if self.vpnuser_notifier:
             self.vpnuser_notifier.notify_user_change(context)
 
+    def _get_vpnuser(self, context, vpnuser_id):
+        return self._get_by_id(context, VPNuser, vpnuser_id)
+
     def get_vpnuser(self, context, vpnuser_id, fields=None):
-        vpnusern_db = self._get_by_id(context, VPNuser, vpnuser_id)
+        vpnusern_db = self._get_vpnuser(context, vpnuser_id)
         return self._make_vpnuser_dict(
             vpnusern_db, fields)
 
-    def get_vpnusers(self, context, filters=None, fields=None):
+    def get_vpnusers(self, context, filters=None, fields=None,
+                     sorts=None, limit=None, marker=None,
+                     page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'vpnuser', limit, marker)
         return self._get_collection(context, VPNuser,
                                     self._make_vpnuser_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
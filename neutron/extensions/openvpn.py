@@ -223,7 +223,9 @@ class OpenVPNPluginBase(service_base.ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_openvpnconnections(self, context, filters=None, fields=None):
+    def get_openvpnconnections(self, context, filters=None, fields=None,
+                               sorts=None, limit=None, marker=None,
+                               page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -177,7 +177,9 @@ class VPNPluginBase(service_base.ServicePluginBase):
         return 'VPN service plugin'
 
     @abc.abstractmethod
-    def get_pptpconnections(self, context, filters=None, fields=None):
+    def get_pptpconnections(self, context, filters=None, fields=None,
+                            sorts=None, limit=None, marker=None,
+                            page_reverse=False):
         pass
 
     @abc.abstractmethod
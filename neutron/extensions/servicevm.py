@@ -551,11 +551,15 @@ class ServiceVMPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_device_templates(self, context, filters=None, fields=None):
+    def get_device_templates(self, context, filters=None, fields=None,
+                             sorts=None, limit=None, marker=None,
+                             page_reverse=False):
         pass
 
     @abc.abstractmethod
-    def get_devices(self, context, filters=None, fields=None):
+    def get_devices(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None,
+                    page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -584,7 +588,9 @@ class ServiceVMPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_service_instances(self, context, filters=None, fields=None):
+    def get_service_instances(self, context, filters=None, fields=None,
+                              sorts=None, limit=None, marker=None,
+                              page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -597,5 +603,7 @@ class ServiceVMPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_service_types(self, context, filters=None, fields=None):
+    def get_service_types(self, context, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
         pass
@@ -435,7 +435,7 @@ class UosController(wsgi.Controller):
         #NOTE(gongysh) authz
         router.get_router(context, id)
         result = router.add_router_portforwarding(context, id, body)
-        router.l3_rpc_notifier.routers_updated(context, [id])
+        router.notify_router_updated(context, id)
         return result
 
     @validate(None, None, "remove_router_portforwarding")
@@ -445,7 +445,7 @@ class UosController(wsgi.Controller):
         #NOTE(gongysh) authz
         router.get_router(context, id)
         data = router.remove_router_portforwarding(context, id, body)
-        router.l3_rpc_notifier.routers_updated(context, [id])
+        router.notify_router_updated(context, id)
         return data
 
     @validate('floatingips', 'rate_limit', "update_floatingip_ratelimit")
@@ -474,7 +474,7 @@ class UosController(wsgi.Controller):
 
         router_id = floating_ip['router_id']
         if router_id:
-            router.l3_rpc_notifier.routers_updated(context, [router_id])
+            router.notify_router_updated(context, router_id)
         result = router._make_floatingip_dict(floating_ip)
         _notifier.info(context, 'floatingip.update_ratelimit.end',
                        {'floatingip': result})
@@ -56,6 +56,15 @@ class GWPortForFloatingIPNotFound(n_exc.NotFound):
     message = _("Gateway port for router %(id)s not found.")
 
 
+class NoAvaliableSubnet(n_exc.NotFound):
+    message = _("No subnet of network %(network_id)s is available for "
+                "floatingips.")
+
+
+class FloatingipNoAvaliable(n_exc.Conflict):
+    message = _("No floatingip address is available.")
+
+
 class Uosfloatingip(extensions.ExtensionDescriptor):
 
     @classmethod
@@ -178,7 +178,9 @@ class VPNUserPluginBase(service_base.ServicePluginBase):
         return 'VPN User service plugin'
 
     @abc.abstractmethod
-    def get_vpnusers(self, context, filters=None, fields=None):
+    def get_vpnusers(self, context, filters=None, fields=None,
+                     sorts=None, limit=None, marker=None,
+                     page_reverse=False):
         pass
 
     @abc.abstractmethod
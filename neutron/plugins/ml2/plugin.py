@@ -427,17 +427,27 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._update_port_dict_binding(port_res, port_db.port_binding)
 
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-        attributes.PORTS, ['_ml2_extend_port_dict_binding'])
+        attributes.PORTS, ['_ml2_extend_port_dict_binding'],
+        fields=portbindings.EXTENDED_ATTRIBUTES_2_0[attributes.PORTS].keys())
 
     # Register extend dict methods for network and port resources.
     # Each mechanism driver that supports extend attribute for the resources
     # can add those attribute to the result.
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-               attributes.NETWORKS, ['_ml2_md_extend_network_dict'])
+               attributes.NETWORKS, ['_ml2_md_extend_network_dict'],
+               fields='_ml2_md_extend_fields')
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-               attributes.PORTS, ['_ml2_md_extend_port_dict'])
+               attributes.PORTS, ['_ml2_md_extend_port_dict'],
+               fields='_ml2_md_extend_fields')
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-               attributes.SUBNETS, ['_ml2_md_extend_subnet_dict'])
+               attributes.SUBNETS, ['_ml2_md_extend_subnet_dict'],
+               fields='_ml2_md_extend_fields')
+
+    def _ml2_md_extend_fields(self):
+        # The fields added by extension drivers are not known
+        if self.extension_manager.ordered_ext_drivers:
+            return None
+        return []
 
     def _ml2_md_extend_network_dict(self, result, netdb):
         session = db_api.get_session()
@@ -494,8 +504,6 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                                   segment[api.SEGMENTATION_ID],
                                   segment[api.PHYSICAL_NETWORK])
 
-    # TODO(apech): Need to override bulk operations
-
     def update_extra_net_data(self, context, network, netdb):
         self._process_uos_ratelimit_update(context, network, netdb)
 
@@ -508,7 +516,65 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
     def add_extra_subnet_data(self, context, subnet, subnetdb):
         self._process_uos_service_provider_create(context, subnet, subnetdb)
 
-    def create_network(self, context, network):
+    def _create_bulk_ml2(self, resource, context, request_items):
+        objects = []
+        collection = "%ss" % resource
+        items = request_items[collection]
+        obj_creator = getattr(self, '_create_%s_db' % resource)
+        item = None
+        try:
+            with context.session.begin(subtransactions=True):
+                if resource == attributes.PORT:
+                    # Generate the addresses of all the ports in a single
+                    # pass over the locked availability ranges
+                    creator_kwargs = [
+                        {'generated_ips': ips} for ips in
+                        self._generate_ips_for_ports(context, items)]
+                else:
+                    creator_kwargs = [{}] * len(items)
+                for item, kwargs in zip(items, creator_kwargs):
+                    result, mech_context = obj_creator(context, item,
+                                                       **kwargs)
+                    objects.append({'mech_context': mech_context,
+                                    'result': result,
+                                    'attributes': item[resource]})
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_("An exception occurred while creating "
+                            "the %(resource)s:%(item)s"),
+                          {'resource': resource, 'item': item})
+
+        try:
+            postcommit_op = getattr(self.mechanism_manager,
+                                    'create_%s_postcommit' % resource)
+            for obj in objects:
+                postcommit_op(obj['mech_context'])
+            return objects
+        except ml2_exc.MechanismDriverError:
+            with excutils.save_and_reraise_exception():
+                resource_ids = [res['result']['id'] for res in objects]
+                LOG.error(_("mechanism_manager.create_%(res)s_postcommit "
+                            "failed for %(res)s: '%(failed_id)s'. Deleting "
+                            "%(res)ss %(resource_ids)s"),
+                          {'res': resource,
+                           'failed_id': obj['result']['id'],
+                           'resource_ids': ', '.join(resource_ids)})
+                self._delete_objects(context, resource, objects)
+
+    def _delete_objects(self, context, resource, objects):
+        delete_op = getattr(self, 'delete_%s' % resource)
+        for obj in objects:
+            try:
+                delete_op(context, obj['result']['id'])
+            except KeyError:
+                LOG.exception(_("Could not find %s to delete."),
+                              resource)
+            except Exception:
+                LOG.exception(_("Could not delete %(res)s %(id)s."),
+                              {'res': resource,
+                               'id': obj['result']['id']})
+
+    def _create_network_db(self, context, network):
         net_data = network['network']
         tenant_id = self._get_tenant_id_for_create(context, net_data)
         session = context.session
@@ -525,7 +591,10 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             mech_context = driver_context.NetworkContext(self, context,
                                                          result)
             self.mechanism_manager.create_network_precommit(mech_context)
+        return result, mech_context
 
+    def create_network(self, context, network):
+        result, mech_context = self._create_network_db(context, network)
         try:
             self.mechanism_manager.create_network_postcommit(mech_context)
         except ml2_exc.MechanismDriverError:
@@ -535,6 +604,10 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                 self.delete_network(context, result['id'])
         return result
 
+    def create_network_bulk(self, context, networks):
+        objects = self._create_bulk_ml2(attributes.NETWORK, context, networks)
+        return [obj['result'] for obj in objects]
+
     def update_network(self, context, id, network):
         provider._raise_if_updates_provider_attributes(network['network'])
 
@@ -680,7 +753,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             LOG.error(_("mechanism_manager.delete_network_postcommit failed"))
         self.notifier.network_delete(context, id)
 
-    def create_subnet(self, context, subnet):
+    def _create_subnet_db(self, context, subnet):
         session = context.session
         with session.begin(subtransactions=True):
             result = super(Ml2Plugin, self).create_subnet(context, subnet)
@@ -688,7 +761,10 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                                                          result)
             mech_context = driver_context.SubnetContext(self, context, result)
             self.mechanism_manager.create_subnet_precommit(mech_context)
+        return result, mech_context
 
+    def create_subnet(self, context, subnet):
+        result, mech_context = self._create_subnet_db(context, subnet)
         try:
             self.mechanism_manager.create_subnet_postcommit(mech_context)
         except ml2_exc.MechanismDriverError:
@@ -698,6 +774,10 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                 self.delete_subnet(context, result['id'])
         return result
 
+    def create_subnet_bulk(self, context, subnets):
+        objects = self._create_bulk_ml2(attributes.SUBNET, context, subnets)
+        return [obj['result'] for obj in objects]
+
     def update_subnet(self, context, id, subnet):
         session = context.session
         with session.begin(subtransactions=True):
@@ -788,7 +868,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             # the fact that an error occurred.
             LOG.error(_("mechanism_manager.delete_subnet_postcommit failed"))
 
-    def create_port(self, context, port):
+    def _create_port_db(self, context, port, generated_ips=None):
         attrs = port['port']
         attrs['status'] = const.PORT_STATUS_DOWN
 
@@ -813,7 +893,8 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._ensure_default_security_group_on_port(context, port)
             sgids = self._get_security_groups_on_port(context, port)
             dhcp_opts = port['port'].get(edo_ext.EXTRADHCPOPTS, [])
-            result = super(Ml2Plugin, self).create_port(context, port)
+            result = super(Ml2Plugin, self).create_port(
+                context, port, generated_ips=generated_ips)
             self.extension_manager.process_create_port(session, attrs, result)
             self._process_port_create_security_group(context, result, sgids)
             network = self.get_network(context, result['network_id'])
@@ -829,7 +910,10 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._process_port_create_extra_dhcp_opts(context, result,
                                                       dhcp_opts)
             self.mechanism_manager.create_port_precommit(mech_context)
+        return result, mech_context
 
+    def create_port(self, context, port):
+        result, mech_context = self._create_port_db(context, port)
         try:
             self.mechanism_manager.create_port_postcommit(mech_context)
         except ml2_exc.MechanismDriverError:
@@ -851,6 +935,27 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                 self.delete_port(context, result['id'])
         return bound_context._port
 
+    def create_port_bulk(self, context, ports):
+        objects = self._create_bulk_ml2(attributes.PORT, context, ports)
+
+        # REVISIT(rkukura): Is there any point in calling this before
+        # a binding has been successfully established?
+        results = [obj['result'] for obj in objects]
+        self.notify_security_groups_member_updated_bulk(context, results)
+
+        try:
+            for obj in objects:
+                obj['bound_context'] = self._bind_port_if_needed(
+                    obj['mech_context'])
+            return [obj['bound_context']._port for obj in objects]
+        except ml2_exc.MechanismDriverError:
+            with excutils.save_and_reraise_exception():
+                resource_ids = [res['result']['id'] for res in objects]
+                LOG.error(_("_bind_port_if_needed failed. "
+                            "Deleting all ports from create bulk '%s'"),
+                          resource_ids)
+                self._delete_objects(context, attributes.PORT, objects)
+
     def update_port(self, context, id, port):
         attrs = port['port']
         need_port_update_notify = False
@@ -174,9 +174,11 @@ class QoSDbMixin(qos.QueuePluginBase):
 
     # Register dict extend functions for networks and ports
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-        attr.NETWORKS, ['_extend_network_dict_qos_queue'])
+        attr.NETWORKS, ['_extend_network_dict_qos_queue'],
+        fields=[qos.QUEUE])
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
-        attr.PORTS, ['_extend_port_dict_qos_queue'])
+        attr.PORTS, ['_extend_port_dict_qos_queue'],
+        fields=[qos.QUEUE])
 
     def _make_qos_queue_dict(self, queue, fields=None):
         res = {'id': queue['id'],
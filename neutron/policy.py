@@ -27,6 +27,7 @@ import neutron.common.utils as utils
 from neutron.openstack.common import excutils
 from neutron.openstack.common.gettextutils import _LE, _LI, _LW
 from neutron.openstack.common import importutils
+from neutron.openstack.common import local
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import policy
 
@@ -34,6 +35,13 @@ from neutron.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+# Compiled form of each check of the rules
+_COMPILED_CHECKS = {}
+# Maximum number of check results memoized in a context for an action
+_MAX_MEMOIZED_RESULTS = 10000
+# Maximum number of parent resources loaded by a plugin call
+_PREFETCH_CHUNK_SIZE = 500
+_MISSING = object()
 ADMIN_CTX_POLICY = 'context_is_admin'
 # Maps deprecated 'extension' policies to new-style policies
 DEPRECATED_POLICY_MAP = {
@@ -60,6 +68,7 @@ def reset():
     global _POLICY_CACHE
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _COMPILED_CHECKS.clear()
     policy.reset()
 
 
@@ -116,6 +125,9 @@ def _set_rules(data):
                               "deprecated policy %s. The policy will "
                               "not be enforced"), pol)
     policy.set_rules(policies)
+    _COMPILED_CHECKS.clear()
+    for rule in policies.values():
+        _get_compiled_check(rule)
 
 
 def _is_attribute_explicitly_set(attribute_name, resource, target):
@@ -191,6 +203,23 @@ def _build_match_rule(action, target):
     return match_rule
 
 
+def _get_core_plugin():
+    # FIXME(ihrachys): if import is put in global, circular
+    # import failure occurs
+    from neutron import manager
+    return manager.NeutronManager.get_instance().plugin
+
+
+def _get_parent_cache(context):
+    """Return the parent resource attributes loaded for a request context.
+
+    The cache is keyed by (parent resource, parent id, parent field).
+    """
+    if context is None:
+        return {}
+    return context.__dict__.setdefault('_policy_parent_cache', {})
+
+
 # This check is registered as 'tenant_id' so that it can override
 # GenericCheck which was used for validating parent resource ownership.
 # This will prevent us from having to handling backward compatibility
@@ -221,64 +250,73 @@ class OwnerCheck(policy.Check):
                 reason=err_reason)
         super(OwnerCheck, self).__init__(kind, match)
 
+    def _get_parent_resource(self):
+        """Return the parent resource, field and foreign key of the match."""
+        # target field is in the form resource:field
+        # however if they're not separated by a colon, use an underscore
+        # as a separator for backward compatibility
+
+        def do_split(separator):
+            parent_res, parent_field = self.target_field.split(
+                separator, 1)
+            return parent_res, parent_field
+
+        for separator in (':', '_'):
+            try:
+                parent_res, parent_field = do_split(separator)
+                break
+            except ValueError:
+                LOG.debug(_("Unable to find ':' as separator in %s."),
+                          self.target_field)
+        else:
+            # If we are here split failed with both separators
+            err_reason = (_("Unable to find resource name in %s") %
+                          self.target_field)
+            LOG.exception(err_reason)
+            raise exceptions.PolicyCheckError(
+                policy="%s:%s" % (self.kind, self.match),
+                reason=err_reason)
+        parent_foreign_key = attributes.RESOURCE_FOREIGN_KEYS.get(
+            "%ss" % parent_res, None)
+        if not parent_foreign_key:
+            err_reason = (_("Unable to verify match:%(match)s as the "
+                            "parent resource: %(res)s was not found") %
+                          {'match': self.match, 'res': parent_res})
+            LOG.exception(err_reason)
+            raise exceptions.PolicyCheckError(
+                policy="%s:%s" % (self.kind, self.match),
+                reason=err_reason)
+        return parent_res, parent_field, parent_foreign_key
+
     def __call__(self, target, creds):
         if self.target_field not in target:
             # policy needs a plugin check
-            # target field is in the form resource:field
-            # however if they're not separated by a colon, use an underscore
-            # as a separator for backward compatibility
-
-            def do_split(separator):
-                parent_res, parent_field = self.target_field.split(
-                    separator, 1)
-                return parent_res, parent_field
-
-            for separator in (':', '_'):
-                try:
-                    parent_res, parent_field = do_split(separator)
-                    break
-                except ValueError:
-                    LOG.debug(_("Unable to find ':' as separator in %s."),
-                              self.target_field)
+            parent_res, parent_field, parent_foreign_key = (
+                self._get_parent_resource())
+            parent_cache = _get_parent_cache(
+                getattr(local.store, 'context', None))
+            cache_key = (parent_res, target[parent_foreign_key], parent_field)
+            if cache_key in parent_cache:
+                target[self.target_field] = parent_cache[cache_key]
             else:
-                # If we are here split failed with both separators
-                err_reason = (_("Unable to find resource name in %s") %
-                              self.target_field)
-                LOG.exception(err_reason)
-                raise exceptions.PolicyCheckError(
-                    policy="%s:%s" % (self.kind, self.match),
-                    reason=err_reason)
-            parent_foreign_key = attributes.RESOURCE_FOREIGN_KEYS.get(
-                "%ss" % parent_res, None)
-            if not parent_foreign_key:
-                err_reason = (_("Unable to verify match:%(match)s as the "
-                                "parent resource: %(res)s was not found") %
-                              {'match': self.match, 'res': parent_res})
-                LOG.exception(err_reason)
-                raise exceptions.PolicyCheckError(
-                    policy="%s:%s" % (self.kind, self.match),
-                    reason=err_reason)
-            # NOTE(salv-orlando): This check currently assumes the parent
-            # resource is handled by the core plugin. It might be worth
-            # having a way to map resources to plugins so to make this
-            # check more general
-            # FIXME(ihrachys): if import is put in global, circular
-            # import failure occurs
-            from neutron import manager
-            f = getattr(manager.NeutronManager.get_instance().plugin,
-                        'get_%s' % parent_res)
-            # f *must* exist, if not found it is better to let neutron
-            # explode. Check will be performed with admin context
-            context = importutils.import_module('neutron.context')
-            try:
-                data = f(context.get_admin_context(),
-                         target[parent_foreign_key],
-                         fields=[parent_field])
-                target[self.target_field] = data[parent_field]
-            except Exception:
-                with excutils.save_and_reraise_exception():
-                    LOG.exception(_LE('Policy check error while calling %s!'),
-                                  f)
+                # NOTE(salv-orlando): This check currently assumes the
+                # parent resource is handled by the core plugin. It might
+                # be worth having a way to map resources to plugins so to
+                # make this check more general
+                f = getattr(_get_core_plugin(), 'get_%s' % parent_res)
+                # f *must* exist, if not found it is better to let neutron
+                # explode. Check will be performed with admin context
+                context = importutils.import_module('neutron.context')
+                try:
+                    data = f(context.get_admin_context(),
+                             target[parent_foreign_key],
+                             fields=[parent_field])
+                    target[self.target_field] = data[parent_field]
+                except Exception:
+                    with excutils.save_and_reraise_exception():
+                        LOG.exception(_LE('Policy check error while '
+                                          'calling %s!'), f)
+                parent_cache[cache_key] = target[self.target_field]
         match = self.match % target
         if self.kind in creds:
             return match == unicode(creds[self.kind])
@@ -317,6 +355,227 @@ class FieldCheck(policy.Check):
         return target_value == self.value
 
 
+def _get_target_fields(check):
+    """Return the target fields the result of a leaf check depends on.
+
+    None is returned when the result might depend on something else than
+    the target fields and the credentials.
+    """
+    if isinstance(check, OwnerCheck):
+        # The owner of a parent resource is loaded with its foreign key
+        return frozenset([check.target_field] +
+                         attributes.RESOURCE_FOREIGN_KEYS.values())
+    if isinstance(check, FieldCheck):
+        return frozenset([check.field])
+    if type(check) is policy.GenericCheck:
+        fields = re.findall('%\(([^)]*)\)s', check.match)
+        if check.match.count('%') == len(fields):
+            return frozenset(fields)
+    return None
+
+
+def _compile_check(check):
+    """Compile a check of the rule tree to a function of the credentials.
+
+    The function evaluates the parts of the check which only depend on
+    the credentials, and returns either the result or a tuple with a
+    function of the target evaluating the rest of the check and the target
+    fields it depends on. Checks are evaluated in the order of the rule.
+    """
+    if isinstance(check, policy.TrueCheck):
+        return lambda creds: True
+    if isinstance(check, policy.FalseCheck):
+        return lambda creds: False
+    if isinstance(check, policy.RuleCheck):
+        return lambda creds: _specialize_rule(check.match, creds)
+    if isinstance(check, policy.RoleCheck):
+        role = check.match.lower()
+        return lambda creds: role in [x.lower() for x in creds['roles']]
+    if isinstance(check, policy.NotCheck):
+        return _compile_not_check(check)
+    if isinstance(check, policy.AndCheck):
+        return _compile_bool_check(check, False)
+    if isinstance(check, policy.OrCheck):
+        return _compile_bool_check(check, True)
+
+    def specialize(creds):
+        return (lambda target: check(target, creds),
+                _get_target_fields(check))
+    return specialize
+
+
+def _compile_not_check(check):
+    compiled = _get_compiled_check(check.rule)
+
+    def specialize(creds):
+        result = compiled(creds)
+        if not isinstance(result, tuple):
+            return not result
+        func, fields = result
+        return lambda target: not func(target), fields
+    return specialize
+
+
+def _compile_bool_check(check, decisive):
+    """Compile an 'and' (decisive False) or 'or' (decisive True) check."""
+    compiled = [_get_compiled_check(rule) for rule in check.rules]
+
+    def specialize(creds):
+        result = not decisive
+        partials = []
+        for rule in compiled:
+            partial = rule(creds)
+            if isinstance(partial, tuple):
+                partials.append(partial)
+            elif bool(partial) is decisive:
+                result = decisive
+                break
+        if not partials:
+            return result
+        funcs = [func for func, fields in partials]
+        if any(fields is None for func, fields in partials):
+            fields = None
+        else:
+            fields = frozenset().union(*[f for func, f in partials])
+
+        def evaluate(target):
+            for func in funcs:
+                if bool(func(target)) is decisive:
+                    return decisive
+            return result
+        return evaluate, fields
+    return specialize
+
+
+def _get_compiled_check(check):
+    compiled = _COMPILED_CHECKS.get(check)
+    if compiled is None:
+        compiled = _COMPILED_CHECKS[check] = _compile_check(check)
+    return compiled
+
+
+def _specialize_rule(name, creds):
+    """Evaluate the credentials part of a rule, as RuleCheck does."""
+    try:
+        result = _get_compiled_check(policy._rules[name])(creds)
+    except KeyError:
+        # We don't have any matching rule; fail closed
+        return False
+    if not isinstance(result, tuple):
+        return result
+    func, fields = result
+
+    def evaluate(target):
+        try:
+            return func(target)
+        except KeyError:
+            return False
+    return evaluate, fields
+
+
+def _check_read_action(context, action, target):
+    """Check a read action with the rule compiled for the context.
+
+    The rule is specialized once for the credentials of the context, so
+    that admin contexts usually get a constant result, and the results of
+    the remaining checks are memoized in the context by the values of the
+    target fields they depend on, e.g. once per owner for tenant_id checks.
+    """
+    if target is None:
+        target = {}
+    credentials = context.to_dict()
+    cache = context.__dict__.setdefault('_policy_cache', {})
+    entry = cache.get(action)
+    if (entry is None or entry[0] is not policy._rules or
+            entry[1] != credentials):
+        entry = cache[action] = (policy._rules, credentials,
+                                 _specialize_rule(action, credentials), {})
+    rules, creds, rule, results = entry
+    if not isinstance(rule, tuple):
+        return rule
+    func, fields = rule
+    if fields is None:
+        return func(target)
+    try:
+        key = tuple(target.get(field, _MISSING) for field in fields)
+        result = results.get(key, _MISSING)
+    except TypeError:
+        # Unhashable field values
+        return func(target)
+    if result is _MISSING:
+        if len(results) >= _MAX_MEMOIZED_RESULTS:
+            results.clear()
+        result = results[key] = func(target)
+    return result
+
+
+def _collect_owner_checks(check, owner_checks, seen):
+    if isinstance(check, OwnerCheck):
+        owner_checks.append(check)
+    elif isinstance(check, policy.RuleCheck):
+        if check.match not in seen:
+            seen.add(check.match)
+            try:
+                _collect_owner_checks(policy._rules[check.match],
+                                      owner_checks, seen)
+            except KeyError:
+                pass
+    elif isinstance(check, policy.NotCheck):
+        _collect_owner_checks(check.rule, owner_checks, seen)
+    elif hasattr(check, 'rules'):
+        for rule in check.rules:
+            _collect_owner_checks(rule, owner_checks, seen)
+
+
+def prefetch_parents(context, action, targets):
+    """Load the parent resources the owner checks of an action refer to.
+
+    Owner checks matching an attribute of a parent resource, like
+    tenant_id:%(network:tenant_id)s, load the parent of each target they
+    check. This loads the parents of all the targets with a single plugin
+    call per parent resource into the parent cache of the context.
+    """
+    if not policy._rules or not targets:
+        return
+    if not isinstance(_specialize_rule(action, context.to_dict()), tuple):
+        # The result of the check doesn't depend on the targets
+        return
+    owner_checks = []
+    _collect_owner_checks(policy.RuleCheck('rule', action), owner_checks,
+                          set())
+    parent_cache = _get_parent_cache(context)
+    for check in owner_checks:
+        if all(check.target_field in target for target in targets):
+            continue
+        try:
+            parent_res, parent_field, parent_foreign_key = (
+                check._get_parent_resource())
+        except exceptions.PolicyCheckError:
+            # The check raises it again
+            continue
+        get_parents = getattr(_get_core_plugin(), 'get_%ss' % parent_res,
+                              None)
+        parent_ids = list(set(
+            target[parent_foreign_key] for target in targets
+            if check.target_field not in target and
+            target.get(parent_foreign_key) and
+            (parent_res, target[parent_foreign_key],
+             parent_field) not in parent_cache))
+        if not get_parents or not parent_ids:
+            continue
+        admin_context = importutils.import_module(
+            'neutron.context').get_admin_context()
+        for i in range(0, len(parent_ids), _PREFETCH_CHUNK_SIZE):
+            parents = get_parents(
+                admin_context,
+                filters={'id': parent_ids[i:i + _PREFETCH_CHUNK_SIZE]},
+                fields=['id', parent_field])
+            for parent in parents:
+                if parent_field in parent:
+                    parent_cache[(parent_res, parent['id'],
+                                  parent_field)] = parent[parent_field]
+
+
 def _prepare_check(context, action, target):
     """Prepare rule, target, and credentials for the policy engine."""
     # Compare with None to distinguish case in which target is {}
@@ -346,6 +605,8 @@ def check(context, action, target, plugin=None, might_not_exist=False):
     """
     if might_not_exist and not (policy._rules and action in policy._rules):
         return True
+    if not get_resource_and_action(action)[1]:
+        return _check_read_action(context, action, target)
     return policy.check(*(_prepare_check(context, action, target)))
 
 
@@ -364,8 +625,11 @@ def enforce(context, action, target, plugin=None):
     :raises neutron.exceptions.PolicyNotAuthorized: if verification fails.
     """
 
-    rule, target, credentials = _prepare_check(context, action, target)
-    result = policy.check(rule, target, credentials, action=action)
+    if not get_resource_and_action(action)[1]:
+        result = _check_read_action(context, action, target)
+    else:
+        rule, target, credentials = _prepare_check(context, action, target)
+        result = policy.check(rule, target, credentials, action=action)
     if not result:
         LOG.debug(_("Failed policy check for '%s'"), action)
         raise exceptions.PolicyNotAuthorized(action=action)
@@ -13,10 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import abc
+import collections
 import random
 
 from oslo.config import cfg
 from oslo.db import exception as db_exc
+import six
+from sqlalchemy import orm
 from sqlalchemy import sql
 
 from neutron.common import constants
@@ -28,11 +32,9 @@ from neutron.openstack.common import log as logging
 LOG = logging.getLogger(__name__)
 
 
-class ChanceScheduler(object):
-    """Allocate a DHCP agent for a network in a random way.
-    More sophisticated scheduler (similar to filter scheduler in nova?)
-    can be introduced later.
-    """
+@six.add_metaclass(abc.ABCMeta)
+class DhcpScheduler(object):
+    """Base class for the schedulers of networks to DHCP agents."""
 
     def _schedule_bind_network(self, context, agents, network_id):
         for agent in agents:
@@ -87,16 +89,56 @@ class ChanceScheduler(object):
                 LOG.warn(_('No more DHCP agents'))
                 return
             n_agents = min(len(active_dhcp_agents), n_agents)
-            chosen_agents = random.sample(active_dhcp_agents, n_agents)
+            chosen_agents = self._choose_dhcp_agents(
+                plugin, context, active_dhcp_agents, n_agents)
         self._schedule_bind_network(context, chosen_agents, network['id'])
         return chosen_agents
 
+    def _bind_networks(self, context, bindings):
+        """Bind networks to DHCP agents in a single transaction.
+
+        When one of the bindings was concurrently added, the networks are
+        bound one by one instead so that the other bindings still succeed.
+        """
+        try:
+            with context.session.begin(subtransactions=True):
+                for agent, network_id in bindings:
+                    binding = agentschedulers_db.NetworkDhcpAgentBinding(
+                        dhcp_agent_id=agent.id, network_id=network_id)
+                    context.session.add(binding)
+        except db_exc.DBDuplicateEntry:
+            LOG.debug('Some networks are already bound, binding them one '
+                      'by one')
+            for agent, network_id in bindings:
+                self._schedule_bind_network(context, [agent], network_id)
+            return
+        LOG.debug('Scheduled %d network bindings to DHCP agents',
+                  len(bindings))
+
+    def _get_agents_hosting_networks(self, context, network_ids):
+        """Return the ids of the alive agents hosting each network."""
+        hosting_agents = collections.defaultdict(set)
+        query = context.session.query(
+            agentschedulers_db.NetworkDhcpAgentBinding)
+        query = query.options(orm.joinedload('dhcp_agent'))
+        query = query.filter(
+            agentschedulers_db.NetworkDhcpAgentBinding.network_id.in_(
+                network_ids))
+        for binding in query:
+            if agentschedulers_db.AgentSchedulerDbMixin.is_eligible_agent(
+                    True, binding.dhcp_agent):
+                hosting_agents[binding.network_id].add(binding.dhcp_agent_id)
+        return hosting_agents
+
     def auto_schedule_networks(self, plugin, context, host):
         """Schedule non-hosted networks to the DHCP agent on
         the specified host.
+
+        The agents hosting the networks are fetched with a single query and
+        the networks are bound in a single transaction.
         """
         agents_per_network = cfg.CONF.dhcp_agents_per_network
-        # a list of (agent, net_ids) tuples
+        # a list of (agent, net_id) tuples
         bindings_to_add = []
         with context.session.begin(subtransactions=True):
             fields = ['network_id', 'enable_dhcp']
@@ -111,24 +153,56 @@ class ChanceScheduler(object):
                                  constants.AGENT_TYPE_DHCP,
                                  agents_db.Agent.host == host,
                                  agents_db.Agent.admin_state_up == sql.true())
-            dhcp_agents = query.all()
-            for dhcp_agent in dhcp_agents:
+            dhcp_agents = []
+            for dhcp_agent in query:
                 if dhcp_agent.get('reserved', False):
                     continue
                 if agents_db.AgentDbMixin.is_agent_down(
                     dhcp_agent.heartbeat_timestamp):
                     LOG.warn(_('DHCP agent %s is not active'), dhcp_agent.id)
                     continue
+                dhcp_agents.append(dhcp_agent)
+            if not dhcp_agents:
+                return True
+            hosting_agents = self._get_agents_hosting_networks(context,
+                                                               net_ids)
+            for dhcp_agent in dhcp_agents:
                 for net_id in net_ids:
-                    agents = plugin.get_dhcp_agents_hosting_networks(
-                        context, [net_id], active=True)
-                    if len(agents) >= agents_per_network:
-                        continue
-                    if any(dhcp_agent.id == agent.id for agent in agents):
+                    agent_ids = hosting_agents[net_id]
+                    if (len(agent_ids) >= agents_per_network or
+                        dhcp_agent.id in agent_ids):
                         continue
+                    agent_ids.add(dhcp_agent.id)
                     bindings_to_add.append((dhcp_agent, net_id))
         # do it outside transaction so particular scheduling results don't
         # make other to fail
-        for agent, net_id in bindings_to_add:
-            self._schedule_bind_network(context, [agent], net_id)
+        if bindings_to_add:
+            self._bind_networks(context, bindings_to_add)
         return True
+
+    @abc.abstractmethod
+    def _choose_dhcp_agents(self, plugin, context, candidates, n_agents):
+        """Choose n_agents agents from candidates to host a network."""
+
+
+class ChanceScheduler(DhcpScheduler):
+    """Allocate a DHCP agent for a network in a random way."""
+
+    def _choose_dhcp_agents(self, plugin, context, candidates, n_agents):
+        return random.sample(candidates, n_agents)
+
+
+class LeastNetworksScheduler(DhcpScheduler):
+    """Allocate the DHCP agents hosting the least networks to a network.
+
+    Agents hosting as many networks are ordered by the number of ports of
+    their networks, and randomly when these are equal too.
+    """
+
+    def _choose_dhcp_agents(self, plugin, context, candidates, n_agents):
+        loads = plugin.get_dhcp_agents_load(
+            context, [agent['id'] for agent in candidates])
+        candidates = list(candidates)
+        random.shuffle(candidates)
+        candidates.sort(key=lambda agent: loads[agent['id']])
+        return candidates[:n_agents]
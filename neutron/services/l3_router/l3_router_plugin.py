@@ -57,6 +57,12 @@ class L3RouterPlugin(common_db_mixin.CommonDbMixin,
                                    "uos_floatingips", "portforwarding",
                                    "floatingip_ratelimits"]
 
+    # This attribute specifies whether the plugin supports or not
+    # pagination/sorting operations. Name mangling is used in
+    # order to ensure it is qualified by class
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         self.setup_rpc()
         self.router_scheduler = importutils.import_object(
@@ -37,6 +37,13 @@ class TunnlePlugin(tunnel_db.TunnelPluginDb):
 class TunnelDriverPlugin(TunnlePlugin, tunnel_db.TunnelPluginRpcDbMixin,
         agents_db.AgentDbMixin):
     """VpnPlugin which supports VPN Service Drivers."""
+
+    # This attribute specifies whether the plugin supports or not
+    # pagination/sorting operations. Name mangling is used in
+    # order to ensure it is qualified by class
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     #TODO(WeiW) handle tunnel update usecase
     def __init__(self):
         super(TunnlePlugin, self).__init__()
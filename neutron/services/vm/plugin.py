@@ -181,6 +181,12 @@ class ServiceVMPlugin(vm_db.ServiceResourcePluginDb,
 
     supported_extension_aliases = ['servicevm']
 
+    # This attribute specifies whether the plugin supports or not
+    # pagination/sorting operations. Name mangling is used in
+    # order to ensure it is qualified by class
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         super(ServiceVMPlugin, self).__init__()
         self._register_service_type_sync_func()
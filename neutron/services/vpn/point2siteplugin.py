@@ -43,6 +43,12 @@ class VPNPlugin(pptp_vpn_db.PPTPDVPNDbMixin,
     """
     supported_extension_aliases = ["vpn_user", "pptp_vpnaas","openvpn_vpnaas", "vpnaas", "service-type"]
 
+    # This attribute specifies whether the plugin supports or not
+    # pagination/sorting operations. Name mangling is used in
+    # order to ensure it is qualified by class
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         """Do the initialization for the vpn service plugin here."""
         self.pptp_driver = pptp.PPTPVPNDriver(self)
@@ -19,6 +19,7 @@ import mock
 from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from neutron.common import utils
 from neutron.db import agents_db
+from neutron.db import dhcp_sync_revision_db
 from neutron.openstack.common import timeutils
 from neutron.tests import base
 
@@ -153,3 +154,24 @@ class TestDhcpAgentNotifyAPI(base.BaseTestCase):
     def test__cast_message(self):
         self.notifier._cast_message(mock.ANY, mock.ANY, mock.ANY)
         self.assertEqual(1, self.mock_cast.call_count)
+
+    def _test_notify_bumps_revision(self, data, method_name, expected_ids):
+        with mock.patch.object(self.notifier, '_notify_agents'):
+            with mock.patch.object(dhcp_sync_revision_db,
+                                   'bump_network_revisions') as bump:
+                context = mock.Mock()
+                self.notifier.notify(context, data, method_name)
+                if expected_ids:
+                    bump.assert_called_once_with(context, expected_ids)
+                else:
+                    self.assertFalse(bump.called)
+
+    def test_notify_bumps_revision_on_port_update(self):
+        self._test_notify_bumps_revision(
+            {'port': {'id': 'foo_port_id', 'network_id': 'foo_network_id'}},
+            'port.update.end', ['foo_network_id'])
+
+    def test_notify_no_revision_bump_on_network_delete(self):
+        self._test_notify_bumps_revision(
+            {'network': {'id': 'foo_network_id'}}, 'network.delete.end',
+            None)
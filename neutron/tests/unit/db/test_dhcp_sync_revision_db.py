@@ -0,0 +1,46 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron import context
+from neutron.db import dhcp_sync_revision_db
+from neutron.db import models_v2
+from neutron.tests.unit import testlib_api
+
+
+class DhcpSyncRevisionDbTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(DhcpSyncRevisionDbTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        with self.ctx.session.begin(subtransactions=True):
+            for network_id in ('net1', 'net2'):
+                self.ctx.session.add(models_v2.Network(
+                    id=network_id, name=network_id, status='ACTIVE',
+                    admin_state_up=True, shared=False))
+
+    def test_get_network_revisions_defaults_to_zero(self):
+        self.assertEqual({'net1': 0, 'net2': 0},
+                         dhcp_sync_revision_db.get_network_revisions(
+                             self.ctx, ['net1', 'net2']))
+        self.assertEqual(
+            {}, dhcp_sync_revision_db.get_network_revisions(self.ctx, []))
+
+    def test_bump_network_revisions(self):
+        dhcp_sync_revision_db.bump_network_revisions(self.ctx, ['net1'])
+        dhcp_sync_revision_db.bump_network_revisions(
+            self.ctx, ['net1', 'net2', None])
+        self.assertEqual({'net1': 2, 'net2': 1},
+                         dhcp_sync_revision_db.get_network_revisions(
+                             self.ctx, ['net1', 'net2']))
@@ -0,0 +1,118 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+
+from neutron.common import constants as l3_constants
+from neutron.db import l3_sync_cache_db
+from neutron.tests import base
+
+
+class TestRouterSyncCache(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRouterSyncCache, self).setUp()
+        self.cache = l3_sync_cache_db.RouterSyncCache(ttl=10, max_size=2)
+
+    def test_get_returns_copy_for_same_revision(self):
+        router = {'id': 'r1', 'name': 'router1'}
+        self.cache.put('r1', 1, router)
+        cached = self.cache.get('r1', 1)
+        self.assertEqual(router, cached)
+        cached['name'] = 'changed'
+        self.assertEqual('router1', self.cache.get('r1', 1)['name'])
+        self.assertEqual(2, self.cache.hits)
+
+    def test_get_other_revision_misses(self):
+        self.cache.put('r1', 1, {'id': 'r1'})
+        self.assertIsNone(self.cache.get('r1', 2))
+        self.assertIsNone(self.cache.get('r1', None))
+        self.assertEqual(2, self.cache.misses)
+
+    def test_put_without_revision_is_ignored(self):
+        self.cache.put('r1', None, {'id': 'r1'})
+        self.assertEqual(0, len(self.cache))
+
+    def test_get_expired(self):
+        with mock.patch('time.time') as fake_time:
+            fake_time.return_value = 100
+            self.cache.put('r1', 1, {'id': 'r1'})
+            fake_time.return_value = 111
+            self.assertIsNone(self.cache.get('r1', 1))
+
+    def test_put_evicts_least_recently_used(self):
+        self.cache.put('r1', 1, {'id': 'r1'})
+        self.cache.put('r2', 1, {'id': 'r2'})
+        self.cache.get('r1', 1)
+        self.cache.put('r3', 1, {'id': 'r3'})
+        self.assertIsNone(self.cache.get('r2', 1))
+        self.assertIsNotNone(self.cache.get('r1', 1))
+        self.assertIsNotNone(self.cache.get('r3', 1))
+
+    def test_invalidate(self):
+        self.cache.put('r1', 1, {'id': 'r1'})
+        self.cache.invalidate(['r1', 'r2'])
+        self.assertIsNone(self.cache.get('r1', 1))
+
+
+class FakeL3Plugin(l3_sync_cache_db.RouterSyncCacheDbMixin):
+    pass
+
+
+class TestRouterSyncCacheDbMixin(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRouterSyncCacheDbMixin, self).setUp()
+        cfg.CONF.set_override('router_sync_cache', True)
+        self.plugin = FakeL3Plugin()
+        self.context = mock.Mock()
+        self.revisions = {'r1': 1, 'r2': 5}
+        self.plugin.get_router_revisions = mock.Mock(
+            side_effect=lambda ctx, ids: dict(
+                (i, self.revisions[i]) for i in ids if i in self.revisions))
+        self.plugin.get_sync_data = mock.Mock(
+            side_effect=lambda ctx, router_ids, active: [
+                {'id': i, 'admin_state_up': True} for i in router_ids])
+
+    def _router_ids(self, routers):
+        return sorted(router['id'] for router in routers)
+
+    def test_get_sync_data_cached_stamps_revision(self):
+        routers = self.plugin.get_sync_data_cached(self.context, ['r1'])
+        self.assertEqual(
+            1, routers[0][l3_constants.SYNC_REVISION_KEY])
+
+    def test_get_sync_data_cached_only_rebuilds_changed(self):
+        self.plugin.get_sync_data_cached(self.context, ['r1', 'r2', 'r3'])
+        self.revisions['r2'] = 6
+        routers = self.plugin.get_sync_data_cached(self.context,
+                                                   ['r1', 'r2', 'r3'])
+        self.assertEqual(['r1', 'r2', 'r3'], self._router_ids(routers))
+        # r3 has no revision, it is never served from cache
+        self.plugin.get_sync_data.assert_called_with(
+            self.context, router_ids=['r2', 'r3'], active=None)
+
+    def test_get_sync_data_cached_disabled(self):
+        cfg.CONF.set_override('router_sync_cache', False)
+        self.plugin.get_sync_data_cached(self.context, ['r1'])
+        self.plugin.get_sync_data_cached(self.context, ['r1'])
+        self.assertEqual(2, self.plugin.get_sync_data.call_count)
+
+    def test_get_changed_sync_data(self):
+        routers, unchanged = self.plugin.get_changed_sync_data(
+            self.context, ['r1', 'r2', 'r3'], {'r1': 1, 'r2': 4, 'r3': 0})
+        self.assertEqual(['r1'], unchanged)
+        self.assertEqual(['r2', 'r3'], self._router_ids(routers))
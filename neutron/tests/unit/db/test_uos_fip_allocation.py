@@ -0,0 +1,162 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron import context
+from neutron.db import common_db_mixin
+from neutron.db import models_v2
+from neutron.db import uos_fip_allocation
+from neutron.extensions import uos
+from neutron.extensions import uosfloatingip
+from neutron.tests.unit import testlib_api
+
+NETWORK_ID = 'fake-network'
+SUBNET_ID = 'fake-subnet'
+SUBNETS = [{'id': SUBNET_ID, 'name': 'ext-subnet',
+            uosfloatingip.UOS_SERVICE_PROVIDER: ''}]
+
+
+class FloatingipAllocationDbMixinImpl(
+    common_db_mixin.CommonDbMixin,
+    uos_fip_allocation.Floatingip_Allocation_db_mixin):
+
+    def __init__(self, core_plugin):
+        self.core_plugin = core_plugin
+
+    @property
+    def _core_plugin(self):
+        return self.core_plugin
+
+
+class FloatingipAllocationDbMixinTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(FloatingipAllocationDbMixinTestCase, self).setUp()
+        uos.register_uos_config()
+        self.ctx = context.get_admin_context()
+        self.core_plugin = mock.Mock()
+        self.core_plugin.get_subnets.return_value = SUBNETS
+        self.mixin = FloatingipAllocationDbMixinImpl(self.core_plugin)
+        with self.ctx.session.begin(subtransactions=True):
+            self.ctx.session.add(models_v2.Network(
+                id=NETWORK_ID, name='ext', status='ACTIVE',
+                admin_state_up=True, shared=False))
+            self.ctx.session.add(models_v2.Subnet(
+                id=SUBNET_ID, network_id=NETWORK_ID, ip_version=4,
+                cidr='172.24.4.0/29', gateway_ip='172.24.4.1',
+                enable_dhcp=False, shared=False))
+            self.ctx.session.add(models_v2.IPAllocationPool(
+                subnet_id=SUBNET_ID, first_ip='172.24.4.2',
+                last_ip='172.24.4.6'))
+
+    def _allocate(self, tenant_id='tenant', generated_ip=None):
+        self.core_plugin.generate_ip.return_value = generated_ip and {
+            'ip_address': generated_ip, 'subnet_id': SUBNET_ID}
+        return self.mixin.allocate_floatingip_address(
+            self.ctx, {'floatingip': {'floating_network_id': NETWORK_ID,
+                                      'tenant_id': tenant_id}})
+
+    def _release(self, ip_address, tenant_id='tenant', allocated=False):
+        self.mixin.update_floatingip_allocation_record(
+            self.ctx, {'floating_ip_address': ip_address,
+                       'tenant_id': tenant_id,
+                       'floating_subnet_id': SUBNET_ID},
+            allocated=allocated)
+
+    def _get_counter(self):
+        counter = self.ctx.session.query(
+            uos_fip_allocation.FloatingIpSubnetCounter).one()
+        self.ctx.session.refresh(counter)
+        return counter.free_count, counter.recycled_count
+
+    def test_allocate_never_used_floatingip(self):
+        self.assertEqual('172.24.4.2', self._allocate(
+            generated_ip='172.24.4.2'))
+        self.assertEqual((4, 0), self._get_counter())
+
+    def test_counters_are_initialized_once(self):
+        with mock.patch.object(self.mixin, '_get_floatingip_count',
+                               return_value=0) as count:
+            self._allocate(generated_ip='172.24.4.2')
+            self._allocate(generated_ip='172.24.4.3')
+        self.assertEqual(1, count.call_count)
+        self.assertEqual((3, 0), self._get_counter())
+
+    def test_allocate_tenant_recycled_floatingip(self):
+        self._allocate(generated_ip='172.24.4.2')
+        self._release('172.24.4.2', tenant_id='other')
+        self._allocate(generated_ip='172.24.4.3')
+        self._release('172.24.4.3')
+        self.assertEqual((3, 2), self._get_counter())
+        self.assertEqual('172.24.4.3', self._allocate())
+        self.assertFalse(self.core_plugin.generate_ip.call_count > 2)
+
+    def test_allocate_oldest_recycled_floatingip_when_pool_is_used(self):
+        for i in range(2, 7):
+            ip_address = '172.24.4.%d' % i
+            self._allocate(generated_ip=ip_address)
+            self._release(ip_address, tenant_id='other')
+        self.assertEqual((0, 5), self._get_counter())
+        self.core_plugin.generate_ip.reset_mock()
+        self.assertEqual('172.24.4.2', self._allocate())
+        self.assertFalse(self.core_plugin.generate_ip.called)
+        self._release('172.24.4.2', allocated=True)
+        self.assertEqual((0, 4), self._get_counter())
+        self.assertEqual('172.24.4.3', self._allocate())
+
+    def test_allocate_resyncs_free_counter(self):
+        self._allocate(generated_ip='172.24.4.2')
+        self._release('172.24.4.2', tenant_id='other')
+        # The other addresses are used by ports which are not floatingips
+        self.assertEqual('172.24.4.2', self._allocate(generated_ip=None))
+        self.assertEqual((0, 1), self._get_counter())
+
+    def test_allocate_recounts_exhausted_counters(self):
+        with mock.patch.object(self.mixin, '_get_floatingip_count',
+                               return_value=4):
+            self._allocate(generated_ip='172.24.4.6')
+            self.assertEqual((0, 0), self._get_counter())
+            # A port which is not a floatingip released its address
+            self.assertEqual('172.24.4.5',
+                             self._allocate(generated_ip='172.24.4.5'))
+        self.assertEqual((0, 0), self._get_counter())
+
+    def test_allocation_pools_change_drops_counters(self):
+        self._allocate(generated_ip='172.24.4.2')
+        with self.ctx.session.begin(subtransactions=True):
+            self.ctx.session.add(models_v2.IPAllocationPool(
+                subnet_id=SUBNET_ID, first_ip='172.24.4.7',
+                last_ip='172.24.4.7'))
+        self.assertFalse(self.ctx.session.query(
+            uos_fip_allocation.FloatingIpSubnetCounter).count())
+        self._allocate(generated_ip='172.24.4.3')
+        self.assertEqual((5, 0), self._get_counter())
+
+    def test_allocate_no_floatingip_available(self):
+        with mock.patch.object(self.mixin, '_get_floatingip_count',
+                               return_value=5):
+            self.assertRaises(uosfloatingip.FloatingipNoAvaliable,
+                              self._allocate)
+        self.assertFalse(self.core_plugin.generate_ip.called)
+
+    def test_clear_floatingip_allocation(self):
+        self._allocate(generated_ip='172.24.4.2')
+        self._release('172.24.4.2')
+        self.mixin.clear_floatingip_allocation(SUBNET_ID)
+        self.assertFalse(self.ctx.session.query(
+            uos_fip_allocation.FloatingIpSubnetCounter).count())
+        self.assertFalse(self.ctx.session.query(
+            uos_fip_allocation.FloatingIpAllocation).count())
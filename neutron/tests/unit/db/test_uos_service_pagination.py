@@ -0,0 +1,88 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron import context
+from neutron.db import l3_db
+from neutron.db.tunnel import tunnel_db
+from neutron.db.vm import vm_db
+from neutron.db.vpn import vpnuser_db
+from neutron.tests.unit import testlib_api
+
+DEVICE_IDS = ['11111111-1111-1111-1111-111111111111',
+              '22222222-2222-2222-2222-222222222222',
+              '33333333-3333-3333-3333-333333333333']
+# Sorts between the first two devices
+INTERNAL_DEVICE_ID = '1z-internal-device'
+
+
+class UosServicePaginationTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(UosServicePaginationTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+
+    def _list_ids(self, list_func, limit, marker=None, page_reverse=False):
+        resources = list_func(self.ctx, sorts=[('id', True)], limit=limit,
+                              marker=marker, page_reverse=page_reverse)
+        return [resource['id'] for resource in resources]
+
+    def test_get_devices_skips_internal_devices_before_paginating(self):
+        plugin = vm_db.ServiceResourcePluginDb()
+        with self.ctx.session.begin(subtransactions=True):
+            self.ctx.session.add(vm_db.DeviceTemplate(
+                id='template', tenant_id='tenant', shared=False))
+            for device_id in DEVICE_IDS + [INTERNAL_DEVICE_ID]:
+                self.ctx.session.add(vm_db.Device(
+                    id=device_id, tenant_id='tenant', template_id='template',
+                    status='ACTIVE'))
+        self.assertEqual(DEVICE_IDS[:2],
+                         self._list_ids(plugin.get_devices, 2))
+        self.assertEqual(DEVICE_IDS[2:],
+                         self._list_ids(plugin.get_devices, 2,
+                                        marker=DEVICE_IDS[1]))
+        self.assertEqual(DEVICE_IDS[:2],
+                         self._list_ids(plugin.get_devices, 2,
+                                        marker=DEVICE_IDS[2],
+                                        page_reverse=True))
+
+    def test_get_tunnels_with_marker(self):
+        plugin = tunnel_db.TunnelPluginDb()
+        with self.ctx.session.begin(subtransactions=True):
+            self.ctx.session.add(l3_db.Router(
+                id='router', tenant_id='tenant', name='router',
+                status='ACTIVE', admin_state_up=True))
+            for tunnel_id in ('tunnel1', 'tunnel2', 'tunnel3'):
+                self.ctx.session.add(tunnel_db.Tunnel(
+                    id=tunnel_id, tenant_id='tenant', router_id='router',
+                    status='ACTIVE', admin_state_up='UP'))
+        self.assertEqual(['tunnel1', 'tunnel2'],
+                         self._list_ids(plugin.get_tunnels, 2))
+        self.assertEqual(['tunnel3'],
+                         self._list_ids(plugin.get_tunnels, 2,
+                                        marker='tunnel2'))
+
+    def test_get_vpnusers_with_marker(self):
+        plugin = vpnuser_db.VPNUserNDbMixin()
+        with self.ctx.session.begin(subtransactions=True):
+            for vpnuser_id in ('user1', 'user2', 'user3'):
+                self.ctx.session.add(vpnuser_db.VPNuser(
+                    id=vpnuser_id, tenant_id='tenant', name=vpnuser_id,
+                    password='secret', admin_state_up=True))
+        self.assertEqual(['user2', 'user3'],
+                         self._list_ids(plugin.get_vpnusers, 2,
+                                        marker='user1'))
+        self.assertEqual(['user1'],
+                         self._list_ids(plugin.get_vpnusers, 2,
+                                        marker='user2', page_reverse=True))
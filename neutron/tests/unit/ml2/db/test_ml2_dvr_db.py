@@ -39,7 +39,7 @@ class Ml2DBTestCase(testlib_api.SqlTestCase):
             for port_id in port_ids:
                 port = models_v2.Port(id=port_id,
                                       network_id=network_id,
-                                      mac_address='foo_mac_address',
+                                      mac_address='foo_mac_%s' % port_id,
                                       admin_state_up=True,
                                       status='ACTIVE',
                                       device_id='',
@@ -23,6 +23,8 @@ from neutron.common import constants
 from neutron.common import exceptions as exc
 from neutron.common import utils
 from neutron import context
+from neutron.db import db_base_plugin_v2
+from neutron.db import models_v2
 from neutron.extensions import multiprovidernet as mpnet
 from neutron.extensions import portbindings
 from neutron.extensions import providernet as pnet
@@ -112,21 +114,295 @@ class TestMl2V2HTTPResponse(test_plugin.TestV2HTTPResponse,
 
 class TestMl2NetworksV2(test_plugin.TestNetworksV2,
                         Ml2PluginV2TestCase):
-    pass
+
+    def test_create_networks_bulk_native_plugin_failure(self):
+        plugin = manager.NeutronManager.get_plugin()
+        orig = plugin._create_network_db
+        with mock.patch.object(plugin,
+                               '_create_network_db') as patched_plugin:
+
+            def side_effect(*args, **kwargs):
+                return self._fail_second_call(patched_plugin, orig,
+                                              *args, **kwargs)
+
+            patched_plugin.side_effect = side_effect
+            res = self._create_network_bulk(self.fmt, 2, 'test', True)
+            # We expect a 500 as we injected a fault in the plugin
+            self._validate_behavior_on_bulk_failure(
+                res, 'networks', webob.exc.HTTPServerError.code)
+
+    def test_create_networks_bulk_emulated_plugin_failure(self):
+        # The API always uses the native bulk create of the plugin
+        self.test_create_networks_bulk_native_plugin_failure()
+
+    def test_create_networks_bulk_postcommit_failure(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(plugin.mechanism_manager,
+                               'create_network_postcommit',
+                               side_effect=ml2_exc.MechanismDriverError(
+                                   method='create_network_postcommit')):
+            res = self._create_network_bulk(self.fmt, 2, 'test', True)
+            self._validate_behavior_on_bulk_failure(
+                res, 'networks', webob.exc.HTTPServerError.code)
 
 
 class TestMl2SubnetsV2(test_plugin.TestSubnetsV2,
                        Ml2PluginV2TestCase):
-    pass
+
+    def test_create_subnets_bulk_native_plugin_failure(self):
+        plugin = manager.NeutronManager.get_plugin()
+        orig = plugin._create_subnet_db
+        with mock.patch.object(plugin, '_create_subnet_db') as patched_plugin:
+
+            def side_effect(*args, **kwargs):
+                return self._fail_second_call(patched_plugin, orig,
+                                              *args, **kwargs)
+
+            patched_plugin.side_effect = side_effect
+            with self.network() as net:
+                res = self._create_subnet_bulk(self.fmt, 2,
+                                               net['network']['id'],
+                                               'test')
+                # We expect a 500 as we injected a fault in the plugin
+                self._validate_behavior_on_bulk_failure(
+                    res, 'subnets', webob.exc.HTTPServerError.code)
+
+    def test_create_subnets_bulk_emulated_plugin_failure(self):
+        # The API always uses the native bulk create of the plugin
+        self.test_create_subnets_bulk_native_plugin_failure()
+
+    def test_list_subnets_with_column_fields(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            with mock.patch.object(plugin, '_make_subnet_dict') as make_dict:
+                subnets = plugin.get_subnets(context.get_admin_context(),
+                                             fields=['id', 'cidr'])
+            self.assertFalse(make_dict.called)
+            self.assertEqual([{'id': subnet['subnet']['id'],
+                               'cidr': '10.0.0.0/24'}], subnets)
 
 
 class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
 
+    def test_create_ports_bulk_native_plugin_failure(self):
+        ctx = context.get_admin_context()
+        with self.network() as net:
+            plugin = manager.NeutronManager.get_plugin()
+            orig = plugin._create_port_db
+            with mock.patch.object(plugin,
+                                   '_create_port_db') as patched_plugin:
+
+                def side_effect(*args, **kwargs):
+                    return self._fail_second_call(patched_plugin, orig,
+                                                  *args, **kwargs)
+
+                patched_plugin.side_effect = side_effect
+                res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                             'test', True, context=ctx)
+                # We expect a 500 as we injected a fault in the plugin
+                self._validate_behavior_on_bulk_failure(
+                    res, 'ports', webob.exc.HTTPServerError.code)
+
+    def test_create_ports_bulk_emulated_plugin_failure(self):
+        # The API always uses the native bulk create of the plugin
+        self.test_create_ports_bulk_native_plugin_failure()
+
+    def test_create_ports_bulk_port_binding_failure(self):
+        ctx = context.get_admin_context()
+        with self.network() as net:
+            plugin = manager.NeutronManager.get_plugin()
+            with mock.patch.object(plugin, '_bind_port_if_needed',
+                                   side_effect=ml2_exc.MechanismDriverError(
+                                       method='create_port_bulk')):
+                res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                             'test', True, context=ctx)
+                self._validate_behavior_on_bulk_failure(
+                    res, 'ports', webob.exc.HTTPServerError.code)
+
+    def test_create_ports_bulk_generates_ips_in_one_pass(self):
+        plugin = db_base_plugin_v2.NeutronDbPluginV2
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            with contextlib.nested(
+                mock.patch.object(plugin, '_try_generate_ip'),
+                mock.patch.object(plugin, '_try_generate_ips',
+                                  wraps=plugin._try_generate_ips)
+            ) as (try_generate_ip, try_generate_ips):
+                res = self._create_port_bulk(self.fmt, 3, net_id, 'test',
+                                             True)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            self.assertFalse(try_generate_ip.called)
+            self.assertEqual(1, try_generate_ips.call_count)
+            ports = self.deserialize(self.fmt, res)['ports']
+            ips = [port['fixed_ips'][0]['ip_address'] for port in ports]
+            self.assertEqual(['10.0.0.2', '10.0.0.3', '10.0.0.4'],
+                             sorted(ips))
+            # The following ports keep allocating from the ranges
+            with self.port(subnet=subnet) as port:
+                self.assertEqual('10.0.0.5',
+                                 port['port']['fixed_ips'][0]['ip_address'])
+            for port in ports:
+                self._delete('ports', port['id'])
+
+    def test_create_ports_bulk_ip_generation_failure(self):
+        plugin = manager.NeutronManager.get_plugin()
+        ctx = context.get_admin_context()
+        with self.network() as net:
+            ports = {'ports': [{'port': {'network_id':
+                                         net['network']['id']}}]}
+            with mock.patch.object(plugin, '_generate_ips_for_ports',
+                                   side_effect=ValueError):
+                self.assertRaises(ValueError, plugin.create_port_bulk,
+                                  ctx, ports)
+
+    def test_create_ports_bulk_with_requested_fixed_ips(self):
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.2'}]
+            res = self._create_port_bulk(self.fmt, 2, net_id, 'test', True,
+                                         override={0: {'fixed_ips':
+                                                       fixed_ips}})
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            ports = self.deserialize(self.fmt, res)['ports']
+            ips = [port['fixed_ips'][0]['ip_address'] for port in ports]
+            self.assertEqual(['10.0.0.2', '10.0.0.3'], ips)
+            for port in ports:
+                self._delete('ports', port['id'])
+
+    def test_create_ports_bulk_exhausted_ranges(self):
+        plugin = db_base_plugin_v2.NeutronDbPluginV2
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            with mock.patch.object(plugin, '_try_generate_ips',
+                                   return_value=None):
+                res = self._create_port_bulk(self.fmt, 2, net_id, 'test',
+                                             True)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            ports = self.deserialize(self.fmt, res)['ports']
+            ips = [port['fixed_ips'][0]['ip_address'] for port in ports]
+            self.assertEqual(['10.0.0.2', '10.0.0.3'], sorted(ips))
+            for port in ports:
+                self._delete('ports', port['id'])
+
+    def test_create_ports_bulk_notifies_security_groups_once(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.network() as net:
+            with mock.patch.object(plugin.notifier,
+                                   'security_groups_member_updated') as notify:
+                res = self._create_port_bulk(self.fmt, 3,
+                                             net['network']['id'], 'test',
+                                             True)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            ports = self.deserialize(self.fmt, res)['ports']
+            notify.assert_called_once_with(mock.ANY,
+                                           ports[0]['security_groups'])
+            for port in ports:
+                self._delete('ports', port['id'])
+
+    def test_create_ports_random_ip_allocation(self):
+        config.cfg.CONF.set_override('ip_allocation_strategy', 'random')
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            with contextlib.nested(self.port(subnet=subnet),
+                                   self.port(subnet=subnet)) as ports:
+                ips = set(port['port']['fixed_ips'][0]['ip_address']
+                          for port in ports)
+                self.assertEqual(2, len(ips))
+                self.assertTrue(ips <= set(['10.0.0.2', '10.0.0.3',
+                                            '10.0.0.4', '10.0.0.5',
+                                            '10.0.0.6']))
+                # The addresses are not removed from the availability ranges
+                ranges = self.context.session.query(
+                    models_v2.IPAvailabilityRange).all()
+                self.assertEqual([('10.0.0.2', '10.0.0.6')],
+                                 [(r['first_ip'], r['last_ip'])
+                                  for r in ranges])
+
+    def test_create_port_random_ip_allocated_concurrently(self):
+        config.cfg.CONF.set_override('ip_allocation_strategy', 'random')
+        plugin = db_base_plugin_v2.NeutronDbPluginV2
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.5'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips):
+                # Only the unique constraint of the IP allocations detects
+                # the addresses allocated by concurrent transactions
+                with contextlib.nested(
+                    mock.patch.object(plugin, '_check_unique_ip',
+                                      return_value=True),
+                    mock.patch.object(db_base_plugin_v2.random, 'randrange',
+                                      side_effect=[3, 4])):
+                    res = self._create_port(self.fmt,
+                                            subnet['subnet']['network_id'])
+                self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+                port = self.deserialize(self.fmt, res)
+                self.assertEqual('10.0.0.6',
+                                 port['port']['fixed_ips'][0]['ip_address'])
+                self._delete('ports', port['port']['id'])
+
+    def test_create_port_random_fixed_ip_allocated_concurrently(self):
+        config.cfg.CONF.set_override('ip_allocation_strategy', 'random')
+        plugin = db_base_plugin_v2.NeutronDbPluginV2
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.5'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips) as port:
+                with mock.patch.object(plugin, '_check_unique_ip',
+                                       return_value=True):
+                    res = self._create_port(self.fmt,
+                                            subnet['subnet']['network_id'],
+                                            fixed_ips=fixed_ips)
+                self.assertEqual(webob.exc.HTTPConflict.code, res.status_int)
+                # The allocation of the other port is left untouched
+                allocations = self.context.session.query(
+                    models_v2.IPAllocation).filter_by(ip_address='10.0.0.5')
+                self.assertEqual([port['port']['id']],
+                                 [a['port_id'] for a in allocations])
+
     def test_update_port_status_build(self):
         with self.port() as port:
             self.assertEqual('DOWN', port['port']['status'])
             self.assertEqual('DOWN', self.port_create_status)
 
+    def test_list_ports_with_column_fields(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.port(device_id='dev1') as port:
+            with mock.patch.object(plugin, '_make_port_dict') as make_dict:
+                res = self._list('ports',
+                                 query_params='fields=id&fields=device_id')
+            self.assertFalse(make_dict.called)
+            self.assertEqual([{'id': port['port']['id'],
+                               'device_id': 'dev1'}], res['ports'])
+
+    def test_list_ports_with_fixed_ips_filter_and_column_fields(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.port() as port:
+            fixed_ip = port['port']['fixed_ips'][0]
+            with mock.patch.object(plugin, '_get_projected_items') as items:
+                ports = plugin.get_ports(
+                    context.get_admin_context(),
+                    filters={'fixed_ips': {
+                        'ip_address': [fixed_ip['ip_address']]}},
+                    fields=['id'])
+            self.assertFalse(items.called)
+            self.assertEqual([{'id': port['port']['id']}], ports)
+
+    def test_list_ports_skips_extend_functions_of_other_fields(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.port() as port:
+            with mock.patch.object(plugin,
+                                   '_extend_port_dict_security_group') as ext:
+                ports = plugin.get_ports(context.get_admin_context(),
+                                         fields=['id', 'fixed_ips'])
+            self.assertFalse(ext.called)
+            self.assertEqual([{'id': port['port']['id'],
+                               'fixed_ips': port['port']['fixed_ips']}],
+                             ports)
+            ports = plugin.get_ports(context.get_admin_context(),
+                                     fields=['id', 'security_groups'])
+            self.assertEqual(port['port']['security_groups'],
+                             ports[0]['security_groups'])
+
     def test_update_non_existent_port(self):
         ctx = context.get_admin_context()
         plugin = manager.NeutronManager.get_plugin()
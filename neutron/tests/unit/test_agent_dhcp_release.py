@@ -0,0 +1,82 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+
+import mock
+
+from neutron.agent.linux import dhcp_release
+from neutron.tests import base
+
+
+class TestDhcpRelease(base.BaseTestCase):
+    def test_build_release_packet(self):
+        packet = dhcp_release.build_release_packet(
+            '192.168.0.2', '00:00:80:aa:bb:cc', '192.168.0.3')
+        # op, htype, hlen
+        self.assertEqual('\x01\x01\x06', packet[:3])
+        # ciaddr
+        self.assertEqual(socket.inet_aton('192.168.0.2'), packet[12:16])
+        # chaddr
+        self.assertEqual('\x00\x00\x80\xaa\xbb\xcc', packet[28:34])
+        self.assertEqual(dhcp_release.DHCP_MAGIC_COOKIE, packet[236:240])
+        self.assertEqual('\x35\x01\x07\x36\x04' +
+                         socket.inet_aton('192.168.0.3') + '\xff',
+                         packet[240:])
+
+    def test_parse_args(self):
+        self.assertEqual(
+            ('tap0', [('192.168.0.2', 'mac1', '192.168.0.3'),
+                      ('192.168.0.4', 'mac2', '192.168.0.3')]),
+            dhcp_release.parse_args(['--interface=tap0',
+                                     '192.168.0.2,mac1,192.168.0.3',
+                                     '192.168.0.4,mac2,192.168.0.3']))
+        self.assertEqual(
+            ('tap0', [('192.168.0.2', 'mac1', '192.168.0.3')]),
+            dhcp_release.parse_args(['--interface', 'tap0',
+                                     '192.168.0.2,mac1,192.168.0.3']))
+
+    def test_parse_args_invalid(self):
+        for argv in ([], ['--interface=tap0'],
+                     ['192.168.0.2,mac1,192.168.0.3'],
+                     ['--interface=tap0', '192.168.0.2,mac1']):
+            self.assertRaises(ValueError, dhcp_release.parse_args, argv)
+
+    def test_release_leases(self):
+        with mock.patch('socket.socket') as sock_cls:
+            sock = sock_cls.return_value
+            sock.sendto.side_effect = [None, socket.error]
+            with mock.patch('sys.stderr'):
+                failures = dhcp_release.release_leases(
+                    'tap0', [('192.168.0.2', '00:00:80:aa:bb:cc',
+                              '192.168.0.3'),
+                             ('192.168.0.4', '00:00:80:cc:bb:aa',
+                              '192.168.0.3')])
+        self.assertEqual(1, failures)
+        sock.setsockopt.assert_called_once_with(
+            socket.SOL_SOCKET, dhcp_release.SO_BINDTODEVICE, 'tap0\0')
+        self.assertEqual(2, sock.sendto.call_count)
+        self.assertEqual(('192.168.0.3', 67), sock.sendto.call_args[0][1])
+        sock.close.assert_called_once_with()
+
+    def test_main(self):
+        argv = ['neutron-dhcp-release', '--interface=tap0',
+                '192.168.0.2,00:00:80:aa:bb:cc,192.168.0.3']
+        with mock.patch('sys.argv', argv):
+            with mock.patch.object(dhcp_release, 'release_leases',
+                                   return_value=1) as release:
+                self.assertRaises(SystemExit, dhcp_release.main)
+        release.assert_called_once_with(
+            'tap0', [('192.168.0.2', '00:00:80:aa:bb:cc', '192.168.0.3')])
@@ -346,6 +346,31 @@ class ResourceTestCase(base.BaseTestCase):
         res = resource.get('', extra_environ=environ)
         self.assertEqual(res.status_int, 200)
 
+    def _test_index(self, batch_size, ports, streamed):
+        self.config(json_stream_batch_size=batch_size)
+        controller = mock.MagicMock()
+        items = list(ports)
+        controller.index = lambda request: {'ports': items}
+
+        resource = webtest.TestApp(wsgi_resource.Resource(controller))
+
+        environ = {'wsgiorg.routing_args': (None, {'action': 'index',
+                                                   'format': 'json'})}
+        res = resource.get('', extra_environ=environ)
+        self.assertEqual(200, res.status_int)
+        self.assertEqual({'ports': ports}, res.json)
+        # The items of a streamed listing are released once encoded
+        self.assertEqual([] if streamed else ports, items)
+
+    def test_index_streamed(self):
+        self._test_index(2, [{'id': str(i)} for i in range(5)], True)
+
+    def test_index_not_streamed_below_batch_size(self):
+        self._test_index(5, [{'id': str(i)} for i in range(5)], False)
+
+    def test_index_not_streamed_when_disabled(self):
+        self._test_index(0, [{'id': str(i)} for i in range(5)], False)
+
     def test_status_204(self):
         controller = mock.MagicMock()
         controller.test = lambda request: {'foo': 'bar'}
@@ -0,0 +1,75 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import json
+
+import mock
+import netaddr
+
+from neutron.common import json_codec
+from neutron.openstack.common import jsonutils
+from neutron.tests import base
+
+
+class TestJsonCodec(base.BaseTestCase):
+
+    payload = {'ports': [{'id': u'\u7f51\u7edc', 'admin_state_up': True,
+                          'fixed_ips': [{'ip_address': '10.0.0.2'}],
+                          'binding:profile': {}, 'mtu': 1500,
+                          'name': None}]}
+
+    def _test_codec(self, name):
+        self.config(json_codec=name)
+        encoded = json_codec.dumps(self.payload)
+        self.assertEqual(jsonutils.dumps(self.payload), encoded)
+        self.assertEqual(self.payload, json_codec.loads(encoded))
+        self.assertIsInstance(json_codec.loads('{"a": "b"}')['a'],
+                              unicode)
+
+    def test_auto(self):
+        self._test_codec('auto')
+
+    def test_json(self):
+        self._test_codec('json')
+
+    def test_simplejson(self):
+        if not json_codec.simplejson:
+            self.skipTest("simplejson is not installed")
+        self._test_codec('simplejson')
+
+    def test_dumps_converts_non_json_types(self):
+        value = {'ip': netaddr.IPAddress('10.0.0.2'),
+                 'at': datetime.datetime(2015, 1, 2, 3, 4, 5)}
+        self.assertEqual(jsonutils.dumps(value), json_codec.dumps(value))
+
+    def test_dumps_does_not_convert_json_types(self):
+        with mock.patch.object(jsonutils, 'to_primitive') as to_primitive:
+            codec = json_codec.JsonCodec(json, json)
+            codec.dumps(self.payload, default=to_primitive)
+        self.assertFalse(to_primitive.called)
+
+    def test_unavailable_codec(self):
+        with mock.patch.dict(json_codec._CODECS):
+            self.assertIs(json_codec._CODECS['auto'],
+                          json_codec.get_codec('ujson'))
+
+    def test_auto_decodes_with_simplejson_speedups(self):
+        auto = json_codec._CODECS['auto']
+        self.assertIs(json, auto.encoder)
+        if json_codec._has_speedups(json_codec.simplejson):
+            self.assertIs(json_codec.simplejson, auto.decoder)
+        else:
+            self.assertIs(json, auto.decoder)
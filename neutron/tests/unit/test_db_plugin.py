@@ -1345,6 +1345,52 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
             self.assertEqual(res.status_int,
                              webob.exc.HTTPServiceUnavailable.code)
 
+    def test_generated_duplicate_mac_is_generated_again(self):
+        with self.port() as port:
+            mac = port['port']['mac_address']
+            net_id = port['port']['network_id']
+            with mock.patch.object(utils, 'get_random_mac',
+                                   side_effect=[mac, '12:34:56:78:00:01']):
+                res = self._create_port(self.fmt, net_id=net_id)
+            self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+            new_port = self.deserialize(self.fmt, res)
+            self.assertEqual('12:34:56:78:00:01',
+                             new_port['port']['mac_address'])
+            self._delete('ports', new_port['port']['id'])
+
+    def test_generated_duplicate_mac_retries_exhausted(self):
+        cfg.CONF.set_override('mac_generation_retries', 3)
+        with self.port() as port:
+            mac = port['port']['mac_address']
+            net_id = port['port']['network_id']
+            with mock.patch.object(utils, 'get_random_mac',
+                                   return_value=mac) as get_random_mac:
+                res = self._create_port(self.fmt, net_id=net_id)
+            self.assertEqual(res.status_int,
+                             webob.exc.HTTPServiceUnavailable.code)
+            self.assertEqual(3, get_random_mac.call_count)
+
+    def test_mac_generation_block(self):
+        with contextlib.nested(
+            self.port(),
+            mock.patch.object(db_base_plugin_v2.NeutronDbPluginV2,
+                              '_mac_address_block', (None, []))
+        ) as (port, block):
+            cfg.CONF.set_override('mac_generation_block_size', 3)
+            macs = [port['port']['mac_address'], '12:34:56:78:00:01',
+                    '12:34:56:78:00:02']
+            net_id = port['port']['network_id']
+            with mock.patch.object(utils, 'get_random_mac',
+                                   side_effect=macs) as get_random_mac:
+                ports = [self.deserialize(
+                    self.fmt, self._create_port(self.fmt, net_id=net_id))
+                    for i in range(2)]
+            self.assertEqual(3, get_random_mac.call_count)
+            self.assertEqual(set(macs[1:]),
+                             set(p['port']['mac_address'] for p in ports))
+            for p in ports:
+                self._delete('ports', p['port']['id'])
+
     def test_requested_duplicate_ip(self):
         with self.subnet() as subnet:
             with self.port(subnet=subnet) as port:
@@ -1759,9 +1805,12 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
     def _test_delete_ports_by_device_id_second_call_failure(self, plugin):
         ctx = context.get_admin_context()
         with self.subnet() as subnet:
+            # The ports may be returned in network_id, mac_address order
             with contextlib.nested(
-                self.port(subnet=subnet, device_id='owner1', do_delete=False),
-                self.port(subnet=subnet, device_id='owner1'),
+                self.port(subnet=subnet, device_id='owner1',
+                          mac_address='00:00:00:00:00:01', do_delete=False),
+                self.port(subnet=subnet, device_id='owner1',
+                          mac_address='00:00:00:00:00:02'),
                 self.port(subnet=subnet, device_id='owner2'),
             ) as (p1, p2, p3):
                 orig = plugin.delete_port
@@ -2106,6 +2155,19 @@ class TestNetworksV2(NeutronDbPluginV2TestCase):
                                self.network()) as networks:
             self._test_list_resources('network', networks)
 
+    def test_get_networks_count(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with contextlib.nested(self.network(name='net1'),
+                               self.network(name='net1'),
+                               self.network(name='net2',
+                                            tenant_id='other-tenant')):
+            admin_ctx = context.get_admin_context()
+            self.assertEqual(3, plugin.get_networks_count(admin_ctx))
+            self.assertEqual(2, plugin.get_networks_count(
+                admin_ctx, filters={'name': ['net1']}))
+            tenant_ctx = context.Context('', self._tenant_id)
+            self.assertEqual(2, plugin.get_networks_count(tenant_ctx))
+
     def test_list_networks_with_sort_native(self):
         if self._skip_native_sorting:
             self.skipTest("Skip test for not implemented sorting feature")
@@ -3961,6 +4023,78 @@ class TestNeutronDbPluginV2(base.BaseTestCase):
         self.assertEqual(2, generate.call_count)
         rebuild.assert_called_once_with('c', 's')
 
+    def test_generate_ip_random(self):
+        self.config(ip_allocation_strategy='random')
+        with contextlib.nested(
+            mock.patch.object(db_base_plugin_v2.NeutronDbPluginV2,
+                              '_try_generate_ip'),
+            mock.patch.object(db_base_plugin_v2.NeutronDbPluginV2,
+                              '_generate_random_ip')
+        ) as (generate, generate_random):
+            db_base_plugin_v2.NeutronDbPluginV2._generate_ip('c', 's')
+
+        generate_random.assert_called_once_with('c', 's')
+        self.assertFalse(generate.called)
+
+    def _test_generate_random_ip(self, reserved, allocations=()):
+        pools = [{'first_ip': '192.168.1.2', 'last_ip': '192.168.1.3'},
+                 {'first_ip': '192.168.1.10', 'last_ip': '192.168.1.11'}]
+        pool_qry = mock.Mock()
+        pool_qry.filter_by.return_value = pools
+        ip_qry = mock.Mock()
+        ip_qry.filter_by.return_value = [(ip,) for ip in allocations]
+
+        def return_queries_side_effect(*args, **kwargs):
+            if args[0] == models_v2.IPAllocationPool:
+                return pool_qry
+            return ip_qry
+
+        context = mock.Mock()
+        context.session.query.side_effect = return_queries_side_effect
+        subnets = [{'id': 's', 'network_id': 'n', 'cidr': '192.168.1.0/24'}]
+        with contextlib.nested(
+            mock.patch.object(db_base_plugin_v2.random, 'randrange',
+                              side_effect=[3, 0, 2, 1]),
+            mock.patch.object(db_base_plugin_v2.NeutronDbPluginV2,
+                              '_reserve_ip', side_effect=reserved)
+        ) as (randrange, reserve_ip):
+            result = db_base_plugin_v2.NeutronDbPluginV2._generate_random_ip(
+                context, subnets)
+        randrange.assert_called_with(4)
+        return result, [args[2] for _name, args, _kwargs
+                        in reserve_ip.mock_calls]
+
+    def test_generate_random_ip(self):
+        result, tried = self._test_generate_random_ip([True])
+        self.assertEqual({'ip_address': '192.168.1.11', 'subnet_id': 's'},
+                         result)
+        self.assertEqual(['192.168.1.11'], tried)
+
+    def test_generate_random_ip_retries_allocated_ips(self):
+        result, tried = self._test_generate_random_ip([False, False, True])
+        self.assertEqual({'ip_address': '192.168.1.10', 'subnet_id': 's'},
+                         result)
+        self.assertEqual(['192.168.1.11', '192.168.1.2', '192.168.1.10'],
+                         tried)
+
+    def test_generate_random_ip_searches_free_ips(self):
+        self.config(ip_generation_retries=2)
+        result, tried = self._test_generate_random_ip(
+            [False, False, True],
+            allocations=['192.168.1.2', '192.168.1.3', '192.168.1.11'])
+        self.assertEqual({'ip_address': '192.168.1.10', 'subnet_id': 's'},
+                         result)
+        self.assertEqual(['192.168.1.11', '192.168.1.2', '192.168.1.10'],
+                         tried)
+
+    def test_generate_random_ip_exhausted_pool(self):
+        self.config(ip_generation_retries=2)
+        self.assertRaises(n_exc.IpAddressGenerationFailure,
+                          self._test_generate_random_ip,
+                          [False, False, False],
+                          allocations=['192.168.1.2', '192.168.1.3',
+                                       '192.168.1.11'])
+
     def test_rebuild_availability_ranges(self):
         pools = [{'id': 'a',
                   'first_ip': '192.168.1.3',
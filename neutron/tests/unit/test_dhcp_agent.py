@@ -14,12 +14,15 @@
 #    under the License.
 
 import copy
+import os
 import sys
 import uuid
 
 import eventlet
+import fixtures
 import mock
 from oslo.config import cfg
+from oslo import messaging
 import testtools
 
 from neutron.agent.common import config
@@ -30,6 +33,7 @@ from neutron.common import config as common_config
 from neutron.common import constants as const
 from neutron.common import exceptions
 from neutron.common import rpc as n_rpc
+from neutron.openstack.common import jsonutils
 from neutron.tests import base
 
 
@@ -306,6 +310,155 @@ class TestDhcpAgent(base.BaseTestCase):
                     self.assertTrue(log.called)
                     self.assertTrue(schedule_resync.called)
 
+    def _network_with_revision(self, network_id, revision):
+        return dhcp.NetModel(True, {'id': network_id, 'subnets': [],
+                                    'ports': [], 'admin_state_up': True,
+                                    const.DHCP_REVISION_KEY: revision})
+
+    def test_sync_state_by_revision(self):
+        cfg.CONF.set_override('sync_networks_by_revision', True)
+        cfg.CONF.set_override('sync_networks_page_size', 1)
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_network_revisions.return_value = {
+                'a': 'rev-a', 'b': 'rev-b', 'c': 'rev-c'}
+            mock_plugin.get_networks_info.side_effect = lambda ids: [
+                self._network_with_revision(i, 'rev-%s' % i) for i in ids]
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp.cache.put(self._network_with_revision('a', 'rev-a'))
+            dhcp.cache.put(self._network_with_revision('b', 'old'))
+            dhcp.cache.put(self._network_with_revision('d', 'rev-d'))
+            self.driver.return_value.active = True
+            attrs_to_mock = dict(
+                [(a, mock.DEFAULT) for a in
+                 ['safe_configure_dhcp_for_network', 'disable_dhcp_helper']])
+            with mock.patch.multiple(dhcp, **attrs_to_mock) as mocks:
+                dhcp.sync_state()
+
+            self.assertFalse(mock_plugin.get_active_networks_info.called)
+            self.assertEqual(
+                [mock.call(['b']), mock.call(['c'])],
+                sorted(mock_plugin.get_networks_info.call_args_list))
+            configure = mocks['safe_configure_dhcp_for_network']
+            configured = [c[0][0].id for c in configure.call_args_list]
+            self.assertEqual(['b', 'c'], sorted(configured))
+            mocks['disable_dhcp_helper'].assert_called_once_with('d')
+
+    def test_sync_state_by_revision_not_active(self):
+        cfg.CONF.set_override('sync_networks_by_revision', True)
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_network_revisions.return_value = {
+                'a': 'rev-a'}
+            mock_plugin.get_networks_info.return_value = []
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp.cache.put(self._network_with_revision('a', 'rev-a'))
+            self.driver.return_value.active = False
+            dhcp.sync_state()
+            mock_plugin.get_networks_info.assert_called_once_with(['a'])
+
+    def test_sync_state_by_revision_unsupported(self):
+        cfg.CONF.set_override('sync_networks_by_revision', True)
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_network_revisions.side_effect = (
+                messaging.UnsupportedVersion('1.2'))
+            mock_plugin.get_active_networks_info.return_value = []
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(dhcp, 'schedule_resync') as resync:
+                dhcp.sync_state()
+                self.assertFalse(resync.called)
+            mock_plugin.get_active_networks_info.assert_called_once_with()
+
+    def test_network_state_saved_and_loaded(self):
+        cfg.CONF.set_override('sync_networks_by_revision', True)
+        cfg.CONF.set_override('dhcp_confs',
+                              self.useFixture(fixtures.TempDir()).path)
+        self.mock_makedirs_p.stop()
+        network = self._network_with_revision('a', 'rev-a')
+        network.ports.append(fake_port1)
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        os.makedirs(os.path.join(cfg.CONF.dhcp_confs, 'a'))
+        dhcp._save_network_state(network)
+
+        self.driver.existing_dhcp_networks.return_value = ['a', 'b']
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        self.assertEqual(network, dhcp.cache.get_network_by_id('a'))
+        self.assertEqual([], dhcp.cache.get_network_by_id('b').ports)
+
+    def test_sync_state_sets_up_dhcp_ports_by_page(self):
+        cfg.CONF.set_override('sync_networks_page_size', 2)
+        networks = [copy.deepcopy(fake_network) for i in range(3)]
+        for i, network in enumerate(networks):
+            network.id = 'net-%d' % i
+        new_port = dhcp.DictModel(dict(fake_port2, network_id='net-0'))
+        updated_port = dhcp.DictModel(dict(fake_port1, name='updated'))
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = networks
+            mock_plugin.ensure_dhcp_ports.side_effect = [
+                {'net-0': new_port, 'net-1': updated_port}, {}]
+            plug.return_value = mock_plugin
+            agent = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(agent, 'safe_configure_dhcp_for_network'):
+                agent.sync_state()
+
+        self.assertEqual(
+            [mock.call(['net-0', 'net-1']), mock.call(['net-2'])],
+            mock_plugin.ensure_dhcp_ports.call_args_list)
+        self.assertEqual([fake_port1, new_port], networks[0].ports)
+        self.assertEqual([updated_port], networks[1].ports)
+        self.assertEqual([fake_port1], networks[2].ports)
+
+    def test_setup_dhcp_ports_unsupported(self):
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.ensure_dhcp_ports.side_effect = (
+                messaging.UnsupportedVersion('1.3'))
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp._setup_dhcp_ports([fake_network])
+            dhcp._setup_dhcp_ports([fake_network])
+        mock_plugin.ensure_dhcp_ports.assert_called_once_with(
+            [fake_network.id])
+
+    def test_configure_dhcp_for_network_adopts_once(self):
+        cfg.CONF.set_override('dhcp_warm_restart', True)
+        self.driver.existing_dhcp_networks.return_value = [fake_network.id]
+        self.driver.return_value.adopt.return_value = True
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        with mock.patch.object(dhcp, 'call_driver') as call_driver:
+            dhcp.configure_dhcp_for_network(fake_network)
+            self.assertFalse(call_driver.called)
+            dhcp.configure_dhcp_for_network(fake_network)
+            call_driver.assert_called_once_with('enable', fake_network,
+                                                kill_flag=True)
+        self.driver.return_value.adopt.assert_called_once_with()
+
+    def test_configure_dhcp_for_network_adopt_failed(self):
+        cfg.CONF.set_override('dhcp_warm_restart', True)
+        self.driver.existing_dhcp_networks.return_value = [fake_network.id]
+        self.driver.return_value.adopt.return_value = False
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        with mock.patch.object(dhcp, 'call_driver') as call_driver:
+            dhcp.configure_dhcp_for_network(fake_network, kill_flag=False)
+            call_driver.assert_called_once_with('enable', fake_network,
+                                                kill_flag=False)
+
+    def test_configure_dhcp_for_network_no_warm_restart(self):
+        self.driver.existing_dhcp_networks.return_value = [fake_network.id]
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        with mock.patch.object(dhcp, 'call_driver') as call_driver:
+            dhcp.configure_dhcp_for_network(fake_network)
+            self.assertTrue(call_driver.called)
+        self.assertFalse(self.driver.return_value.adopt.called)
+
     def test_periodic_resync(self):
         dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
         with mock.patch.object(dhcp_agent.eventlet, 'spawn') as spawn:
@@ -670,6 +823,114 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         finally:
             self.external_process_p.start()
 
+    def _enable_single_metadata_proxy(self, network):
+        cfg.CONF.set_override('isolated_metadata_single_proxy', True)
+        cfg.CONF.set_override('dhcp_confs',
+                              self.useFixture(fixtures.TempDir()).path)
+        self.cache.get_network_ids.return_value = [network.id]
+        with mock.patch.object(dhcp_agent.linux_utils,
+                               'replace_file') as replace_file:
+            self.dhcp.enable_isolated_metadata_proxy(network)
+        return replace_file
+
+    def test_enable_isolated_metadata_proxy_single_proxy(self):
+        replace_file = self._enable_single_metadata_proxy(fake_network)
+        replace_file.assert_called_once_with(
+            os.path.join(cfg.CONF.dhcp_confs,
+                         dhcp_agent.METADATA_PROXY_ID, 'networks'),
+            mock.ANY)
+        self.assertEqual(
+            {fake_network.id: {'namespace': fake_network.namespace,
+                               'network_id': fake_network.id}},
+            jsonutils.loads(replace_file.call_args[0][1]))
+        self.external_process.assert_has_calls([
+            mock.call(cfg.CONF, fake_network.id, 'sudo',
+                      fake_network.namespace),
+            mock.call().disable(),
+            mock.call(cfg.CONF, dhcp_agent.METADATA_PROXY_ID, 'sudo'),
+            mock.call().enable(mock.ANY, reload_cfg=True)])
+        callback = self.external_process.return_value.enable.call_args[0][0]
+        cmd = callback('pidfile')
+        self.assertEqual('neutron-multi-ns-metadata-proxy', cmd[0])
+        self.assertIn('--proxy_id=%s' % dhcp_agent.METADATA_PROXY_ID, cmd)
+
+    def test_enable_isolated_metadata_proxy_single_proxy_unchanged(self):
+        self._enable_single_metadata_proxy(fake_network)
+        self.external_process.reset_mock()
+        with mock.patch.object(dhcp_agent.linux_utils,
+                               'replace_file') as replace_file:
+            self.dhcp.enable_isolated_metadata_proxy(fake_network)
+        self.assertFalse(replace_file.called)
+        self.assertFalse(self.external_process.called)
+
+    def test_enable_isolated_metadata_proxy_single_proxy_router(self):
+        cfg.CONF.set_override('enable_metadata_network', True)
+        replace_file = self._enable_single_metadata_proxy(fake_meta_network)
+        self.assertEqual(
+            {fake_meta_network.id: {'namespace': fake_meta_network.namespace,
+                                    'router_id': 'forzanapoli'}},
+            jsonutils.loads(replace_file.call_args[0][1]))
+
+    def test_disable_isolated_metadata_proxy_single_proxy(self):
+        self._enable_single_metadata_proxy(fake_network)
+        self.external_process.reset_mock()
+        with mock.patch.object(dhcp_agent.linux_utils,
+                               'replace_file') as replace_file:
+            self.dhcp.disable_isolated_metadata_proxy(fake_network)
+        self.assertEqual({}, jsonutils.loads(replace_file.call_args[0][1]))
+        self.external_process.assert_has_calls([
+            mock.call(cfg.CONF, dhcp_agent.METADATA_PROXY_ID, 'sudo'),
+            mock.call().enable(mock.ANY, reload_cfg=True)])
+
+    def test_metadata_proxy_networks_loaded_from_file(self):
+        cfg.CONF.set_override('dhcp_confs',
+                              self.useFixture(fixtures.TempDir()).path)
+        os.mkdir(os.path.join(cfg.CONF.dhcp_confs,
+                              dhcp_agent.METADATA_PROXY_ID))
+        entry = {'namespace': 'qdhcp-ns', 'network_id': fake_network.id}
+        with open(self.dhcp._get_metadata_proxy_networks_file(), 'w') as f:
+            f.write(jsonutils.dumps({fake_network.id: entry,
+                                     'stale-network': entry}))
+        self.cache.get_network_ids.return_value = []
+        self.assertEqual({fake_network.id: entry, 'stale-network': entry},
+                         self.dhcp._get_metadata_proxy_networks())
+        cfg.CONF.set_override('enable_isolated_metadata', True)
+        cfg.CONF.set_override('isolated_metadata_single_proxy', True)
+        self.dhcp._prune_metadata_proxy_networks([fake_network.id])
+        self.assertEqual({fake_network.id: entry},
+                         self.dhcp._get_metadata_proxy_networks())
+
+    def test_sync_state_updates_single_metadata_proxy_once(self):
+        cfg.CONF.set_override('enable_isolated_metadata', True)
+        cfg.CONF.set_override('isolated_metadata_single_proxy', True)
+        cfg.CONF.set_override('dhcp_confs',
+                              self.useFixture(fixtures.TempDir()).path)
+        os.mkdir(os.path.join(cfg.CONF.dhcp_confs,
+                              dhcp_agent.METADATA_PROXY_ID))
+        entry = {'namespace': 'qdhcp-ns', 'network_id': 'stale-network'}
+        with open(self.dhcp._get_metadata_proxy_networks_file(), 'w') as f:
+            f.write(jsonutils.dumps({'stale-network': entry}))
+        networks = [dhcp.NetModel(
+            True, dict(id=network_id,
+                       tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
+                       admin_state_up=True,
+                       subnets=[fake_subnet1],
+                       ports=[]))
+            for network_id in ('12345678-1234-5678-1234567890ab',
+                               '22345678-1234-5678-1234567890ab')]
+        self.plugin.get_active_networks_info.return_value = networks
+        self.plugin.ensure_dhcp_ports.return_value = {}
+        self.cache.get_network_ids.return_value = []
+        with mock.patch.object(dhcp_agent.linux_utils,
+                               'replace_file') as replace_file:
+            self.dhcp.sync_state()
+        self.assertEqual(1, replace_file.call_count)
+        self.assertEqual(
+            sorted(network.id for network in networks),
+            sorted(jsonutils.loads(replace_file.call_args[0][1])))
+        self.assertEqual(
+            1, self.external_process.return_value.enable.call_count)
+
     def test_network_create_end(self):
         payload = dict(network=dict(id=fake_network.id))
 
@@ -826,6 +1087,31 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.assert_has_calls([mock.call.get_port_by_id('unknown')])
         self.assertEqual(self.call_driver.call_count, 0)
 
+    def test_port_update_end_coalesces_reloads(self):
+        cfg.CONF.set_override('reload_allocations_interval', 100)
+        self.cache.get_network_by_id.return_value = fake_network
+        with mock.patch('eventlet.spawn_after') as spawn_after:
+            self.dhcp.port_update_end(None, dict(port=fake_port1))
+            self.dhcp.port_update_end(None, dict(port=fake_port2))
+            spawn_after.assert_called_once_with(
+                0, self.dhcp._reload_allocations, fake_network.id)
+            self.assertFalse(self.call_driver.called)
+
+            self.dhcp._reload_allocations(fake_network.id)
+            self.call_driver.assert_called_once_with('reload_allocations',
+                                                     fake_network)
+
+            # The next reload waits for the interval since the last one
+            spawn_after.reset_mock()
+            self.dhcp.port_update_end(None, dict(port=fake_port1))
+            delay = spawn_after.call_args[0][0]
+            self.assertTrue(0 < delay <= 0.1)
+
+    def test_reload_allocations_network_removed(self):
+        self.cache.get_network_by_id.return_value = None
+        self.dhcp._reload_allocations(fake_network.id)
+        self.assertFalse(self.call_driver.called)
+
 
 class TestDhcpPluginApiProxy(base.BaseTestCase):
     def setUp(self):
@@ -1001,7 +1287,8 @@ class TestNetworkCache(base.BaseTestCase):
         nc.put(fake_net)
         nc.put_port(fake_port2)
         self.assertEqual(len(nc.port_lookup), 2)
-        self.assertIn(fake_port2, fake_net.ports)
+        self.assertIn(fake_port2, nc.get_network_by_id(fake_net.id).ports)
+        self.assertEqual(fake_port2, nc.get_port_by_id(fake_port2.id))
 
     def test_put_port_existing(self):
         fake_net = dhcp.NetModel(
@@ -1011,10 +1298,13 @@ class TestNetworkCache(base.BaseTestCase):
                        ports=[fake_port1, fake_port2]))
         nc = dhcp_agent.NetworkCache()
         nc.put(fake_net)
-        nc.put_port(fake_port2)
+        updated_port = dhcp.DictModel(dict(fake_port2, name='updated'))
+        nc.put_port(updated_port)
 
         self.assertEqual(len(nc.port_lookup), 2)
-        self.assertIn(fake_port2, fake_net.ports)
+        ports = nc.get_network_by_id(fake_net.id).ports
+        self.assertEqual([fake_port1, updated_port], ports)
+        self.assertEqual('updated', nc.get_port_by_id(fake_port2.id).name)
 
     def test_remove_port_existing(self):
         fake_net = dhcp.NetModel(
@@ -1027,13 +1317,57 @@ class TestNetworkCache(base.BaseTestCase):
         nc.remove_port(fake_port2)
 
         self.assertEqual(len(nc.port_lookup), 1)
-        self.assertNotIn(fake_port2, fake_net.ports)
+        self.assertNotIn(fake_port2, nc.get_network_by_id(fake_net.id).ports)
+        self.assertIsNone(nc.get_port_by_id(fake_port2.id))
+        self.assertIsNone(nc.get_port_by_mac(fake_net.id,
+                                             fake_port2.mac_address))
+
+    def test_remove_port_moves_last_port(self):
+        fake_port3 = dhcp.DictModel(dict(id='12345678-1234-aaaa-123456789333',
+                                         mac_address='aa:bb:cc:dd:ee:33',
+                                         network_id=fake_port2.network_id,
+                                         fixed_ips=[]))
+        fake_net = dhcp.NetModel(
+            True, dict(id='12345678-1234-5678-1234567890ab',
+                       tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
+                       subnets=[fake_subnet1],
+                       ports=[fake_port1, fake_port2, fake_port3]))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        nc.remove_port(fake_port1)
+        nc.put_port(fake_port1)
+
+        ports = nc.get_network_by_id(fake_net.id).ports
+        self.assertEqual([fake_port3, fake_port2, fake_port1], ports)
+        self.assertEqual(fake_port1, nc.get_port_by_id(fake_port1.id))
 
     def test_get_port_by_id(self):
         nc = dhcp_agent.NetworkCache()
         nc.put(fake_network)
         self.assertEqual(nc.get_port_by_id(fake_port1.id), fake_port1)
 
+    def test_get_port_by_mac(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        self.assertEqual(nc.get_port_by_mac(fake_network.id,
+                                            fake_port1.mac_address),
+                         fake_port1)
+        self.assertIsNone(nc.get_port_by_mac('other-net',
+                                             fake_port1.mac_address))
+
+    def test_put_network_compacts_records(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        network = nc.get_network_by_id(fake_network.id)
+        port = network.ports[0]
+        self.assertIsInstance(port, dhcp.PortModel)
+        self.assertIsInstance(port.fixed_ips[0], dhcp.FixedIpModel)
+        self.assertIsInstance(network.subnets[0], dhcp.SubnetModel)
+        self.assertIs(network.id, port.network_id)
+        self.assertEqual(fake_network.namespace, network.namespace)
+        # the network given to the cache is left untouched
+        self.assertIsInstance(fake_network.ports[0], dhcp.DictModel)
+
 
 class FakePort1:
     id = 'eeeeeeee-eeee-eeee-eeee-eeeeeeeeeeee'
@@ -1205,6 +1539,39 @@ class TestDeviceManager(base.BaseTestCase):
                           dh.setup_dhcp_port,
                           fake_network_copy)
 
+    def _test_is_setup(self, mac_address=None, cidrs=None,
+                       dhcp_subnet2=False, device_name='tap12345678-12'):
+        plugin = mock.Mock()
+        dh = dhcp.DeviceManager(cfg.CONF, cfg.CONF.root_helper, plugin)
+        network = copy.deepcopy(fake_network)
+        network.ports[0].device_id = dh.get_device_id(fake_network)
+        network.subnets[1].enable_dhcp = dhcp_subnet2
+        self.mock_driver.get_device_name.return_value = 'tap12345678-12'
+        with mock.patch.object(dhcp.ip_lib, 'IPDevice') as device_cls:
+            device = device_cls.return_value
+            device.link.address = mac_address or fake_port1.mac_address
+            device.addr.list.return_value = [
+                {'cidr': cidr} for cidr in
+                cidrs or ['172.9.9.9/24', '169.254.169.254/16']]
+            result = dh.is_setup(network, device_name)
+        self.assertFalse(plugin.mock_calls)
+        return result
+
+    def test_is_setup(self):
+        self.assertTrue(self._test_is_setup())
+
+    def test_is_setup_other_device(self):
+        self.assertFalse(self._test_is_setup(device_name='tap0'))
+
+    def test_is_setup_other_mac(self):
+        self.assertFalse(self._test_is_setup(mac_address='aa:bb:cc:00:00:00'))
+
+    def test_is_setup_other_ips(self):
+        self.assertFalse(self._test_is_setup(cidrs=['172.9.9.10/24']))
+
+    def test_is_setup_missing_subnet(self):
+        self.assertFalse(self._test_is_setup(dhcp_subnet2=True))
+
     def test_create_dhcp_port_no_update_or_create(self):
         plugin = mock.Mock()
         dh = dhcp.DeviceManager(cfg.CONF, cfg.CONF.root_helper, plugin)
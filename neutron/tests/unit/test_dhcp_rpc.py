@@ -19,6 +19,9 @@ from oslo.db import exception as db_exc
 from neutron.api.rpc.handlers import dhcp_rpc
 from neutron.common import constants
 from neutron.common import exceptions as n_exc
+from neutron.common import utils
+from neutron.db import dhcp_sync_revision_db
+from neutron.extensions import portbindings
 from neutron.tests import base
 
 
@@ -33,6 +36,12 @@ class TestDhcpRpcCallback(base.BaseTestCase):
         self.callbacks = dhcp_rpc.DhcpRpcCallback()
         self.log_p = mock.patch('neutron.api.rpc.handlers.dhcp_rpc.LOG')
         self.log = self.log_p.start()
+        self.get_revisions = mock.patch.object(
+            dhcp_sync_revision_db, 'get_network_revisions').start()
+        self.get_revisions.side_effect = lambda context, network_ids: dict(
+            (network_id, 1) for network_id in network_ids)
+        self.bump_revisions = mock.patch.object(
+            dhcp_sync_revision_db, 'bump_network_revisions').start()
 
     def test_get_active_networks(self):
         plugin_retval = [dict(id='a'), dict(id='b')]
@@ -60,9 +69,14 @@ class TestDhcpRpcCallback(base.BaseTestCase):
                                                       action))
 
     def _test__port_action_good_action(self, action, port, expected_call):
-        self.callbacks._port_action(self.plugin, mock.Mock(),
+        context = mock.Mock()
+        getattr(self.plugin, action).return_value = {
+            'network_id': 'foo_network_id'}
+        self.callbacks._port_action(self.plugin, context,
                                     port, action)
         self.plugin.assert_has_calls(expected_call)
+        self.bump_revisions.assert_called_once_with(context,
+                                                    ['foo_network_id'])
 
     def test_port_action_create_port(self):
         self._test__port_action_good_action(
@@ -118,8 +132,8 @@ class TestDhcpRpcCallback(base.BaseTestCase):
     def test_get_network_info(self):
         network_retval = dict(id='a')
 
-        subnet_retval = mock.Mock()
-        port_retval = mock.Mock()
+        subnet_retval = [dict(id='s1', network_id='a')]
+        port_retval = [dict(id='p1', network_id='a')]
 
         self.plugin.get_network.return_value = network_retval
         self.plugin.get_subnets.return_value = subnet_retval
@@ -129,6 +143,104 @@ class TestDhcpRpcCallback(base.BaseTestCase):
         self.assertEqual(retval, network_retval)
         self.assertEqual(retval['subnets'], subnet_retval)
         self.assertEqual(retval['ports'], port_retval)
+        self.assertEqual(1, retval[constants.DHCP_REVISION_KEY])
+
+    def _setup_networks(self):
+        self.plugin.get_networks.return_value = [dict(id='a'), dict(id='b')]
+        self.plugin.get_subnets.return_value = [
+            dict(id='s1', network_id='a', enable_dhcp=True)]
+        self.plugin.get_ports.return_value = [
+            dict(id='p1', network_id='a', status='DOWN'),
+            dict(id='p2', network_id='b', status='DOWN')]
+
+    def test_get_active_network_revisions(self):
+        self._setup_networks()
+        revisions = self.callbacks.get_active_network_revisions(
+            mock.Mock(), host='host')
+        self.assertEqual({'a': 1, 'b': 1}, revisions)
+        self.assertFalse(self.plugin.get_ports.called)
+        self.assertFalse(self.plugin.get_subnets.called)
+        networks = self.callbacks.get_networks_info(
+            mock.Mock(), network_ids=['a', 'b'], host='host')
+        for network in networks:
+            self.assertEqual(revisions[network['id']],
+                             network[constants.DHCP_REVISION_KEY])
+
+    def test_get_networks_info(self):
+        self._setup_networks()
+        networks = self.callbacks.get_networks_info(
+            mock.Mock(), network_ids=['a', 'b'], host='host')
+        self.plugin.get_networks.assert_called_once_with(
+            mock.ANY, filters={'id': ['a', 'b']})
+        self.assertEqual(['s1'], [s['id'] for s in networks[0]['subnets']])
+        self.assertEqual(['p1'], [p['id'] for p in networks[0]['ports']])
+        self.assertEqual([], networks[1]['subnets'])
+        self.assertEqual(['p2'], [p['id'] for p in networks[1]['ports']])
+
+    def test_get_networks_info_no_ids(self):
+        self.assertEqual([], self.callbacks.get_networks_info(
+            mock.Mock(), network_ids=[], host='host'))
+        self.assertFalse(self.plugin.get_networks.called)
+
+    def _test_ensure_dhcp_ports(self, ports):
+        self.plugin.get_networks.return_value = [
+            dict(id='a', tenant_id='t'), dict(id='b', tenant_id='t')]
+        self.plugin.get_subnets.return_value = [
+            dict(id='s1', network_id='a'), dict(id='s2', network_id='a')]
+        self.plugin.get_ports.return_value = ports
+        self.plugin.create_port.side_effect = lambda ctx, port: dict(
+            port['port'], id='new')
+        self.plugin.update_port.side_effect = lambda ctx, port_id, port: dict(
+            port, id=port_id)
+        return self.callbacks.ensure_dhcp_ports(
+            mock.Mock(), network_ids=['a', 'b'], host='host')
+
+    def test_ensure_dhcp_ports_existing(self):
+        device_id = utils.get_dhcp_agent_device_id('a', 'host')
+        port = dict(id='p1', network_id='a', device_id=device_id,
+                    fixed_ips=[dict(subnet_id='s1', ip_address='10.0.0.2'),
+                               dict(subnet_id='s2', ip_address='10.0.1.2')])
+        self.assertEqual({'a': port}, self._test_ensure_dhcp_ports([port]))
+        self.assertFalse(self.plugin.update_port.called)
+        self.assertFalse(self.plugin.create_port.called)
+        # networks without DHCP subnet are left out of all queries results
+        self.assertEqual(1, self.plugin.get_ports.call_count)
+
+    def test_ensure_dhcp_ports_missing_subnet(self):
+        device_id = utils.get_dhcp_agent_device_id('a', 'host')
+        fixed_ip = dict(subnet_id='s1', ip_address='10.0.0.2')
+        port = dict(id='p1', network_id='a', device_id=device_id,
+                    fixed_ips=[fixed_ip])
+        ports = self._test_ensure_dhcp_ports([port])
+        self.plugin.update_port.assert_called_once_with(
+            mock.ANY, 'p1', {'network_id': 'a',
+                             'fixed_ips': [fixed_ip, dict(subnet_id='s2')]})
+        self.assertEqual('p1', ports['a']['id'])
+
+    def test_ensure_dhcp_ports_reserved(self):
+        port = dict(id='p1', network_id='a', fixed_ips=[],
+                    device_id=constants.DEVICE_ID_RESERVED_DHCP_PORT)
+        ports = self._test_ensure_dhcp_ports([port])
+        device_id = utils.get_dhcp_agent_device_id('a', 'host')
+        self.plugin.update_port.assert_called_once_with(
+            mock.ANY, 'p1', {'network_id': 'a', 'device_id': device_id})
+        self.assertEqual('p1', ports['a']['id'])
+
+    def test_ensure_dhcp_ports_create(self):
+        ports = self._test_ensure_dhcp_ports([])
+        port = self.plugin.create_port.call_args[0][1]['port']
+        self.assertEqual(utils.get_dhcp_agent_device_id('a', 'host'),
+                         port['device_id'])
+        self.assertEqual(constants.DEVICE_OWNER_DHCP, port['device_owner'])
+        self.assertEqual('host', port[portbindings.HOST_ID])
+        self.assertEqual([dict(subnet_id='s1'), dict(subnet_id='s2')],
+                         port['fixed_ips'])
+        self.assertEqual(['a'], ports.keys())
+
+    def test_ensure_dhcp_ports_no_networks(self):
+        self.assertEqual({}, self.callbacks.ensure_dhcp_ports(
+            mock.Mock(), network_ids=[], host='host'))
+        self.assertFalse(self.plugin.get_ports.called)
 
     def _test_get_dhcp_port_helper(self, port_retval, other_expectations=[],
                                    update_port=None, create_port=None):
@@ -217,6 +329,7 @@ class TestDhcpRpcCallback(base.BaseTestCase):
 
         self.plugin.assert_has_calls([
             mock.call.delete_ports_by_device_id(mock.ANY, 'devid', 'netid')])
+        self.bump_revisions.assert_called_once_with(mock.ANY, ['netid'])
 
     def test_release_port_fixed_ip(self):
         port_retval = dict(id='port_id', fixed_ips=[dict(subnet_id='a')])
@@ -231,3 +344,4 @@ class TestDhcpRpcCallback(base.BaseTestCase):
                                                        device_id=['devid'])),
             mock.call.update_port(mock.ANY, 'port_id',
                                   dict(port=port_update))])
+        self.bump_revisions.assert_called_once_with(mock.ANY, ['netid'])
@@ -26,10 +26,10 @@ from neutron.scheduler import dhcp_agent_scheduler
 from neutron.tests.unit import testlib_api
 
 
-class DhcpSchedulerTestCase(testlib_api.SqlTestCase):
+class DhcpSchedulerBaseTestCase(testlib_api.SqlTestCase):
 
     def setUp(self):
-        super(DhcpSchedulerTestCase, self).setUp()
+        super(DhcpSchedulerBaseTestCase, self).setUp()
         self.ctx = context.get_admin_context()
         self.network_id = 'foo_network_id'
         self._save_networks([self.network_id])
@@ -68,6 +68,9 @@ class DhcpSchedulerTestCase(testlib_api.SqlTestCase):
         for result in results:
             self.assertEqual(network_id, result.network_id)
 
+
+class DhcpSchedulerTestCase(DhcpSchedulerBaseTestCase):
+
     def test_schedule_bind_network_single_agent(self):
         agents = self._get_agents(['host-a'])
         self._save_agents(agents)
@@ -122,3 +125,88 @@ class DhcpSchedulerTestCase(testlib_api.SqlTestCase):
             self.ctx.session.query(agentschedulers_db.NetworkDhcpAgentBinding)
             .all())
         self.assertEqual(1, len(results))
+
+    def test_auto_schedule_networks_bulk(self):
+        network_ids = ['foo_network_id2', 'foo_network_id3']
+        self._save_networks(network_ids)
+        plugin = mock.MagicMock()
+        plugin.get_subnets.return_value = [
+            {"network_id": network_id, "enable_dhcp": True}
+            for network_id in [self.network_id] + network_ids]
+        agents = self._get_agents(['host-a', 'host-b'])
+        for agent in agents:
+            agent.reserved = False
+        self._save_agents(agents)
+        scheduler = dhcp_agent_scheduler.ChanceScheduler()
+        self._test_schedule_bind_network([agents[1]], self.network_id)
+
+        with mock.patch.object(scheduler, '_schedule_bind_network') as bind:
+            self.assertTrue(scheduler.auto_schedule_networks(
+                plugin, self.ctx, "host-a"))
+            self.assertFalse(bind.called)
+        results = (
+            self.ctx.session.query(agentschedulers_db.NetworkDhcpAgentBinding)
+            .filter_by(dhcp_agent_id=agents[0].id).all())
+        self.assertEqual(set(network_ids),
+                         set(result.network_id for result in results))
+
+    def test_bind_networks_already_bound(self):
+        network_ids = ['foo_network_id2']
+        self._save_networks(network_ids)
+        agents = self._get_agents(['host-a'])
+        self._save_agents(agents)
+        scheduler = dhcp_agent_scheduler.ChanceScheduler()
+        self._test_schedule_bind_network(agents, self.network_id)
+        scheduler._bind_networks(self.ctx, [(agents[0], self.network_id),
+                                            (agents[0], network_ids[0])])
+        results = (
+            self.ctx.session.query(agentschedulers_db.NetworkDhcpAgentBinding)
+            .all())
+        self.assertEqual(2, len(results))
+
+
+class LeastNetworksSchedulerTestCase(DhcpSchedulerBaseTestCase):
+
+    def setUp(self):
+        super(LeastNetworksSchedulerTestCase, self).setUp()
+        self.plugin = agentschedulers_db.DhcpAgentSchedulerDbMixin()
+        self.scheduler = dhcp_agent_scheduler.LeastNetworksScheduler()
+
+    def _save_ports(self, network_id, num_ports):
+        with self.ctx.session.begin(subtransactions=True):
+            for index in range(num_ports):
+                self.ctx.session.add(models_v2.Port(
+                    tenant_id='tenant', network_id=network_id,
+                    mac_address='fa:16:3e:00:00:%02x' % index,
+                    admin_state_up=True, status='ACTIVE', device_id='',
+                    device_owner='', disable_anti_spoofing=False))
+
+    def test_get_dhcp_agents_load(self):
+        self._save_networks(['foo_network_id2'])
+        self._save_ports(self.network_id, 3)
+        self._save_ports('foo_network_id2', 2)
+        agents = self._get_agents(['host-a', 'host-b', 'host-c'])
+        self._save_agents(agents)
+        self._test_schedule_bind_network(agents[:2], self.network_id)
+        self._test_schedule_bind_network([agents[0]], 'foo_network_id2')
+
+        loads = self.plugin.get_dhcp_agents_load(
+            self.ctx, [agent.id for agent in agents])
+        self.assertEqual({agents[0].id: (2, 5),
+                          agents[1].id: (1, 3),
+                          agents[2].id: (0, 0)}, loads)
+
+    def test_get_dhcp_agents_load_no_agents(self):
+        self.assertEqual({}, self.plugin.get_dhcp_agents_load(self.ctx, []))
+
+    def test_choose_dhcp_agents(self):
+        plugin = mock.Mock()
+        agents = [{'id': 'agent-a'}, {'id': 'agent-b'}, {'id': 'agent-c'}]
+        plugin.get_dhcp_agents_load.return_value = {'agent-a': (2, 0),
+                                                    'agent-b': (1, 8),
+                                                    'agent-c': (1, 3)}
+        self.assertEqual(
+            [{'id': 'agent-c'}, {'id': 'agent-b'}],
+            self.scheduler._choose_dhcp_agents(plugin, self.ctx, agents, 2))
+        plugin.get_dhcp_agents_load.assert_called_once_with(
+            self.ctx, ['agent-a', 'agent-b', 'agent-c'])
@@ -17,6 +17,7 @@ import contextlib
 import copy
 import datetime
 
+import eventlet
 import mock
 import netaddr
 from oslo.config import cfg
@@ -374,6 +375,92 @@ class TestBasicRouterOperations(base.BaseTestCase):
             agent._sync_routers_task(agent.context)
         self.assertTrue(f.called)
 
+    def test__sync_routers_task_with_revisions(self):
+        self.conf.set_override('sync_routers_with_revisions', True)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        changed = prepare_router_data()
+        unchanged = prepare_router_data()
+        unchanged[l3_constants.SYNC_REVISION_KEY] = 3
+        stale = prepare_router_data()
+        for router in (unchanged, stale):
+            agent.router_info[router['id']] = l3_agent.RouterInfo(
+                router['id'], self.conf.root_helper,
+                self.conf.use_namespaces, router=router)
+        agent.router_info[unchanged['id']].sync_revision = 3
+        # Not processed yet
+        stale[l3_constants.SYNC_REVISION_KEY] = 4
+        self.plugin_api.get_routers_with_revisions.return_value = {
+            'routers': [changed], 'unchanged': [unchanged['id']]}
+        with contextlib.nested(
+            mock.patch.object(agent, '_cleanup_namespaces'),
+            mock.patch.object(agent._queue, 'add')
+        ) as (cleanup, queue_add):
+            agent._sync_routers_task(agent.context)
+        self.plugin_api.get_routers_with_revisions.assert_called_once_with(
+            agent.context, mock.ANY, {unchanged['id']: 3})
+        self.assertFalse(self.plugin_api.get_routers.called)
+        updates = dict((call[0][0].id, call[0][0])
+                       for call in queue_add.call_args_list)
+        self.assertEqual(set([changed['id'], stale['id']]), set(updates))
+        self.assertEqual(changed, updates[changed['id']].router)
+        self.assertEqual(l3_agent.DELETE_ROUTER,
+                         updates[stale['id']].action)
+
+    def test__sync_routers_task_prioritizes_routers(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        internal = prepare_router_data(num_internal_ports=3)
+        del internal['gw_port']
+        gateway = prepare_router_data(num_internal_ports=1)
+        gateway_busy = prepare_router_data(num_internal_ports=2)
+        recent = prepare_router_data(num_internal_ports=1)
+        fip = prepare_router_data(enable_floating_ip=True)
+        agent._router_activity[recent['id']] = datetime.datetime.utcnow()
+        self.plugin_api.get_routers.return_value = [
+            internal, gateway, gateway_busy, recent, fip]
+        with mock.patch.object(agent, '_cleanup_namespaces'):
+            agent._sync_routers_task(agent.context)
+        ordered = []
+        while not agent._queue.empty():
+            ordered.append(agent._queue._queue.get().id)
+        self.assertEqual([fip['id'], recent['id'], gateway_busy['id'],
+                          gateway['id'], internal['id']], ordered)
+
+    def test__sync_routers_task_defers_slow_work_on_startup(self):
+        self.conf.set_override('startup_defer_slow_work', True)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = prepare_router_data(enable_floating_ip=True)
+        self.plugin_api.get_routers.return_value = [router]
+        with contextlib.nested(
+            mock.patch.object(agent, '_cleanup_namespaces'),
+            mock.patch.object(agent._queue, 'add')
+        ) as (cleanup, queue_add):
+            agent._sync_routers_task(agent.context)
+            agent.fullsync = True
+            agent._sync_routers_task(agent.context)
+        self.assertEqual([True, False],
+                         [call[0][0].defer_slow_work
+                          for call in queue_add.call_args_list])
+
+    def test_process_router_update_requeues_deferred_work(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = prepare_router_data(enable_floating_ip=True)
+        agent._queue.add(l3_agent.RouterUpdate(
+            router['id'], l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+            router=router, defer_slow_work=True))
+        with mock.patch.object(agent, '_process_routers') as process:
+            agent._process_router_update()
+            process.assert_called_once_with([router], defer_slow_work=True)
+            deferred = agent._queue._queue.get()
+            self.assertEqual(l3_agent.PRIORITY_DEFERRED_WORK,
+                             deferred.priority)
+            self.assertFalse(deferred.defer_slow_work)
+
+            # Deferred work is dropped when the router went away
+            process.reset_mock()
+            agent._queue.add(deferred)
+            agent._process_router_update()
+            self.assertFalse(process.called)
+
     def test_router_info_create(self):
         id = _uuid()
         ri = l3_agent.RouterInfo(id, self.conf.root_helper,
@@ -819,6 +906,23 @@ class TestBasicRouterOperations(base.BaseTestCase):
         self.mock_ip_dev.neigh.add.assert_called_once_with(
             4, '1.7.23.11', '00:11:22:33:44:55')
 
+    def test_add_arp_entry_failure_resyncs_router(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = prepare_router_data(num_internal_ports=2)
+        subnet_id = _get_subnet_id(router[l3_constants.INTERFACE_KEY][0])
+        arp_table = {'ip_address': '1.7.23.11',
+                     'mac_address': '00:11:22:33:44:55',
+                     'subnet_id': subnet_id}
+
+        payload = {'arp_table': arp_table, 'router_id': router['id']}
+        agent._router_added(router['id'], router)
+        agent.router_info[router['id']].sync_revision = 2
+        agent.fullsync = False
+        self.mock_ip_dev.neigh.add.side_effect = RuntimeError
+        agent.add_arp_entry(None, payload)
+        self.assertTrue(agent.fullsync)
+        self.assertIsNone(agent.router_info[router['id']].sync_revision)
+
     def test_add_arp_entry_no_routerinfo(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = prepare_router_data(num_internal_ports=2)
@@ -1096,6 +1200,71 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
         self.assertIsNone(fip_statuses.get(fip_id))
 
+    def _prepare_floating_ips(self, count):
+        return [{'id': _uuid(), 'port_id': _uuid(),
+                 'floating_ip_address': '15.1.2.%d' % (i + 1),
+                 'fixed_ip_address': '192.168.0.%d' % (i + 1)}
+                for i in range(count)]
+
+    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
+    def test_process_router_floating_ip_addresses_batch(self, IPDevice):
+        fips = self._prepare_floating_ips(3)
+        IPDevice.return_value = device = mock.Mock()
+        device.addr.list.return_value = [{'cidr': '15.1.2.1/32'},
+                                         {'cidr': '15.1.2.9/32'}]
+        ri = mock.MagicMock()
+        ri.router.get.return_value = fips
+        ri.router['distributed'].__nonzero__ = lambda self: False
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+
+        fip_statuses = agent.process_router_floating_ip_addresses(
+            ri, {'id': _uuid()})
+
+        self.assertEqual(
+            dict((fip['id'], l3_constants.FLOATINGIP_STATUS_ACTIVE)
+                 for fip in fips), fip_statuses)
+        self.assertFalse(device.addr.add.called)
+        self.assertFalse(device.addr.delete.called)
+        self.mock_ip.batch.assert_called_once_with(
+            ['addr add 15.1.2.2/32 brd 15.1.2.2 scope global dev %s' %
+             IPDevice.call_args[0][0],
+             'addr add 15.1.2.3/32 brd 15.1.2.3 scope global dev %s' %
+             IPDevice.call_args[0][0],
+             'addr del 15.1.2.9/32 dev %s' % IPDevice.call_args[0][0]])
+        self.assertEqual(2, self.send_arp.call_count)
+
+    @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
+    def test_process_router_floating_ip_addresses_batch_error(self, IPDevice):
+        fips = self._prepare_floating_ips(2)
+        IPDevice.return_value = device = mock.Mock()
+        device.addr.list.side_effect = [[], [{'cidr': '15.1.2.1/32'}]]
+        self.mock_ip.batch.side_effect = RuntimeError
+        ri = mock.MagicMock()
+        ri.router.get.return_value = fips
+        ri.router['distributed'].__nonzero__ = lambda self: False
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+
+        fip_statuses = agent.process_router_floating_ip_addresses(
+            ri, {'id': _uuid()})
+
+        self.assertEqual(
+            {fips[0]['id']: l3_constants.FLOATINGIP_STATUS_ACTIVE,
+             fips[1]['id']: l3_constants.FLOATINGIP_STATUS_ERROR},
+            fip_statuses)
+        self.assertEqual(1, self.send_arp.call_count)
+
+    def test_send_gratuitous_arp_packet_queues_arping(self):
+        self.send_arp_p.stop()
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        with mock.patch.object(agent, '_arping') as arping:
+            agent._send_gratuitous_arp_packet('ns', 'qg-1', '15.1.2.1')
+            agent._send_gratuitous_arp_packet('ns', 'qg-1', '15.1.2.2')
+            eventlet.sleep(0)
+            eventlet.sleep(0)
+        arping.assert_has_calls([mock.call('ns', 'qg-1', '15.1.2.1', False),
+                                 mock.call('ns', 'qg-1', '15.1.2.2', False)])
+        agent._garp_worker.kill()
+
     @mock.patch('neutron.agent.linux.ip_lib.IPDevice')
     def test_process_router_floating_ip_with_device_add_error(self, IPDevice):
         IPDevice.return_value = device = mock.Mock()
@@ -1141,6 +1310,34 @@ class TestBasicRouterOperations(base.BaseTestCase):
         self._verify_snat_rules(nat_rules_delta, router)
         self.assertEqual(self.send_arp.call_count, 1)
 
+    def test_process_router_applies_iptables_once(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.conf.set_override('uos_metering', True)
+        # The metering chains are set up according to the global options
+        mock.patch.object(l3_agent.cfg, 'CONF', new=self.conf).start()
+        agent.process_rate_limit = mock.Mock()
+        agent.process_metering_label = mock.Mock(
+            wraps=agent.process_metering_label)
+        router = prepare_router_data(enable_snat=True,
+                                     enable_floating_ip=True)
+        router['portforwardings'] = [
+            {'protocol': 'tcp', 'outside_port': 2222,
+             'inside_addr': '35.4.0.4', 'inside_port': 22}]
+        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
+                                 self.conf.use_namespaces, router=router)
+        agent.external_gateway_added = mock.Mock()
+        agent.process_router(ri)
+        self.assertEqual(1, ri.iptables_applies)
+        self.assertTrue(agent.process_metering_label.called)
+
+        router = prepare_router_data()
+        del router['gw_port']
+        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
+                                 self.conf.use_namespaces, router=router)
+        agent.process_router(ri)
+        self.assertEqual(1, ri.iptables_applies)
+        self.assertFalse(ri.iptables_manager.iptables_apply_deferred)
+
     def test_process_router_snat_enabled(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = prepare_router_data(enable_snat=False)
@@ -1423,6 +1620,28 @@ class TestBasicRouterOperations(base.BaseTestCase):
                 mock.ANY, ri.router_id,
                 {fip_id: l3_constants.FLOATINGIP_STATUS_DOWN})
 
+    def test_process_router_records_sync_revision(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = prepare_router_data(num_internal_ports=1)
+        router[l3_constants.SYNC_REVISION_KEY] = 2
+        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
+                                 self.conf.use_namespaces, router=router)
+        agent.external_gateway_added = mock.Mock()
+        self.assertIsNone(ri.sync_revision)
+        agent.process_router(ri)
+        self.assertEqual(2, ri.sync_revision)
+
+    def test_process_router_failure_keeps_sync_revision(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = prepare_router_data(num_internal_ports=1)
+        router[l3_constants.SYNC_REVISION_KEY] = 2
+        ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
+                                 self.conf.use_namespaces, router=router)
+        ri.sync_revision = 1
+        agent.external_gateway_added = mock.Mock(side_effect=RuntimeError)
+        self.assertRaises(RuntimeError, agent.process_router, ri)
+        self.assertEqual(1, ri.sync_revision)
+
     def test_process_router_floatingip_exception(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.process_router_floating_ip_addresses = mock.Mock()
@@ -1437,6 +1656,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
                  'floating_ip_address': '8.8.8.8',
                  'fixed_ip_address': '7.7.7.7',
                  'port_id': router[l3_constants.INTERFACE_KEY][0]['id']}]
+            router[l3_constants.SYNC_REVISION_KEY] = 2
 
             ri = l3_agent.RouterInfo(router['id'], self.conf.root_helper,
                                      self.conf.use_namespaces, router=router)
@@ -1447,6 +1667,8 @@ class TestBasicRouterOperations(base.BaseTestCase):
             mock_update_fip_status.assert_called_once_with(
                 mock.ANY, ri.router_id,
                 {fip_id: l3_constants.FLOATINGIP_STATUS_ERROR})
+            # The router is processed again on the next full sync
+            self.assertIsNone(ri.sync_revision)
 
     def test_handle_router_snat_rules_add_back_jump(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -1872,6 +2094,8 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent._destroy_snat_namespace = mock.MagicMock()
         ns_list = agent._list_namespaces()
         agent._cleanup_namespaces(ns_list, [r['id'] for r in router_list])
+        if agent._ns_cleanup_thread is not None:
+            agent._ns_cleanup_thread.wait()
 
         # Expect process manager to disable one radvd per stale namespace
         expected_pm_disables = len(stale_namespace_list)
@@ -1928,6 +2152,43 @@ class TestBasicRouterOperations(base.BaseTestCase):
                                      router_list,
                                      other_namespaces)
 
+    def test_cleanup_namespace_synchronous(self):
+        self.conf.set_override('router_id', None)
+        self.conf.set_override('namespace_cleanup_workers', 0)
+        stale_namespaces = [l3_agent.NS_PREFIX + 'foo',
+                            l3_agent.SNAT_NS_PREFIX + 'foo']
+
+        self._cleanup_namespace_test(stale_namespaces, [], [])
+
+    def test_cleanup_namespace_skips_added_router(self):
+        self.conf.set_override('router_id', None)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.router_info['bar'] = mock.Mock()
+        agent._destroy_namespace = mock.Mock()
+        agent._cleanup_namespaces(set([l3_agent.NS_PREFIX + 'foo',
+                                       l3_agent.NS_PREFIX + 'bar']), [])
+        agent._ns_cleanup_thread.wait()
+
+        agent._destroy_namespace.assert_called_once_with(
+            l3_agent.NS_PREFIX + 'foo')
+        self.assertEqual({'stale': 2, 'destroyed': 1, 'failed': 0,
+                          'skipped': 1}, agent.ns_cleanup_stats)
+
+    def test_cleanup_namespace_waits_for_router_updates(self):
+        self.conf.set_override('router_id', None)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent._destroy_namespace = mock.Mock()
+        with contextlib.nested(
+            mock.patch.object(agent._queue, 'empty',
+                              side_effect=[False, False, True]),
+            mock.patch('eventlet.sleep')
+        ) as (empty, sleep):
+            agent._destroy_stale_router_namespaces(
+                set([l3_agent.NS_PREFIX + 'foo']))
+
+        self.assertEqual(2, sleep.call_count)
+        self.assertEqual(1, agent._destroy_namespace.call_count)
+
     def test_create_dvr_gateway(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = prepare_router_data()
@@ -14,6 +14,7 @@
 #    under the License.
 
 import contextlib
+import copy
 import os
 
 import mock
@@ -1162,6 +1163,117 @@ tag:tag0,option:router""".lstrip()
         self.execute.assert_called_once_with(exp_args, 'sudo')
         device_manager.update.assert_called_with(fake_net, 'tap12345678-12')
 
+    def test_reload_allocations_unchanged(self):
+        fake_net = FakeDualNetwork()
+        dm = dhcp.Dnsmasq(self.conf, fake_net,
+                          version=dhcp.Dnsmasq.MINIMUM_VERSION)
+
+        with contextlib.nested(
+            mock.patch.dict(dhcp._conf_file_digests, clear=True),
+            mock.patch.object(dhcp.Dnsmasq, 'active'),
+            mock.patch.object(dhcp.Dnsmasq, 'pid'),
+            mock.patch.object(dhcp.Dnsmasq, 'interface_name'),
+            mock.patch.object(dhcp.Dnsmasq, '_make_subnet_interface_ip_map'),
+            mock.patch.object(dm, '_release_unused_leases'),
+            mock.patch.object(dm, 'device_manager')
+        ) as (digests, active, pid, interface_name, ip_map, release,
+              device_manager):
+            active.__get__ = mock.Mock(return_value=True)
+            pid.__get__ = mock.Mock(return_value=5)
+            interface_name.__get__ = mock.Mock(return_value='tap12345678-12')
+            ip_map.return_value = {}
+            dm.reload_allocations()
+            with mock.patch('os.path.exists', return_value=True):
+                dm.reload_allocations()
+
+        # The second reload neither rewrites the files nor signals dnsmasq
+        self.assertEqual(3, self.safe.call_count)
+        self.execute.assert_called_once_with(['kill', '-HUP', 5], 'sudo')
+
+    def test_replace_conf_file_left_by_previous_run(self):
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(),
+                          version=dhcp.Dnsmasq.MINIMUM_VERSION)
+        dm.conf_files_changed = False
+        with contextlib.nested(
+            mock.patch.dict(dhcp._conf_file_digests, clear=True),
+            mock.patch('__builtin__.open',
+                       mock.mock_open(read_data='content'), create=True),
+            mock.patch('os.path.exists', return_value=True)
+        ):
+            self.assertFalse(dm._replace_conf_file('/dhcp/host', 'content'))
+            self.assertTrue(dm._replace_conf_file('/dhcp/host', 'changed'))
+        self.safe.assert_called_once_with('/dhcp/host', 'changed')
+        self.assertTrue(dm.conf_files_changed)
+
+    def _test_adopt(self, active=True, is_setup=True,
+                    process_cmdline=None, files_changed=False):
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(),
+                          version=dhcp.Dnsmasq.MINIMUM_VERSION)
+
+        def build_cmdline():
+            dm.conf_files_changed = files_changed
+            return ['dnsmasq', '--interface=tap0']
+
+        with contextlib.nested(
+            mock.patch.object(dhcp.Dnsmasq, 'active'),
+            mock.patch.object(dhcp.Dnsmasq, 'pid'),
+            mock.patch.object(dhcp.Dnsmasq, 'interface_name'),
+            mock.patch.object(dm, '_build_cmdline',
+                              side_effect=build_cmdline),
+            mock.patch.object(dm, '_get_process_cmdline'),
+            mock.patch.object(dm, '_release_unused_leases'),
+            mock.patch.object(dm, 'device_manager'),
+            mock.patch.object(dm, 'spawn_process')
+        ) as (active_prop, pid, interface_name, build, process_cmdline_mock,
+              release, device_manager, spawn):
+            active_prop.__get__ = mock.Mock(return_value=active)
+            pid.__get__ = mock.Mock(return_value=5)
+            interface_name.__get__ = mock.Mock(return_value='tap0')
+            device_manager.is_setup.return_value = is_setup
+            process_cmdline_mock.return_value = (
+                process_cmdline or ['dnsmasq', '--interface=tap0'])
+            adopted = dm.adopt()
+            self.assertFalse(spawn.called)
+            self.assertFalse(device_manager.setup.called)
+            if adopted:
+                device_manager.update.assert_called_once_with(dm.network,
+                                                              'tap0')
+        return adopted
+
+    def test_adopt(self):
+        self.assertTrue(self._test_adopt())
+        self.assertFalse(self.execute.called)
+
+    def test_adopt_files_changed(self):
+        self.assertTrue(self._test_adopt(files_changed=True))
+        self.execute.assert_called_once_with(['kill', '-HUP', 5], 'sudo')
+
+    def test_adopt_not_active(self):
+        self.assertFalse(self._test_adopt(active=False))
+
+    def test_adopt_device_not_setup(self):
+        self.assertFalse(self._test_adopt(is_setup=False))
+
+    def test_adopt_cmdline_changed(self):
+        self.assertFalse(self._test_adopt(
+            process_cmdline=['dnsmasq', '--interface=tap1']))
+
+    def test_get_process_cmdline(self):
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(),
+                          version=dhcp.Dnsmasq.MINIMUM_VERSION)
+        with contextlib.nested(
+            mock.patch.object(dhcp.Dnsmasq, 'pid'),
+            mock.patch('__builtin__.open')
+        ) as (pid, mock_open):
+            pid.__get__ = mock.Mock(return_value=5)
+            mock_open.return_value.__enter__ = lambda s: s
+            mock_open.return_value.__exit__ = mock.Mock()
+            mock_open.return_value.readline.return_value = (
+                'dnsmasq\0--no-hosts\0')
+            self.assertEqual(['dnsmasq', '--no-hosts'],
+                             dm._get_process_cmdline())
+            mock_open.assert_called_once_with('/proc/5/cmdline', 'r')
+
     def test_reload_allocations_stale_pid(self):
         (exp_host_name, exp_host_data,
          exp_addn_name, exp_addn_data,
@@ -1232,6 +1344,81 @@ tag:tag0,option:router""".lstrip()
         dnsmasq._release_lease.assert_has_calls([mock.call(mac2, ip2)],
                                                 any_order=True)
 
+    def test_release_unused_leases_none_stale(self):
+        dnsmasq = dhcp.Dnsmasq(self.conf, FakeV4Network())
+        dnsmasq._read_hosts_file_leases = mock.Mock(
+            return_value=set([('192.168.0.2', '00:00:80:aa:bb:cc')]))
+        dnsmasq._release_leases = mock.Mock()
+
+        dnsmasq._release_unused_leases()
+
+        self.assertFalse(dnsmasq._release_leases.called)
+
+    def test_release_unused_leases_in_background(self):
+        self.conf.set_override('dhcp_release_in_background', True)
+        dnsmasq = dhcp.Dnsmasq(self.conf, FakeV4Network())
+        old_leases = set([('192.168.0.3', '00:00:80:cc:bb:aa')])
+        dnsmasq._read_hosts_file_leases = mock.Mock(return_value=old_leases)
+        dnsmasq._release_lease = mock.Mock()
+
+        with mock.patch.object(dhcp, '_lease_releaser') as releaser:
+            dnsmasq._release_unused_leases()
+
+        releaser.add.assert_called_once_with(
+            dnsmasq.network.id, old_leases, dnsmasq._release_leases)
+        self.assertFalse(dnsmasq._release_lease.called)
+
+    def _test_release_leases_batch(self, leases):
+        self.conf.set_override('dhcp_release_batch', True)
+        network = FakeDualNetwork()
+        dhcp_port = FakeDualPort()
+        dhcp_port.device_id = 'dhcp-device'
+        for port in network.ports:
+            port.device_id = 'other-device'
+        network.ports = network.ports + [dhcp_port]
+        dnsmasq = dhcp.Dnsmasq(self.conf, network)
+        dnsmasq.device_manager.get_device_id.return_value = 'dhcp-device'
+        dnsmasq._release_lease = mock.Mock()
+        with mock.patch('neutron.agent.linux.dhcp.DhcpLocalProcess.'
+                        'interface_name', new_callable=mock.PropertyMock,
+                        return_value='tap0'):
+            dnsmasq._release_leases(leases)
+        return dnsmasq
+
+    def test_release_leases_batch(self):
+        dnsmasq = self._test_release_leases_batch(
+            set([('192.168.0.4', '00:00:80:aa:bb:cc'),
+                 ('192.168.0.5', '00:00:80:cc:bb:aa')]))
+
+        self.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'qdhcp-ns', 'neutron-dhcp-release',
+             '--interface=tap0',
+             '192.168.0.4,00:00:80:aa:bb:cc,192.168.0.3',
+             '192.168.0.5,00:00:80:cc:bb:aa,192.168.0.3'],
+            root_helper='sudo', check_exit_code=True)
+        self.assertFalse(dnsmasq._release_lease.called)
+
+    def test_release_leases_batch_falls_back_to_dhcp_release(self):
+        dnsmasq = self._test_release_leases_batch(
+            set([('10.0.0.4', '00:00:80:aa:bb:cc'),
+                 ('fdca:3ba5:a17a:4ba3::4', '00:00:80:cc:bb:aa')]))
+
+        self.assertFalse(self.execute.called)
+        dnsmasq._release_lease.assert_has_calls(
+            [mock.call('00:00:80:aa:bb:cc', '10.0.0.4'),
+             mock.call('00:00:80:cc:bb:aa', 'fdca:3ba5:a17a:4ba3::4')],
+            any_order=True)
+
+    def test_release_leases_without_batch(self):
+        dnsmasq = dhcp.Dnsmasq(self.conf, FakeDualNetwork())
+        dnsmasq._release_lease = mock.Mock()
+
+        dnsmasq._release_leases(set([('192.168.0.4', '00:00:80:aa:bb:cc')]))
+
+        dnsmasq._release_lease.assert_called_once_with('00:00:80:aa:bb:cc',
+                                                       '192.168.0.4')
+        self.assertFalse(self.execute.called)
+
     def test_read_hosts_file_leases(self):
         filename = '/path/to/file'
         with mock.patch('os.path.exists') as mock_exists:
@@ -1336,3 +1523,92 @@ tag:tag0,option:router""".lstrip()
         dm._output_hosts_file()
         self.safe.assert_has_calls([mock.call(exp_host_name,
                                               exp_host_data)])
+
+
+class TestSlotModel(base.BaseTestCase):
+
+    def _port(self, **kwargs):
+        port = dict(id='port-1', mac_address='aa:bb:cc:dd:ee:ff',
+                    network_id='net-1',
+                    fixed_ips=[dict(subnet_id='subnet-1',
+                                    ip_address='192.168.0.2')])
+        port.update(kwargs)
+        return port
+
+    def test_attribute_and_item_access(self):
+        port = dhcp.PortModel(self._port())
+        self.assertEqual('port-1', port.id)
+        self.assertEqual('port-1', port['id'])
+        self.assertEqual('192.168.0.2', port.fixed_ips[0].ip_address)
+        self.assertIsInstance(port.fixed_ips[0], dhcp.FixedIpModel)
+        self.assertIn('mac_address', port)
+
+    def test_unset_field(self):
+        port = dhcp.PortModel(self._port())
+        self.assertNotIn('device_id', port)
+        self.assertIsNone(getattr(port, 'device_id', None))
+        self.assertIsNone(port.get('device_id'))
+        self.assertRaises(KeyError, lambda: port['device_id'])
+
+    def test_extra_keys(self):
+        port = dhcp.PortModel(self._port(**{'binding:host_id': 'host'}))
+        self.assertEqual('host', port['binding:host_id'])
+        port.custom = 'value'
+        self.assertEqual('value', port.custom)
+        del port.custom
+        self.assertRaises(AttributeError, getattr, port, 'custom')
+
+    def test_equals_dict(self):
+        data = self._port(**{'binding:host_id': 'host'})
+        port = dhcp.PortModel(data)
+        self.assertEqual(data, port)
+        self.assertEqual(port, dhcp.DictModel(data))
+        self.assertEqual(port, dhcp.PortModel(data))
+        self.assertNotEqual(port, self._port(id='port-2'))
+
+    def test_shared_values(self):
+        network_id = 'net-1'
+        subnet_id = 'subnet-1'
+        port = dhcp.PortModel(self._port(),
+                              {network_id: network_id, subnet_id: subnet_id})
+        self.assertIs(network_id, port.network_id)
+        self.assertIs(subnet_id, port.fixed_ips[0].subnet_id)
+
+    def test_deepcopy(self):
+        port = dhcp.PortModel(self._port(**{'binding:host_id': 'host'}))
+        self.assertEqual(port, copy.deepcopy(port))
+
+
+class TestLeaseReleaser(base.BaseTestCase):
+    def setUp(self):
+        super(TestLeaseReleaser, self).setUp()
+        self.spawn_n = mock.patch('eventlet.spawn_n').start()
+        self.releaser = dhcp.LeaseReleaser()
+
+    def test_add_merges_pending_leases(self):
+        release1 = mock.Mock()
+        release2 = mock.Mock()
+        self.releaser.add('net1', [('192.168.0.2', 'mac1')], release1)
+        self.releaser.add('net2', [('192.168.1.2', 'mac2')], release2)
+        self.releaser.add('net1', [('192.168.0.3', 'mac3')], release1)
+        self.spawn_n.assert_called_once_with(self.releaser._run)
+
+        self.releaser._run()
+
+        release1.assert_called_once_with(set([('192.168.0.2', 'mac1'),
+                                              ('192.168.0.3', 'mac3')]))
+        release2.assert_called_once_with(set([('192.168.1.2', 'mac2')]))
+
+    def test_run_continues_after_failure(self):
+        release1 = mock.Mock(side_effect=RuntimeError)
+        release2 = mock.Mock()
+        self.releaser.add('net1', [('192.168.0.2', 'mac1')], release1)
+        self.releaser.add('net2', [('192.168.1.2', 'mac2')], release2)
+
+        with mock.patch.object(dhcp.LOG, 'exception') as log_exception:
+            self.releaser._run()
+
+        self.assertTrue(log_exception.called)
+        self.assertTrue(release2.called)
+        self.releaser.add('net1', [('192.168.0.2', 'mac1')], release1)
+        self.assertEqual(2, self.spawn_n.call_count)
@@ -422,6 +422,23 @@ class TestIpWrapper(base.BaseTestCase):
         ip_lib.IPWrapper('sudo').add_device_to_namespace(dev)
         self.assertEqual(dev.mock_calls, [])
 
+    def test_batch(self):
+        with mock.patch('neutron.agent.linux.utils.execute') as execute:
+            ip_lib.IPWrapper('sudo', 'ns').batch(
+                ['addr add 1.1.1.1/32 dev qg-1',
+                 'addr del 1.1.1.2/32 dev qg-1'])
+        execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'ns', 'ip', '-force', '-batch', '-'],
+            root_helper='sudo',
+            process_input='addr add 1.1.1.1/32 dev qg-1\n'
+                          'addr del 1.1.1.2/32 dev qg-1\n',
+            log_fail_as_error=True)
+
+    def test_batch_no_commands(self):
+        with mock.patch('neutron.agent.linux.utils.execute') as execute:
+            ip_lib.IPWrapper('sudo', 'ns').batch([])
+        self.assertFalse(execute.called)
+
 
 class TestIpRule(base.BaseTestCase):
     def setUp(self):
@@ -51,12 +51,62 @@ class FakeConf(object):
     nova_client_cert = 'nova_cert'
     nova_client_priv_key = 'nova_priv_key'
     cache_url = ''
+    nova_metadata_pool_size = 100
+    metadata_cache_size = 10000
+    metadata_cache_ttl = 5
+    metadata_cache_negative_ttl = 2
 
 
 class FakeConfCache(FakeConf):
     cache_url = 'memory://?default_ttl=5'
 
 
+class TestInstanceCache(base.BaseTestCase):
+    def setUp(self):
+        super(TestInstanceCache, self).setUp()
+        self.time = mock.patch('time.time', return_value=100).start()
+        self.cache = agent.InstanceCache(ttl=5, negative_ttl=2, max_size=2)
+
+    def test_get_miss(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual({'hits': 0, 'negative_hits': 0, 'misses': 1},
+                         self.cache.get_stats())
+
+    def test_get_hit(self):
+        self.cache.put('key', ('instance_id', 'tenant_id'))
+        self.assertEqual(('instance_id', 'tenant_id'), self.cache.get('key'))
+        self.cache.put('other', (None, None))
+        self.assertEqual((None, None), self.cache.get('other'))
+        self.assertEqual({'hits': 1, 'negative_hits': 1, 'misses': 0},
+                         self.cache.get_stats())
+
+    def test_get_expired(self):
+        self.cache.put('key', ('instance_id', 'tenant_id'))
+        self.cache.put('other', (None, None))
+        self.time.return_value = 103
+        self.assertIsNotNone(self.cache.get('key'))
+        self.assertIsNone(self.cache.get('other'))
+        self.time.return_value = 106
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_put_evicts_least_recently_used(self):
+        self.cache.put('key1', ('instance1', 'tenant_id'))
+        self.cache.put('key2', ('instance2', 'tenant_id'))
+        self.cache.get('key1')
+        self.cache.put('key3', ('instance3', 'tenant_id'))
+        self.assertIsNone(self.cache.get('key2'))
+        self.assertIsNotNone(self.cache.get('key1'))
+        self.assertIsNotNone(self.cache.get('key3'))
+
+    def test_put_disabled(self):
+        cache = agent.InstanceCache(ttl=5, negative_ttl=0, max_size=2)
+        cache.put('key', (None, None))
+        self.assertIsNone(cache.get('key'))
+        cache = agent.InstanceCache(ttl=5, negative_ttl=2, max_size=0)
+        cache.put('key', ('instance_id', 'tenant_id'))
+        self.assertIsNone(cache.get('key'))
+
+
 class TestMetadataProxyHandlerCache(base.BaseTestCase):
     fake_conf = FakeConfCache
 
@@ -322,6 +372,35 @@ class TestMetadataProxyHandlerCache(base.BaseTestCase):
             (None, None)
         )
 
+    def test_get_instance_id_cached(self):
+        headers = {'X-Neutron-Network-ID': 'the_id',
+                   'X-Forwarded-For': '192.168.1.1'}
+        req = mock.Mock(headers=headers)
+        self.qclient.return_value.list_ports.return_value = {
+            'ports': [{'device_id': 'device_id',
+                       'tenant_id': 'tenant_id',
+                       'network_id': 'the_id'}]}
+        for i in range(2):
+            self.assertEqual(
+                ('device_id', 'tenant_id'),
+                self.handler._get_instance_and_tenant_id(req))
+        self.assertEqual(1, self.qclient.return_value.list_ports.call_count)
+        self.assertEqual(1, self.handler.instance_cache.get_stats()['hits'])
+
+    def test_get_instance_id_no_match_cached(self):
+        headers = {'X-Neutron-Network-ID': 'the_id',
+                   'X-Forwarded-For': '192.168.1.1'}
+        req = mock.Mock(headers=headers)
+        with mock.patch.object(self.handler, '_get_ports',
+                               return_value=[]) as get_ports:
+            for i in range(2):
+                self.assertEqual(
+                    (None, None),
+                    self.handler._get_instance_and_tenant_id(req))
+        get_ports.assert_called_once_with('192.168.1.1', 'the_id', None)
+        self.assertEqual(
+            1, self.handler.instance_cache.get_stats()['negative_hits'])
+
     def _proxy_request_test_helper(self, response_code=200, method='GET'):
         hdrs = {'X-Forwarded-For': '8.8.8.8'}
         body = 'body'
@@ -362,6 +441,29 @@ class TestMetadataProxyHandlerCache(base.BaseTestCase):
 
                 return retval
 
+    def _proxy_request_twice(self):
+        req = mock.Mock(path_info='/the_path', query_string='',
+                        headers={'X-Forwarded-For': '8.8.8.8'},
+                        method='GET', body='')
+        with mock.patch('httplib2.Http') as mock_http:
+            resp = mock.MagicMock(status=200)
+            mock_http.return_value.request.return_value = (resp, 'content')
+            for i in range(2):
+                self.handler._proxy_request('the_id', 'tenant_id', req)
+        self.assertEqual(
+            2, mock_http.return_value.request.call_count)
+        return mock_http
+
+    def test_proxy_request_reuses_connection(self):
+        self.assertEqual(1, self._proxy_request_twice().call_count)
+
+    def test_proxy_request_no_pool(self):
+        class FakeConfNoPool(self.fake_conf):
+            nova_metadata_pool_size = 0
+
+        self.handler = agent.MetadataProxyHandler(FakeConfNoPool)
+        self.assertEqual(2, self._proxy_request_twice().call_count)
+
     def test_proxy_request_post(self):
         response = self._proxy_request_test_helper(method='POST')
         self.assertEqual(response.content_type, "text/plain")
@@ -488,6 +590,7 @@ class TestUnixDomainMetadataProxy(base.BaseTestCase):
         self.cfg.CONF.metadata_proxy_socket = '/the/path'
         self.cfg.CONF.metadata_workers = 0
         self.cfg.CONF.metadata_backlog = 128
+        self.cfg.CONF.metadata_worker_concurrency = 100
 
     def test_init_doesnot_exists(self):
         with mock.patch('os.path.isdir') as isdir:
@@ -549,7 +652,7 @@ class TestUnixDomainMetadataProxy(base.BaseTestCase):
                         isdir.assert_called_once_with('/the')
                         makedirs.assert_called_once_with('/the', 0o755)
                         server.assert_has_calls([
-                            mock.call('neutron-metadata-agent'),
+                            mock.call('neutron-metadata-agent', threads=100),
                             mock.call().start(handler.return_value,
                                               '/the/path', workers=0,
                                               backlog=128),
@@ -586,3 +689,15 @@ class TestUnixDomainMetadataProxy(base.BaseTestCase):
                 state_api_inst = state_api.return_value
                 state_api_inst.report_state.assert_called_once_with(
                     proxy.context, proxy.agent_state, use_call=True)
+
+    def test_report_state_cache_stats(self):
+        with mock.patch('neutron.agent.rpc.PluginReportStateAPI'):
+            with mock.patch('os.makedirs'):
+                proxy = agent.UnixDomainMetadataProxy(mock.Mock())
+                proxy.handler = mock.Mock()
+                stats = {'hits': 3, 'negative_hits': 1, 'misses': 2}
+                proxy.handler.instance_cache.get_stats.return_value = stats
+                proxy._report_state()
+                self.assertEqual(
+                    stats,
+                    proxy.agent_state['configurations']['metadata_cache'])
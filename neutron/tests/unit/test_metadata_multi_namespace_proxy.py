@@ -0,0 +1,201 @@
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+
+import fixtures
+import mock
+
+from neutron.agent.metadata import multi_namespace_proxy as mns_proxy
+from neutron.common import utils
+from neutron.openstack.common import jsonutils
+from neutron.tests import base
+
+
+class TestSetns(base.BaseTestCase):
+    def setUp(self):
+        super(TestSetns, self).setUp()
+        self.libc = mock.Mock()
+        mock.patch.object(mns_proxy, '_libc', self.libc).start()
+
+    def test_setns(self):
+        self.libc.setns.return_value = 0
+        mns_proxy.setns(5)
+        self.libc.setns.assert_called_once_with(5, mns_proxy.CLONE_NEWNET)
+
+    def test_setns_failure(self):
+        self.libc.setns.return_value = -1
+        with mock.patch('ctypes.get_errno', return_value=1):
+            self.assertRaises(OSError, mns_proxy.setns, 5)
+
+    def test_listen_in_namespace(self):
+        own_ns = mock.MagicMock()
+        own_ns.__enter__.return_value.fileno.return_value = 3
+        target_ns = mock.MagicMock()
+        target_ns.__enter__.return_value.fileno.return_value = 4
+        with mock.patch('__builtin__.open',
+                        side_effect=[own_ns, target_ns]) as mock_open:
+            with mock.patch('eventlet.listen') as listen:
+                with mock.patch.object(mns_proxy, 'setns') as setns:
+                    sock = mns_proxy.listen_in_namespace('qdhcp-ns', 80)
+        self.assertEqual(listen.return_value, sock)
+        mock_open.assert_has_calls([
+            mock.call('/proc/self/ns/net'),
+            mock.call(os.path.join(mns_proxy.NETNS_RUN_DIR, 'qdhcp-ns'))])
+        listen.assert_called_once_with(('0.0.0.0', 80), backlog=128)
+        setns.assert_has_calls([mock.call(4), mock.call(3)])
+
+    def test_listen_in_namespace_failure_returns_to_own_namespace(self):
+        own_ns = mock.MagicMock()
+        own_ns.__enter__.return_value.fileno.return_value = 3
+        target_ns = mock.MagicMock()
+        target_ns.__enter__.return_value.fileno.return_value = 4
+        with mock.patch('__builtin__.open', side_effect=[own_ns, target_ns]):
+            with mock.patch('eventlet.listen', side_effect=IOError):
+                with mock.patch.object(mns_proxy, 'setns') as setns:
+                    self.assertRaises(IOError, mns_proxy.listen_in_namespace,
+                                      'qdhcp-ns', 80)
+        setns.assert_has_calls([mock.call(4), mock.call(3)])
+
+
+class TestMultiNamespaceProxy(base.BaseTestCase):
+    def setUp(self):
+        super(TestMultiNamespaceProxy, self).setUp()
+        self.networks_file = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'networks')
+        self.listen = mock.patch.object(mns_proxy,
+                                        'listen_in_namespace').start()
+        self.listen.side_effect = lambda *args: mock.Mock()
+        self.spawn = mock.patch('eventlet.spawn').start()
+        self.spawn.side_effect = lambda *args, **kwargs: mock.Mock()
+        self.proxy = mns_proxy.MultiNamespaceProxy(self.networks_file, 80)
+
+    def _write_networks(self, networks):
+        with open(self.networks_file, 'w') as f:
+            f.write(jsonutils.dumps(networks))
+
+    def test_read_networks_file(self):
+        self._write_networks({
+            'net1': {'namespace': 'qdhcp-net1', 'network_id': 'net1'},
+            'net2': {'namespace': 'qdhcp-net2', 'router_id': 'router1'},
+            'net3': {'network_id': 'net3'},
+            'net4': {'namespace': 'qdhcp-net4'}})
+        self.assertEqual(
+            {'net1': {'namespace': 'qdhcp-net1', 'network_id': 'net1'},
+             'net2': {'namespace': 'qdhcp-net2', 'router_id': 'router1'}},
+            mns_proxy.read_networks_file(self.networks_file))
+
+    def test_read_networks_file_missing(self):
+        self.assertEqual({}, mns_proxy.read_networks_file(self.networks_file))
+
+    def test_read_networks_file_invalid(self):
+        with open(self.networks_file, 'w') as f:
+            f.write('{not json')
+        self.assertEqual({}, mns_proxy.read_networks_file(self.networks_file))
+
+    def test_reload_starts_listeners(self):
+        self._write_networks({
+            'net1': {'namespace': 'qdhcp-net1', 'network_id': 'net1'},
+            'net2': {'namespace': 'qdhcp-net2', 'router_id': 'router1'}})
+        self.proxy.reload()
+        self.assertEqual(set(['net1', 'net2']), set(self.proxy.listeners))
+        self.listen.assert_has_calls([mock.call('qdhcp-net1', 80),
+                                      mock.call('qdhcp-net2', 80)],
+                                     any_order=True)
+        handlers = dict((c[0][2].network_id or c[0][2].router_id, c[0][1])
+                        for c in self.spawn.call_args_list)
+        self.assertEqual(2, len(handlers))
+        self.assertIn('net1', handlers)
+        self.assertIn('router1', handlers)
+
+    def test_reload_stops_removed_and_restarts_changed(self):
+        self._write_networks({
+            'net1': {'namespace': 'qdhcp-net1', 'network_id': 'net1'},
+            'net2': {'namespace': 'qdhcp-net2', 'network_id': 'net2'},
+            'net3': {'namespace': 'qdhcp-net3', 'network_id': 'net3'}})
+        self.proxy.reload()
+        old = dict(self.proxy.listeners)
+        self.listen.reset_mock()
+        self._write_networks({
+            'net1': {'namespace': 'qdhcp-net1', 'network_id': 'net1'},
+            'net2': {'namespace': 'qdhcp-net2', 'router_id': 'router1'}})
+        self.proxy.reload()
+        self.assertEqual(set(['net1', 'net2']), set(self.proxy.listeners))
+        self.listen.assert_called_once_with('qdhcp-net2', 80)
+        self.assertEqual(old['net1'], self.proxy.listeners['net1'])
+        for key in ('net2', 'net3'):
+            entry, sock, thread = old[key]
+            thread.kill.assert_called_once_with()
+            sock.close.assert_called_once_with()
+
+    def test_reload_listen_failure(self):
+        self._write_networks({
+            'net1': {'namespace': 'qdhcp-net1', 'network_id': 'net1'},
+            'net2': {'namespace': 'qdhcp-net2', 'network_id': 'net2'}})
+        self.listen.side_effect = [OSError, mock.Mock()]
+        self.proxy.reload()
+        self.assertEqual(1, len(self.proxy.listeners))
+        # The entry which failed is retried on next reload
+        self.listen.side_effect = None
+        self.proxy.reload()
+        self.assertEqual(2, len(self.proxy.listeners))
+
+    def test_run(self):
+        with mock.patch('signal.signal') as signal:
+            with mock.patch.object(self.proxy, 'reload') as reload:
+                with mock.patch.object(mns_proxy.event, 'Event') as event:
+                    self.proxy.run()
+        signal.assert_called_once_with(mns_proxy.signal.SIGHUP,
+                                       self.proxy._handle_sighup)
+        reload.assert_called_once_with()
+        event.return_value.wait.assert_called_once_with()
+
+
+class TestProxyDaemon(base.BaseTestCase):
+    def test_run(self):
+        with mock.patch('neutron.agent.linux.daemon.Pidfile'):
+            with mock.patch.object(mns_proxy,
+                                   'MultiNamespaceProxy') as proxy:
+                pd = mns_proxy.ProxyDaemon('pidfile', 'networks', 80,
+                                           'proxy_id')
+                pd.run()
+                proxy.assert_has_calls([mock.call('networks', 80),
+                                        mock.call().run()])
+
+    def _test_main(self, daemonize):
+        with mock.patch.object(mns_proxy, 'ProxyDaemon') as daemon:
+            with mock.patch.object(mns_proxy, 'config') as config:
+                with mock.patch.object(mns_proxy, 'cfg') as cfg:
+                    with mock.patch.object(utils, 'cfg') as utils_cfg:
+                        cfg.CONF.proxy_id = 'proxy_id'
+                        cfg.CONF.networks_file = 'networks'
+                        cfg.CONF.metadata_port = 80
+                        cfg.CONF.pid_file = 'pidfile'
+                        cfg.CONF.daemonize = daemonize
+                        utils_cfg.CONF.log_opt_values.return_value = None
+                        mns_proxy.main()
+
+                        self.assertTrue(config.setup_logging.called)
+                        daemon.assert_has_calls([
+                            mock.call('pidfile', 'networks', 80, 'proxy_id'),
+                            daemonize and mock.call().start() or
+                            mock.call().run()]
+                        )
+
+    def test_main(self):
+        self._test_main(True)
+
+    def test_main_dont_fork(self):
+        self._test_main(False)
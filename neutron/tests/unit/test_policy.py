@@ -15,6 +15,7 @@
 
 """Test of Policy Engine For Neutron"""
 
+import contextlib
 import urllib2
 
 import fixtures
@@ -428,6 +429,51 @@ class NeutronPolicyTestCase(base.BaseTestCase):
             result = policy.enforce(self.context, action, target)
             self.assertTrue(result)
 
+    def test_enforce_tenant_id_check_parent_resource_cached(self):
+        action = "create_port:mac"
+        plugin = manager.NeutronManager.get_instance().plugin
+        with mock.patch.object(plugin, 'get_network',
+                               return_value={'tenant_id': 'fake'}) as f:
+            for i in range(3):
+                target = {'network_id': 'whatever'}
+                self.assertTrue(policy.enforce(self.context, action, target))
+        self.assertEqual(1, f.call_count)
+
+    def _test_prefetch_parents(self, ctx):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_network_owner")
+        policy.init()
+        targets = [{'id': str(i), 'network_id': 'net%d' % (i % 2)}
+                   for i in range(4)]
+        plugin = manager.NeutronManager.get_instance().plugin
+        networks = [{'id': 'net0', 'tenant_id': 'fake'},
+                    {'id': 'net1', 'tenant_id': 'another'}]
+        with contextlib.nested(
+            mock.patch.object(plugin, 'get_networks', return_value=networks),
+            mock.patch.object(plugin, 'get_network')
+        ) as (get_networks, get_network):
+            policy.prefetch_parents(ctx, 'get_port', targets)
+            results = [policy.check(ctx, 'get_port', target)
+                       for target in targets]
+        self.assertFalse(get_network.called)
+        return get_networks, results
+
+    def test_prefetch_parents(self):
+        get_networks, results = self._test_prefetch_parents(self.context)
+        self.assertEqual([True, False, True, False], results)
+        self.assertEqual(1, get_networks.call_count)
+        self.assertEqual(
+            set(['net0', 'net1']),
+            set(get_networks.call_args[1]['filters']['id']))
+        self.assertEqual(['id', 'tenant_id'],
+                         get_networks.call_args[1]['fields'])
+
+    def test_prefetch_parents_admin_context(self):
+        get_networks, results = self._test_prefetch_parents(
+            context.get_admin_context())
+        self.assertEqual([True] * 4, results)
+        self.assertFalse(get_networks.called)
+
     def test_enforce_plugin_failure(self):
 
         def fakegetnetwork(*args, **kwargs):
@@ -551,3 +597,70 @@ class NeutronPolicyTestCase(base.BaseTestCase):
             {'extension:provider_network:set': 'rule:admin_only'},
             dict((policy, 'rule:admin_only') for policy in
                  expected_policies))
+
+    def test_check_read_action_admin_context_is_constant(self):
+        admin_context = context.get_admin_context()
+        self.assertTrue(policy._specialize_rule('get_network',
+                                                admin_context.to_dict()))
+        self.assertTrue(policy.check(admin_context, 'get_network',
+                                     {'tenant_id': 'another'}))
+
+    def test_check_read_action_memoizes_by_target_fields(self):
+        targets = [{'tenant_id': tenant_id, 'shared': False,
+                    'router:external': False, 'id': str(i)}
+                   for i, tenant_id in enumerate(['fake', 'another'] * 5)]
+        owner_check = policy.OwnerCheck.__call__
+        with mock.patch.object(policy.OwnerCheck, '__call__',
+                               autospec=True,
+                               side_effect=owner_check) as mock_check:
+            results = [policy.check(self.context, 'get_network', target)
+                       for target in targets]
+        self.assertEqual([True, False] * 5, results)
+        self.assertEqual(2, mock_check.call_count)
+
+    def test_check_read_action_credentials_change(self):
+        target = {'tenant_id': 'another', 'shared': False,
+                  'router:external': False}
+        self.assertFalse(policy.check(self.context, 'get_network', target))
+        self.context.roles = ['admin']
+        self.assertTrue(policy.check(self.context, 'get_network', target))
+
+    def test_check_read_action_unhashable_target_field(self):
+        self.rules['get_network'] = common_policy.parse_rule(
+            'field:networks:name=net1')
+        policy.init()
+        self.assertFalse(policy.check(self.context, 'get_network',
+                                      {'name': ['net1']}))
+        self.assertTrue(policy.check(self.context, 'get_network',
+                                     {'name': 'net1'}))
+
+    def test_compiled_rules_match_rule_checks(self):
+        rules = {
+            'admin_or_user': 'role:admin or user_id:%(user_id)s',
+            'user_and_not_shared': ('user_id:%(user_id)s and '
+                                    'not field:networks:shared=True'),
+            'missing_field_first': 'user_id:%(user_id)s or role:user',
+            'missing_rule': 'rule:does_not_exist or role:admin',
+            'nested': '(rule:admin_or_user or role:user) and !',
+            'true_or': '@ or tenant_id:%(tenant_id)s',
+        }
+        for name, rule in rules.items():
+            self.rules[name] = common_policy.parse_rule(rule)
+        policy.init()
+        targets = [{}, {'user_id': 'fake', 'tenant_id': 'fake'},
+                   {'user_id': 'other', 'shared': True},
+                   {'user_id': 'fake', 'shared': False}]
+        contexts = [context.Context('fake', 'fake', roles=['user']),
+                    context.Context('other', 'fake', roles=['member']),
+                    context.get_admin_context()]
+        for name in rules:
+            for ctx in contexts:
+                for target in targets:
+                    expected = common_policy.check(
+                        common_policy.RuleCheck('rule', name),
+                        dict(target), ctx.to_dict())
+                    self.assertEqual(
+                        bool(expected),
+                        bool(policy._check_read_action(ctx, name,
+                                                       dict(target))),
+                        '%s %s %s' % (name, ctx.to_dict(), target))
@@ -608,6 +608,27 @@ class JSONDictSerializerTest(base.BaseTestCase):
 
         self.assertEqual(result, expected_json)
 
+    def test_serialize_iter(self):
+        servers = [{'id': i, 'name': u'\u7f51\u7edc'} for i in range(5)]
+        input_dict = {'servers': servers,
+                      'servers_links': [{'rel': 'next', 'href': 'url'}],
+                      'count': 5}
+        serializer = wsgi.JSONDictSerializer()
+        expected_json = serializer.serialize(input_dict)
+        chunks = list(serializer.serialize_iter(input_dict, 2))
+
+        self.assertEqual(expected_json, ''.join(chunks))
+        # 3 batches of servers, besides the chunks of the other keys
+        self.assertEqual(11, len(chunks))
+        self.assertEqual([], servers)
+
+    def test_serialize_iter_empty(self):
+        serializer = wsgi.JSONDictSerializer()
+        for input_dict in ({}, {'servers': []}):
+            self.assertEqual(serializer.serialize(input_dict),
+                             ''.join(serializer.serialize_iter(input_dict,
+                                                               2)))
+
 
 class TextDeserializerTest(base.BaseTestCase):
 
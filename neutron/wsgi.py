@@ -36,11 +36,11 @@ import webob.exc
 
 from neutron.common import constants
 from neutron.common import exceptions as exception
+from neutron.common import json_codec
 from neutron import context
 from neutron.db import api
 from neutron.openstack.common import excutils
 from neutron.openstack.common import gettextutils
-from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import service as common_service
 from neutron.openstack.common import systemd
@@ -392,9 +392,38 @@ class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization."""
 
     def default(self, data):
-        def sanitizer(obj):
-            return unicode(obj)
-        return jsonutils.dumps(data, default=sanitizer)
+        return json_codec.dumps(data, default=self._sanitizer)
+
+    def serialize_iter(self, data, batch_size):
+        """Yield the JSON of a dict, encoding its lists by batches.
+
+        The output is the same as the one of serialize. The lists of the
+        dict are emptied as their items are encoded, so that the items
+        which were already yielded can be freed.
+        """
+        separator = '{'
+        for key, value in data.iteritems():
+            yield '%s%s: ' % (separator, self.default(key))
+            separator = ', '
+            if not isinstance(value, list):
+                yield self.default(value)
+                continue
+            # Pop the items from the end of the reversed list to release
+            # them without shifting the remaining ones
+            value.reverse()
+            prefix = '['
+            while value:
+                batch = [value.pop() for i in
+                         xrange(min(batch_size, len(value)))]
+                yield prefix + ', '.join(self.default(item)
+                                         for item in batch)
+                prefix = ', '
+            yield '[]' if prefix == '[' else ']'
+        yield '}' if separator == ', ' else '{}'
+
+    @staticmethod
+    def _sanitizer(obj):
+        return unicode(obj)
 
 
 class XMLDictSerializer(DictSerializer):
@@ -610,7 +639,7 @@ class JSONDeserializer(TextDeserializer):
 
     def _from_json(self, datastring):
         try:
-            return jsonutils.loads(datastring)
+            return json_codec.loads(datastring)
         except ValueError:
             msg = _("Cannot understand JSON")
             raise exception.MalformedRequestBody(reason=msg)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare memory and port event latency of the DHCP agent network cache.
+
+The compact NetworkCache of the agent is compared to the former layout
+which kept the DictModel networks as received from the server and scanned
+the ports of a network on each port event.
+
+Usage: dhcp_network_cache_bench.py [networks] [ports_per_network]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import uuid
+
+from neutron.agent import dhcp_agent
+from neutron.agent.linux import dhcp
+
+
+class DictModelNetworkCache(object):
+    """The network cache layout before compact records were used."""
+
+    def __init__(self):
+        self.cache = {}
+        self.port_lookup = {}
+
+    def put(self, network):
+        self.cache[network.id] = network
+        for port in network.ports:
+            self.port_lookup[port.id] = network.id
+
+    def put_port(self, port):
+        network = self.cache[port.network_id]
+        for index in range(len(network.ports)):
+            if network.ports[index].id == port.id:
+                network.ports[index] = port
+                break
+        else:
+            network.ports.append(port)
+        self.port_lookup[port.id] = network.id
+
+    def remove_port(self, port):
+        network = self.cache[self.port_lookup[port.id]]
+        for index in range(len(network.ports)):
+            if network.ports[index] == port:
+                del network.ports[index]
+                del self.port_lookup[port.id]
+                break
+
+    def get_port_by_id(self, port_id):
+        network = self.cache.get(self.port_lookup.get(port_id))
+        if network:
+            for port in network.ports:
+                if port.id == port_id:
+                    return port
+
+
+def make_network(index, num_ports):
+    network_id = str(uuid.uuid4())
+    tenant_id = str(uuid.uuid4())
+    subnet_id = str(uuid.uuid4())
+    subnet = dict(id=subnet_id, network_id=network_id, tenant_id=tenant_id,
+                  name='', cidr='10.0.0.0/16', ip_version=4,
+                  gateway_ip='10.0.0.1', enable_dhcp=True,
+                  dns_nameservers=[], host_routes=[],
+                  allocation_pools=[dict(start='10.0.0.2',
+                                         end='10.0.255.254')],
+                  ipv6_ra_mode=None, ipv6_address_mode=None)
+    ports = []
+    for port_index in range(num_ports):
+        ports.append({
+            'id': str(uuid.uuid4()),
+            'name': '',
+            'network_id': network_id,
+            'tenant_id': tenant_id,
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                index % 256, port_index // 256 % 256, port_index % 256),
+            'admin_state_up': True,
+            'status': 'ACTIVE',
+            'device_id': str(uuid.uuid4()),
+            'device_owner': 'compute:nova',
+            'fixed_ips': [dict(subnet_id=subnet_id,
+                               ip_address='10.0.%d.%d' % (
+                                   port_index // 250, port_index % 250 + 2))],
+            'extra_dhcp_opts': [],
+            'security_groups': [str(uuid.uuid4())],
+            'allowed_address_pairs': [],
+            'binding:host_id': 'compute-%d' % (port_index % 50),
+            'binding:vif_type': 'ovs',
+        })
+    return dhcp.NetModel(True, dict(id=network_id, tenant_id=tenant_id,
+                                    name='net-%d' % index,
+                                    admin_state_up=True, subnets=[subnet],
+                                    ports=ports))
+
+
+def deep_size(obj, seen=None):
+    """Approximate number of bytes referenced by obj."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += deep_size(item, seen)
+    elif isinstance(obj, dhcp.SlotModel):
+        size += deep_size(obj._extra, seen)
+        for key, value in obj.items():
+            size += deep_size(value, seen)
+    return size
+
+
+def bench_port_events(nc, networks, rounds=200):
+    ports = [network.ports[len(network.ports) // 2]
+             for network in networks[:rounds]]
+    updated = [dhcp.DictModel(dict(port, name='updated')) for port in ports]
+    start = time.time()
+    for port in updated:
+        nc.put_port(port)
+    for port in updated:
+        nc.remove_port(nc.get_port_by_id(port.id))
+    return (time.time() - start) / (2.0 * len(updated)) * 1e6
+
+
+def main():
+    num_networks = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    num_ports = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    print('%d networks with %d ports each' % (num_networks, num_ports))
+    for name, cache_cls in (('DictModel', DictModelNetworkCache),
+                            ('compact', dhcp_agent.NetworkCache)):
+        nc = cache_cls()
+        for index in range(num_networks):
+            nc.put(make_network(index, num_ports))
+        networks = nc.cache.values()
+        size = deep_size(nc.cache)
+        latency = bench_port_events(nc, networks)
+        print('%-10s %8.1f MiB %8.1f us per port event' % (
+            name, size / 1024.0 / 1024.0, latency))
+
+
+if __name__ == '__main__':
+    main()
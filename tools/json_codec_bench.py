@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the JSON codecs on router sync and port list payloads.
+
+Each codec of neutron.common.json_codec is compared to the former
+jsonutils.dumps/loads of the API serializers.
+
+Usage: json_codec_bench.py [routers] [ports] [rounds]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import uuid
+
+from neutron.common import json_codec
+from neutron.openstack.common import jsonutils
+
+
+def make_port(index, network_id, subnet_id, tenant_id, device_owner):
+    return {
+        'id': str(uuid.uuid4()),
+        'name': u'',
+        'network_id': network_id,
+        'tenant_id': tenant_id,
+        'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+            index // 65536 % 256, index // 256 % 256, index % 256),
+        'admin_state_up': True,
+        'status': 'ACTIVE',
+        'device_id': str(uuid.uuid4()),
+        'device_owner': device_owner,
+        'fixed_ips': [{'subnet_id': subnet_id,
+                       'ip_address': '10.%d.%d.%d' % (
+                           index // 62500 % 250, index // 250 % 250,
+                           index % 250 + 2)}],
+        'security_groups': [str(uuid.uuid4())],
+        'allowed_address_pairs': [],
+        'extra_dhcp_opts': [],
+        'binding:host_id': 'compute-%d' % (index % 50),
+        'binding:vif_type': 'ovs',
+        'binding:vnic_type': 'normal',
+        'binding:profile': {},
+        'binding:vif_details': {'port_filter': True,
+                                'ovs_hybrid_plug': True},
+        'created_at': '2015-01-01T00:00:00',
+    }
+
+
+def make_subnet(network_id, subnet_id, tenant_id):
+    return {'id': subnet_id, 'network_id': network_id,
+            'tenant_id': tenant_id, 'cidr': '10.0.0.0/24',
+            'gateway_ip': '10.0.0.1', 'ip_version': 4,
+            'ipv6_ra_mode': None, 'ipv6_address_mode': None}
+
+
+def make_router_sync_data(num_routers):
+    """Return routers as returned by get_sync_data to the L3 agents."""
+    routers = []
+    for index in range(num_routers):
+        tenant_id = str(uuid.uuid4())
+        ext_net_id, ext_subnet_id = str(uuid.uuid4()), str(uuid.uuid4())
+        gw_port = make_port(index, ext_net_id, ext_subnet_id, tenant_id,
+                            'network:router_gateway')
+        gw_port['subnet'] = make_subnet(ext_net_id, ext_subnet_id,
+                                        tenant_id)
+        interfaces = []
+        for i in range(4):
+            net_id, subnet_id = str(uuid.uuid4()), str(uuid.uuid4())
+            port = make_port(index * 4 + i, net_id, subnet_id, tenant_id,
+                             'network:router_interface')
+            port['subnet'] = make_subnet(net_id, subnet_id, tenant_id)
+            interfaces.append(port)
+        floatingips = [{'id': str(uuid.uuid4()), 'tenant_id': tenant_id,
+                        'floating_ip_address': '172.24.%d.%d' % (
+                            index // 250 % 250, i + 2),
+                        'fixed_ip_address': '10.0.0.%d' % (i + 10),
+                        'floating_network_id': ext_net_id,
+                        'router_id': None, 'port_id': str(uuid.uuid4()),
+                        'status': 'ACTIVE', 'rate_limit': 1024}
+                       for i in range(8)]
+        routers.append({'id': str(uuid.uuid4()), 'name': u'router-%d' % index,
+                        'tenant_id': tenant_id, 'admin_state_up': True,
+                        'status': 'ACTIVE', 'distributed': False,
+                        'enable_snat': True, 'routes': [],
+                        'gw_port_id': gw_port['id'], 'gw_port': gw_port,
+                        '_interfaces': interfaces,
+                        '_floatingips': floatingips,
+                        'portforwardings': []})
+    return {'routers': routers}
+
+
+def make_port_list(num_ports):
+    network_id, subnet_id = str(uuid.uuid4()), str(uuid.uuid4())
+    tenant_id = str(uuid.uuid4())
+    return {'ports': [make_port(index, network_id, subnet_id, tenant_id,
+                                'compute:nova')
+                      for index in range(num_ports)]}
+
+
+def timed(func, arg, rounds):
+    best = None
+    for i in range(rounds):
+        start = time.time()
+        func(arg)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    num_routers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    num_ports = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    codecs = [('jsonutils', jsonutils)]
+    codecs += [(name, json_codec.get_codec(name))
+               for name in sorted(json_codec._CODECS)]
+    for title, payload in (
+            ('%d routers sync data' % num_routers,
+             make_router_sync_data(num_routers)),
+            ('%d ports list' % num_ports, make_port_list(num_ports))):
+        encoded = jsonutils.dumps(payload)
+        print('%s, %.1f MiB of JSON' % (title, len(encoded) / 1048576.0))
+        for name, codec in codecs:
+            print('  %-10s dumps %8.1f ms  loads %8.1f ms' % (
+                name, timed(codec.dumps, payload, rounds),
+                timed(codec.loads, encoded, rounds)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 UnitedStack Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the requests per second proxied by the metadata agent handler.
+
+The handler proxies to a local fake Nova metadata server, with a new
+connection per request and with pools of keep-alive connections. The
+instance lookup is stubbed out so that only the proxying is measured.
+
+Usage: metadata_agent_bench.py [requests] [concurrency]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import eventlet
+eventlet.monkey_patch()
+
+from eventlet import wsgi
+from oslo.config import cfg
+import webob
+
+from neutron.agent.metadata import agent
+from neutron.openstack.common.cache import cache
+
+
+class NullLogger(object):
+    def write(self, *args):
+        pass
+
+
+def fake_nova(environ, start_response):
+    body = 'ami-id\nhostname\ninstance-id\nlocal-ipv4\n'
+    start_response('200 OK', [('Content-Type', 'text/plain'),
+                              ('Content-Length', str(len(body)))])
+    return [body]
+
+
+def start_fake_nova():
+    sock = eventlet.listen(('127.0.0.1', 0))
+    eventlet.spawn_n(wsgi.server, sock, fake_nova, log=NullLogger())
+    return sock.getsockname()[1]
+
+
+def make_conf(port, pool_size):
+    conf = cfg.ConfigOpts()
+    conf.register_opts(agent.MetadataProxyHandler.OPTS)
+    cache.register_oslo_configs(conf)
+    conf([])
+    conf.set_override('nova_metadata_port', port)
+    conf.set_override('nova_metadata_pool_size', pool_size)
+    conf.set_override('metadata_proxy_shared_secret', 'secret')
+    return conf
+
+
+def bench(conf, num_requests, concurrency):
+    handler = agent.MetadataProxyHandler(conf)
+    handler._get_instance_and_tenant_id = lambda req: ('instance', 'tenant')
+
+    def request(index):
+        req = webob.Request.blank('/2009-04-04/meta-data/',
+                                  headers={'X-Forwarded-For': '10.0.0.2'})
+        resp = req.get_response(handler)
+        assert resp.status_int == 200, resp.status
+
+    pool = eventlet.GreenPool(concurrency)
+    start = time.time()
+    for index in range(num_requests):
+        pool.spawn_n(request, index)
+    pool.waitall()
+    return num_requests / (time.time() - start)
+
+
+def main():
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    port = start_fake_nova()
+    print('%d requests, %d concurrent' % (num_requests, concurrency))
+    for pool_size in (0, 10, 100):
+        conf = make_conf(port, pool_size)
+        rate = bench(conf, num_requests, concurrency)
+        print('nova_metadata_pool_size %-4d %8.0f requests/s' % (
+            pool_size, rate))
+
+
+if __name__ == '__main__':
+    main()